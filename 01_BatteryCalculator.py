@@ -1,100 +1,33 @@
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
-import matplotlib.dates as mdates
 from datetime import datetime, timedelta
 import uuid
 
+from batterysim import simuliere_akku
+from batterysim.plot import plots_aktiv, pyplot, zeige
+
+from batterysim.cache import lade_stundendaten_gecacht
+from batterysim.degradation import zyklen_und_alterung
+from batterysim.economics import akku_ersparnis, energie_summary
+from batterysim.loader import SENSOREN, erweitere_pv, zeitintervall_h
+from batterysim.report import (drucke_alterung, drucke_energie_summary, drucke_jahresstatistik,
+                               drucke_sensor_statistik)
+
 # Definierte Pfade und Sensoren
 basis_pfad = "data"
 datei = "energyData24Hourly.csv"
 full_path = f"{basis_pfad}/{datei}"
+schritt = 'h'  # Zeitschritt des Rasters, z.B. '15min', '5min' oder '1min' bei feineren Statistiken
 
-# CSV laden
-df = pd.read_csv(full_path)
-
-# Zeitstempel in datetime umwandeln (UTC, wie in den Daten)
-df['last_changed'] = pd.to_datetime(df['last_changed'])
-
-# Liste der Sensoren
-sensors = [
-    'sensor.netznutzung_kwh',
-    'sensor.netzeinspeisung_kwh',
-    'sensor.sma_st_80_total_yield',
-    'sensor.sn_3012091531_pv_gen_meter'
-]
-
-# Dictionary zum Speichern der separaten Datenreihen
-data_series = {}
-
-# Erstelle einen vollständigen Zeitindex (stündlich für das ganze Jahr 2024)
-start_time = pd.Timestamp('2024-01-01 00:00:00', tz='UTC')
-end_time = pd.Timestamp('2024-12-31 23:00:00', tz='UTC')
-full_time_index = pd.date_range(start=start_time, end=end_time, freq='h')
-
-for sensor in sensors:
-    df_sensor = df[df['entity_id'] == sensor].copy()
-    df_sensor.sort_values('last_changed', inplace=True)
-    df_sensor['hourly_diff'] = df_sensor['state'].diff()
-    df_sensor.dropna(subset=['hourly_diff'], inplace=True)
-    
-    # Filtere nur 2024 Daten
-    df_sensor = df_sensor[df_sensor['last_changed'].dt.year == 2024]
-    
-    # Erstelle einen DataFrame mit dem vollständigen Zeitindex
-    df_complete = pd.DataFrame(index=full_time_index)
-    df_complete['hourly_diff'] = 0.0  # Standardwert 0
-    
-    # Setze die vorhandenen Werte
-    df_sensor_indexed = df_sensor.set_index('last_changed')
-    
-    # Für PV-Sensoren: Runde Zeitstempel auf die nächste Stunde und fülle mit 0
-    if 'sma_st_80' in sensor or 'sn_3012091531' in sensor:
-        df_sensor_indexed.index = df_sensor_indexed.index.round('h')
-        df_sensor_indexed = df_sensor_indexed.groupby(df_sensor_indexed.index).first()
-        common_index = df_sensor_indexed.index.intersection(df_complete.index)
-        df_complete.loc[common_index, 'hourly_diff'] = df_sensor_indexed.loc[common_index, 'hourly_diff']
-    else:
-        df_sensor_indexed.index = df_sensor_indexed.index.round('h')
-        df_sensor_indexed = df_sensor_indexed.groupby(df_sensor_indexed.index).first()
-        common_index = df_sensor_indexed.index.intersection(df_complete.index)
-        df_complete.loc[common_index, 'hourly_diff'] = df_sensor_indexed.loc[common_index, 'hourly_diff']
-    
-    data_series[sensor] = df_complete
+# Aufbereitete Stundendaten laden (aus dem Cache, solange sich die CSV nicht ändert)
+combined_df = lade_stundendaten_gecacht(full_path, schritt=schritt)
+sensors = SENSOREN
 
 # Zeige Statistiken für jeden Sensor
-for sensor, ds in data_series.items():
-    non_zero_count = (ds['hourly_diff'] != 0).sum()
-    total_count = len(ds)
-    print(f"\n{sensor}:")
-    print(f"  Datenpunkte mit Werten > 0: {non_zero_count}/{total_count}")
-    print(f"  Erste 5 Nicht-Null Werte:")
-    print(ds[ds['hourly_diff'] != 0].head())
-
-# Erstelle einen kombinierten DataFrame für Berechnungen
-combined_df = pd.DataFrame(index=full_time_index)
-
-for sensor_name, ds in data_series.items():
-    combined_df[sensor_name] = ds['hourly_diff']
-
-# Berechne PV gesamt (sma_st_80_total_yield + sn_3012091531_pv_gen_meter)
-combined_df['pv_gesamt_kwh'] = (combined_df['sensor.sma_st_80_total_yield'] + 
-                               combined_df['sensor.sn_3012091531_pv_gen_meter'])
+drucke_sensor_statistik(combined_df, sensors)
 
-# Berechne den Hausverbrauch für jede Stunde
-combined_df['hausverbrauch_kwh'] = (combined_df['pv_gesamt_kwh'] - 
-                                   combined_df['sensor.netzeinspeisung_kwh'] + 
-                                   combined_df['sensor.netznutzung_kwh'])
-
-# Erweitere PV Erträge mit dem Faktor 6 für West Anlage
-combined_df['sensor.sn_3012091531_pv_gen_meter_erweitert'] = combined_df['sensor.sn_3012091531_pv_gen_meter'] * 6
-
-# Berechne den PV Gesamt mit der erweiterten West Anlage
-combined_df['pv_gesamt_kwh_erweitert'] = (combined_df['sensor.sma_st_80_total_yield'] + 
-                                         combined_df['sensor.sn_3012091531_pv_gen_meter_erweitert'])
-
-# Berechne den PV Überschuss
-combined_df['pv_uebrig_kwh'] = combined_df['pv_gesamt_kwh_erweitert'] - combined_df['hausverbrauch_kwh']
+# Erweitere PV Erträge mit dem Faktor 6 für West Anlage, PV Gesamt und PV Überschuss
+erweitere_pv(combined_df, west_faktor=6)
 
 # ------------------- AKKUSIMULATION -------------------
 
@@ -106,38 +39,17 @@ max_lade_leistung = 3.0  # kW
 max_entlade_leistung = 3.0  # kW
 akku_wirkungsgrad_laden = 0.95  # 95% Wirkungsgrad beim Laden
 akku_wirkungsgrad_entladen = 0.95  # 95% Wirkungsgrad beim Entladen
-zeitintervall = 1.0  # Stündliche Daten (1 Stunde)
-
-# Akku-Simulation (korrigiert)
-simuAkku = np.zeros(len(combined_df))
-akku_stand = max_akku_kapazitat * start_soc
-
-for i in range(len(combined_df)):
-    pv_ueberschuss = combined_df['pv_uebrig_kwh'].iloc[i]
-    
-    if pv_ueberschuss > 0:  # PV-Überschuss vorhanden - Akku laden
-        # Maximale Ladeenergie basierend auf verfügbarem Platz im Akku
-        verfuegbarer_platz = max_akku_kapazitat - akku_stand
-        # Begrenze auf maximale Ladeleistung und verfügbaren PV-Überschuss
-        ladeenergie_brutto = min(pv_ueberschuss, max_lade_leistung * zeitintervall)
-        # Berücksichtige Wirkungsgrad und verfügbaren Platz
-        ladeenergie_netto = min(ladeenergie_brutto * akku_wirkungsgrad_laden, verfuegbarer_platz)
-        akku_stand += ladeenergie_netto
-        
-    elif pv_ueberschuss < 0:  # PV-Defizit - Akku entladen
-        # Benötigte Energie aus dem Akku
-        benoetigte_energie = abs(pv_ueberschuss)
-        # Verfügbare Energie im Akku (über Minimum)
-        verfuegbare_energie = max(0, akku_stand - min_akku_kapazitat)
-        # Begrenze auf maximale Entladeleistung
-        max_entladeenergie = min(max_entlade_leistung * zeitintervall, verfuegbare_energie)
-        # Tatsächliche Entladung (berücksichtige Wirkungsgrad)
-        entladeenergie_netto = min(benoetigte_energie, max_entladeenergie)
-        akku_stand -= entladeenergie_netto
-        
-    # Sicherheitscheck: Akku darf nie unter Minimum oder über Maximum
-    akku_stand = max(min_akku_kapazitat, min(akku_stand, max_akku_kapazitat))
-    simuAkku[i] = akku_stand
+zeitintervall = zeitintervall_h(combined_df.index)  # Stunden pro Zeitschritt (1.0 bei stündlichen Daten)
+
+# Akku-Simulation (vektorisiert, siehe batterysim.engine)
+akku_ergebnis = simuliere_akku(
+    combined_df['pv_uebrig_kwh'].to_numpy(), max_akku_kapazitat,
+    min_soc=min_akku_kapazitat / max_akku_kapazitat,
+    max_lade_leistung=max_lade_leistung, max_entlade_leistung=max_entlade_leistung,
+    akku_wirkungsgrad_laden=akku_wirkungsgrad_laden,
+    akku_wirkungsgrad_entladen=akku_wirkungsgrad_entladen,
+    zeitintervall=zeitintervall, start_soc=start_soc)
+simuAkku = akku_ergebnis.soc
 
 # Füge Akku-Stand dem DataFrame hinzu
 combined_df['simu_akku_kwh'] = simuAkku
@@ -227,72 +139,78 @@ plt.subplot(3, 1, 3)
 """
 
 
-# Erstelle einen längeren Plot für bessere Darstellung
-plt.figure(figsize=(24, 10))
+if plots_aktiv():
+    plt = pyplot()
+    import matplotlib.dates as mdates
 
-# Erste y-Achse: Alle Werte in kWh
-color1 = 'tab:blue'
-color2 = 'tab:green'
-color3 = 'tab:orange'
+    # Erstelle einen längeren Plot für bessere Darstellung
+    plt.figure(figsize=(24, 10))
 
-plt.xlabel('Datum')
-plt.ylabel('Energie (kWh)')
-plt.plot(combined_df.index, combined_df['simu_akku_kwh'], linewidth=1.5, color=color1, alpha=0.8, label='Akku-Ladestand')
-plt.plot(combined_df.index, combined_df['hausverbrauch_kwh'], linewidth=0.8, color=color2, alpha=0.6, label='Hausverbrauch')
-plt.plot(combined_df.index, combined_df['pv_gesamt_kwh_erweitert'], linewidth=0.8, color=color3, alpha=0.6, label='PV-Erzeugung erweitert')
+    # Erste y-Achse: Alle Werte in kWh
+    color1 = 'tab:blue'
+    color2 = 'tab:green'
+    color3 = 'tab:orange'
 
-# Akku-Kapazitätsgrenzen
-plt.axhline(y=max_akku_kapazitat, color='red', linestyle='--', alpha=0.7, label=f'Max. Kapazität ({max_akku_kapazitat} kWh)')
-plt.axhline(y=min_akku_kapazitat, color='orange', linestyle='--', alpha=0.7, label=f'Min. Kapazität ({min_akku_kapazitat:.1f} kWh)')
-plt.axhline(y=max_akku_kapazitat * 0.5, color='green', linestyle=':', alpha=0.5, label='50% Kapazität')
+    plt.xlabel('Datum')
+    plt.ylabel('Energie (kWh)')
+    plt.plot(combined_df.index, combined_df['simu_akku_kwh'], linewidth=1.5, color=color1, alpha=0.8, label='Akku-Ladestand')
+    plt.plot(combined_df.index, combined_df['hausverbrauch_kwh'], linewidth=0.8, color=color2, alpha=0.6, label='Hausverbrauch')
+    plt.plot(combined_df.index, combined_df['pv_gesamt_kwh_erweitert'], linewidth=0.8, color=color3, alpha=0.6, label='PV-Erzeugung erweitert')
 
-# Füllung unter Akku-Kurve
-plt.fill_between(combined_df.index, min_akku_kapazitat, combined_df['simu_akku_kwh'], alpha=0.2, color=color1)
+    # Akku-Kapazitätsgrenzen
+    plt.axhline(y=max_akku_kapazitat, color='red', linestyle='--', alpha=0.7, label=f'Max. Kapazität ({max_akku_kapazitat} kWh)')
+    plt.axhline(y=min_akku_kapazitat, color='orange', linestyle='--', alpha=0.7, label=f'Min. Kapazität ({min_akku_kapazitat:.1f} kWh)')
+    plt.axhline(y=max_akku_kapazitat * 0.5, color='green', linestyle=':', alpha=0.5, label='50% Kapazität')
 
-plt.grid(True, alpha=0.3)
+    # Füllung unter Akku-Kurve
+    plt.fill_between(combined_df.index, min_akku_kapazitat, combined_df['simu_akku_kwh'], alpha=0.2, color=color1)
 
-# Formatierung der x-Achse
-plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%m/%d'))
-plt.xticks(rotation=45)
+    plt.grid(True, alpha=0.3)
 
-# Titel und Legende
-plt.title('Akku-Performance: Ladestand, Hausverbrauch und PV-Erzeugung über das Jahr 2024', fontsize=14, pad=20)
-plt.legend(loc='upper left', bbox_to_anchor=(0.02, 0.98))
+    # Formatierung der x-Achse
+    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%m/%d'))
+    plt.xticks(rotation=45)
 
-# Zusätzliche Statistiken für den Akku
-akku_min = combined_df['simu_akku_kwh'].min()
-akku_max = combined_df['simu_akku_kwh'].max()
-akku_mean = combined_df['simu_akku_kwh'].mean()
-akku_std = combined_df['simu_akku_kwh'].std()
+    # Titel und Legende
+    plt.title('Akku-Performance: Ladestand, Hausverbrauch und PV-Erzeugung über das Jahr 2024', fontsize=14, pad=20)
+    plt.legend(loc='upper left', bbox_to_anchor=(0.02, 0.98))
 
-# Prüfe ob Minimum verletzt wurde
-min_verletzungen = (combined_df['simu_akku_kwh'] < min_akku_kapazitat).sum()
+    # Zusätzliche Statistiken für den Akku
+    akku_min = combined_df['simu_akku_kwh'].min()
+    akku_max = combined_df['simu_akku_kwh'].max()
+    akku_mean = combined_df['simu_akku_kwh'].mean()
+    akku_std = combined_df['simu_akku_kwh'].std()
 
-# Hausverbrauch Statistiken
-verbrauch_mean = combined_df['hausverbrauch_kwh'].mean()
-verbrauch_max = combined_df['hausverbrauch_kwh'].max()
-pv_mean = combined_df['pv_gesamt_kwh_erweitert'].mean()
-pv_max = combined_df['pv_gesamt_kwh_erweitert'].max()
+    # Prüfe ob Minimum verletzt wurde
+    min_verletzungen = (combined_df['simu_akku_kwh'] < min_akku_kapazitat).sum()
 
-# Statistikbox
-stats_text = f'''Akku Statistiken:
-Min: {akku_min:.2f} kWh
-Max: {akku_max:.2f} kWh
-Mittel: {akku_mean:.2f} kWh
-Std: {akku_std:.2f} kWh
-Min-Verletzungen: {min_verletzungen}
+    # Hausverbrauch Statistiken
+    verbrauch_mean = combined_df['hausverbrauch_kwh'].mean()
+    verbrauch_max = combined_df['hausverbrauch_kwh'].max()
+    pv_mean = combined_df['pv_gesamt_kwh_erweitert'].mean()
+    pv_max = combined_df['pv_gesamt_kwh_erweitert'].max()
 
-Verbrauch/PV:
-Verbrauch Ø: {verbrauch_mean:.2f} kWh/h
-Verbrauch Max: {verbrauch_max:.2f} kWh/h
-PV Ø: {pv_mean:.2f} kWh/h
-PV Max: {pv_max:.2f} kWh/h'''
+    # Statistikbox
+    stats_text = (
+        'Akku Statistiken:\n'
+        f'Min: {akku_min:.2f} kWh\n'
+        f'Max: {akku_max:.2f} kWh\n'
+        f'Mittel: {akku_mean:.2f} kWh\n'
+        f'Std: {akku_std:.2f} kWh\n'
+        f'Min-Verletzungen: {min_verletzungen}\n'
+        '\n'
+        'Verbrauch/PV:\n'
+        f'Verbrauch Ø: {verbrauch_mean:.2f} kWh/h\n'
+        f'Verbrauch Max: {verbrauch_max:.2f} kWh/h\n'
+        f'PV Ø: {pv_mean:.2f} kWh/h\n'
+        f'PV Max: {pv_max:.2f} kWh/h'
+    )
 
-plt.text(0.75, 0.98, stats_text, transform=plt.gca().transAxes, verticalalignment='top', 
-         bbox=dict(boxstyle='round', facecolor='white', alpha=0.9), fontsize=10)
+    plt.text(0.75, 0.98, stats_text, transform=plt.gca().transAxes, verticalalignment='top', 
+             bbox=dict(boxstyle='round', facecolor='white', alpha=0.9), fontsize=10)
 
-plt.tight_layout()
-plt.show()
+    plt.tight_layout()
+    zeige('akku_verlauf')
 
 
 
@@ -302,80 +220,24 @@ plt.show()
 
 # ------------------- SUMMARY-BERECHNUNG -------------------
 
-# Gesamtverbrauch (Haus) in kWh über den Zeitraum
-gesamt_verbrauch_kwh = combined_df['hausverbrauch_kwh'].sum()
-
-# Gesamt-PV-Produktion
-gesamt_pv_kwh = combined_df['pv_gesamt_kwh_erweitert'].sum()
-
-# PV direkt genutzt (nicht eingespeist)
-pv_direktnutzung_kwh = combined_df['hausverbrauch_kwh'].where(
-    combined_df['pv_gesamt_kwh_erweitert'] >= combined_df['hausverbrauch_kwh'],
-    combined_df['pv_gesamt_kwh_erweitert']
-).sum()
-
-# PV-Energie, die in den Akku geladen wurde
-akku_ladungen_kwh = np.diff(simuAkku, prepend=simuAkku[0])
-akku_energie_von_pv_kwh = akku_ladungen_kwh[akku_ladungen_kwh > 0].sum()
-
-# PV-Energie, die aus dem Akku entnommen wurde
-akku_entnahmen_kwh = -akku_ladungen_kwh[akku_ladungen_kwh < 0].sum()
-
-# Gesamt-Netzbezug (laut Sensor)
-netzbezug_kwh = combined_df['sensor.netznutzung_kwh'].sum()
-
-# Autarkiegrad (wie viel % des Verbrauchs durch PV + Akku gedeckt wurde)
-verbrauch_deckt_durch_pv_und_akku = pv_direktnutzung_kwh + akku_entnahmen_kwh
-autarkiegrad = (verbrauch_deckt_durch_pv_und_akku / gesamt_verbrauch_kwh) * 100
-
-# Einfache Einsparung: was du nicht aus dem Netz holen musstest
-eingespart_kwh = verbrauch_deckt_durch_pv_und_akku
+# Energiebilanz mit Akku (Verbrauch, PV, Akku, Netzbezug, Autarkiegrad)
+summary = energie_summary(combined_df, akku_ergebnis)
 
 # ------------------- AKKU-ERSARNIS IN CHF -------------------
 
 strompreis_bezug_rp = 22.5  # Rappen pro kWh für Bezug
 einspeiseverg_rp = 7.5*0.8      # Rappen pro kWh für Einspeisung
 
-# Was der Akku an Netzstrom spart (in Rappen)
-ersparnis_durch_vermeidung_netbezug_rp = akku_entnahmen_kwh * strompreis_bezug_rp
-
-# Was man "verliert", weil man weniger einspeist (in Rappen)
-verlust_durch_verhinderte_einspeisung_rp = akku_energie_von_pv_kwh * einspeiseverg_rp
+ersparnis = akku_ersparnis(summary['akku_energie_von_pv_kwh'], summary['akku_entnahmen_kwh'],
+                           strompreis_bezug_rp, einspeiseverg_rp)
 
-# Nettoersparnis durch Akku (in Rappen)
-netto_ersparnis_akku_rp = ersparnis_durch_vermeidung_netbezug_rp - verlust_durch_verhinderte_einspeisung_rp
+# ------------------- ALTERUNG -------------------
 
-# Umrechnung in CHF
-netto_ersparnis_akku_chf = netto_ersparnis_akku_rp / 100
+# Rainflow-Zählung des Ladestands und Kapazitätsverlust (Modell siehe batterysim.degradation)
+alterung = zyklen_und_alterung(simuAkku, max_akku_kapazitat, zeitintervall=zeitintervall)
 
 # ------------------- AUSGABE -------------------
 
-print("\n=== JAHRESSTATISTIKEN 2024 ===")
-yearly_sums = combined_df.sum()
-print(f"PV Gesamt erweitert: {yearly_sums['pv_gesamt_kwh_erweitert']:.1f} kWh")
-print(f"Hausverbrauch: {yearly_sums['hausverbrauch_kwh']:.1f} kWh")
-print(f"PV Überschuss: {yearly_sums['pv_uebrig_kwh']:.1f} kWh")
-print(f"Netznutzung: {yearly_sums['sensor.netznutzung_kwh']:.1f} kWh")
-print(f"Netzeinspeisung: {yearly_sums['sensor.netzeinspeisung_kwh']:.1f} kWh")
-
-autarkie_grad = (1 - yearly_sums['sensor.netznutzung_kwh'] / yearly_sums['hausverbrauch_kwh']) * 100
-eigenverbrauchsquote = (yearly_sums['pv_gesamt_kwh_erweitert'] - yearly_sums['sensor.netzeinspeisung_kwh']) / yearly_sums['pv_gesamt_kwh_erweitert'] * 100
-
-print(f"\nAutarkie-Grad (ohne Akku): {autarkie_grad:.1f}%")
-print(f"Eigenverbrauchsquote (ohne Akku): {eigenverbrauchsquote:.1f}%")
-
-print("\n=== ENERGIE-SUMMARY MIT AKKU ===")
-print(f"Gesamtverbrauch:         {gesamt_verbrauch_kwh:.2f} kWh")
-print(f"PV-Gesamterzeugung:      {gesamt_pv_kwh:.2f} kWh")
-print(f"Direkt genutzte PV:      {pv_direktnutzung_kwh:.2f} kWh")
-print(f"Energie in Akku geladen: {akku_energie_von_pv_kwh:.2f} kWh")
-print(f"Aus dem Akku entnommen:  {akku_entnahmen_kwh:.2f} kWh")
-print(f"Netzbezug:               {netzbezug_kwh:.2f} kWh")
-print(f"Gesparte Energie (PV+Akku): {eingespart_kwh:.2f} kWh")
-print(f"Autarkiegrad (mit Akku): {autarkiegrad:.1f}%")
-
-print("\n=== FINANZIELLE ERSPARNIS (AKKU) ===")
-print(f"Netzstrom durch Akku vermieden:   {akku_entnahmen_kwh:.2f} kWh → {ersparnis_durch_vermeidung_netbezug_rp:.2f} Rp")
-print(f"Verhinderte Einspeisung:          {akku_energie_von_pv_kwh:.2f} kWh → {verlust_durch_verhinderte_einspeisung_rp:.2f} Rp")
-print(f"💰 Nettoersparnis durch Akku:     {netto_ersparnis_akku_chf:.2f} CHF")
-print("=====================================")
\ No newline at end of file
+drucke_jahresstatistik(combined_df, zusatz=' (ohne Akku)')
+drucke_energie_summary(summary, ersparnis)
+drucke_alterung(alterung)
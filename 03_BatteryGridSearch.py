@@ -0,0 +1,51 @@
+import pandas as pd
+import numpy as np
+
+from batterysim import grid_suche
+from batterysim.cache import lade_stundendaten_gecacht
+
+# Grid-Suche über Akku-Parameter und den Erweiterungsfaktor der West-Anlage.
+# Die Worker-Prozesse importieren dieses Skript (Windows/spawn), darum läuft
+# alles unterhalb des __main__-Guards.
+
+if __name__ == "__main__":
+    # Definierte Pfade und Sensoren
+    basis_pfad = "data"
+    datei = "energyData24Hourly.csv"
+    full_path = f"{basis_pfad}/{datei}"
+
+    # Aufbereitete Stundendaten laden (aus dem Cache, solange sich die CSV nicht ändert)
+    combined_df = lade_stundendaten_gecacht(full_path)
+
+    # ------------------- GRID-SUCHE -------------------
+
+    # Strompreise (in Rappen)
+    strompreis_bezug_rp = 22.5
+    einspeiseverg_rp = 7.5*0.8
+
+    # Werte pro Parameter; simuliert wird das kartesische Produkt
+    raster = {
+        'max_akku_kapazitat': [5, 10, 15, 20, 25, 35],
+        'min_soc': [0.05, 0.1, 0.2],
+        'max_lade_leistung': [3.0, 5.0, 10.0],
+        'max_entlade_leistung': [3.0, 5.0, 10.0],
+        'akku_wirkungsgrad_laden': [0.9, 0.95],
+        'akku_wirkungsgrad_entladen': [0.9, 0.95],
+        'start_soc': [0.5],
+        'west_faktor': [1, 6, 7],
+    }
+
+    ausgabe_datei = f"{basis_pfad}/grid_resultate.csv"
+
+    anzahl = grid_suche(
+        combined_df['sensor.sma_st_80_total_yield'],
+        combined_df['sensor.sn_3012091531_pv_gen_meter'],
+        combined_df['hausverbrauch_kwh'],
+        raster, ausgabe_datei,
+        strompreis_bezug_rp=strompreis_bezug_rp, einspeiseverg_rp=einspeiseverg_rp)
+
+    # ------------------- AUSGABE DER ERGEBNISSE -------------------
+
+    resultate = pd.read_csv(ausgabe_datei, index_col='konfiguration').sort_index()
+    print(f"\n=== TOP 10 VON {anzahl} KONFIGURATIONEN ===")
+    print(resultate.nlargest(10, 'netto_chf').to_string())
@@ -10,15 +10,19 @@ sensors = [
     'sensor.sn_3012091531_pv_gen_meter'
 ]
 
+# Zeitraum (UTC, Ende exklusiv), beliebig viele Jahre
+START_TIME = pd.Timestamp('2024-01-01 00:00:00', tz='UTC')
+END_TIME = pd.Timestamp('2025-01-01 00:00:00', tz='UTC')
+
 # Lade die CSV-Datei
 df = pd.read_csv('data/energyData24Hourly.csv')
 
 # Konvertiere 'last_changed' zu datetime und stelle sicher, dass 'state' numerisch ist
-df['last_changed'] = pd.to_datetime(df['last_changed'])
+df['last_changed'] = pd.to_datetime(df['last_changed'], utc=True)
 df['state'] = pd.to_numeric(df['state'], errors='coerce')
 
-# Filtere Daten für das Jahr 2024
-df = df[df['last_changed'].dt.year == 2024]
+# Filtere Daten für den Zeitraum
+df = df[(df['last_changed'] >= START_TIME) & (df['last_changed'] < END_TIME)]
 
 # Berechne stündliche Differenzen und speichere sie als Datenreihen
 data_dict = {}
@@ -46,7 +50,7 @@ for sensor, series in data_dict.items():
 
 plt.xlabel('Zeit')
 plt.ylabel('Stündliche Differenz (kWh)')
-plt.title('Stündliche Differenzen der Energiewerte für 2024')
+plt.title(f'Stündliche Differenzen der Energiewerte {START_TIME:%d.%m.%Y} – {END_TIME:%d.%m.%Y}')
 plt.legend()
 plt.grid(True)
 plt.xticks(rotation=45)
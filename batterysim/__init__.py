@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+batterySim – Akku Simulation mit HomeAssistant Energie Daten
+"""
+
+import importlib
+
+# Öffentliche Namen und ihr Modul; importiert wird erst beim ersten Zugriff,
+# damit z.B. die Engine ohne pandas und die CLI ohne Wartezeit startet.
+_EXPORTE = {
+    'AkkuErgebnis': 'batterysim.engine',
+    'simuliere_akku': 'batterysim.engine',
+    'simuliere_akku_linear': 'batterysim.engine',
+    'akku_summen': 'batterysim.engine',
+    'grid_suche': 'batterysim.sweep',
+    'kapazitaets_sweep': 'batterysim.sweep',
+    'optimale_kapazitaet': 'batterysim.sweep',
+    'monte_carlo_sweep': 'batterysim.montecarlo',
+    'simuliere_mit_alterung': 'batterysim.degradation',
+    'zyklen_und_alterung': 'batterysim.degradation',
+    'SENSOREN': 'batterysim.loader',
+    'erweitere_pv': 'batterysim.loader',
+    'lade_stundendaten': 'batterysim.loader',
+    'lade_stundendaten_stream': 'batterysim.loader',
+    'lade_tagesdateien': 'batterysim.loader',
+    'stundenraster_stream': 'batterysim.loader',
+    'lade_stundendaten_gecacht': 'batterysim.cache',
+    'ergebnis_gecacht': 'batterysim.cache',
+    'simuliere_akku_gecacht': 'batterysim.cache',
+    'akku_ersparnis': 'batterysim.economics',
+    'energie_summary': 'batterysim.economics',
+    'ersparnis_pro_periode': 'batterysim.economics',
+    'jahresstatistik': 'batterysim.economics',
+    'simuliere_flotte': 'batterysim.fleet',
+    'pruefe_export': 'batterysim.quality',
+    'pruefe_zaehlerstaende': 'batterysim.quality',
+    'optimiere_akku': 'batterysim.dispatch',
+    'vergleiche_mit_greedy': 'batterysim.dispatch',
+    'fenster_analyse': 'batterysim.windows',
+    'fenster_kennzahlen': 'batterysim.windows',
+    'kumulierte_summen': 'batterysim.windows',
+    'archiv_index': 'batterysim.store',
+    'importiere_standorte': 'batterysim.store',
+    'oeffne_standort': 'batterysim.store',
+    'schreibe_standort': 'batterysim.store',
+    'bewerte_tarife': 'batterysim.tariff',
+    'lade_tarife': 'batterysim.tariff',
+}
+
+__all__ = list(_EXPORTE)
+
+
+def __getattr__(name):
+    modul = _EXPORTE.get(name)
+    if modul is None:
+        raise AttributeError(f"module 'batterysim' has no attribute {name!r}")
+    wert = getattr(importlib.import_module(modul), name)
+    globals()[name] = wert
+    return wert
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,3 @@
+from batterysim.cli import main
+
+main()
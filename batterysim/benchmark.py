@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks der Pipeline auf synthetischen Exporten
+
+Pro Szenario wird ein Export erzeugt (und im Arbeitsordner wiederverwendet)
+und jede Stufe einzeln gemessen: CSV lesen, Stundenraster, blockweises
+Einlesen, Akku-Simulation und Kapazitäts-Sweep. Erfasst werden Laufzeit,
+verarbeitete Zeilen und der Spitzenwert des Speichers (tracemalloc). Eine
+gespeicherte Baseline (JSON) macht Verschlechterungen sichtbar.
+"""
+
+import json
+import os
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from batterysim.engine import simuliere_akku
+from batterysim.loader import SENSOREN, STUNDE_NS, erweitere_pv, lade_stundendaten_stream, schritt_ns, stundenraster
+from batterysim.sweep import kapazitaets_sweep
+from batterysim.synthetic import erzeuge_export
+
+BASELINE_DATEI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              'benchmarks', 'baseline.json')
+
+# Szenarien: Parameter für erzeuge_export; 'gross' ist das Zielvolumen (10 Jahre, 1 Minute)
+SZENARIEN = {
+    '1j_60min': {'jahre': 1, 'intervall_min': 60},
+    '1j_15min': {'jahre': 1, 'intervall_min': 15, 'luecken': 5, 'zaehler_resets': 1},
+    '3j_60min_20sensoren': {'jahre': 3, 'intervall_min': 60, 'zusaetzliche_sensoren': 16},
+    'gross': {'jahre': 10, 'intervall_min': 1},
+}
+
+SWEEP_KAPAZITAETEN = np.arange(2.5, 52.5, 2.5)
+
+
+def _messe(funktion, *args, **kwargs):
+    """Führt funktion zweimal aus: einmal für die Laufzeit, einmal unter tracemalloc für
+    den Speicher (tracemalloc bremst Python-Allokationen stark). Gibt (ergebnis, sekunden,
+    spitzen_mb) zurück."""
+    start = time.perf_counter()
+    ergebnis = funktion(*args, **kwargs)
+    sekunden = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        funktion(*args, **kwargs)
+        _, spitze = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return ergebnis, sekunden, spitze / 2**20
+
+
+def _export(name, parameter, ordner):
+    """Pfad des synthetischen Exports für das Szenario, erzeugt nur wenn er fehlt."""
+    os.makedirs(ordner, exist_ok=True)
+    pfad = os.path.join(ordner, f"{name}.csv")
+    if not os.path.exists(pfad):
+        tmp = pfad + '.tmp'
+        erzeuge_export(tmp, **parameter)
+        os.replace(tmp, pfad)
+    return pfad
+
+
+def fuehre_szenario_aus(name, ordner, parameter=None):
+    """Misst alle Stufen für ein Szenario. Gibt {stufe: {sekunden, spitzen_mb, zeilen}} zurück."""
+    parameter = SZENARIEN[name] if parameter is None else parameter
+    pfad = _export(name, parameter, ordner)
+    # Raster im Takt des Exports, damit alle Messungen in die Schritte eingehen
+    schritt = f"{parameter.get('intervall_min', 60)}min"
+    start_time = pd.Timestamp('2024-01-01')
+    end_time = start_time + pd.DateOffset(years=parameter.get('jahre', 1)) - pd.Timedelta(schritt)
+    resultate = {}
+
+    def notiere(stufe, sekunden, spitzen_mb, zeilen):
+        resultate[stufe] = {'sekunden': round(sekunden, 4), 'spitzen_mb': round(spitzen_mb, 1),
+                            'zeilen': int(zeilen)}
+
+    df, s, mb = _messe(pd.read_csv, pfad, usecols=['entity_id', 'state', 'last_changed'])
+    notiere('csv_lesen', s, mb, len(df))
+
+    combined_df, s, mb = _messe(stundenraster, df, SENSOREN, start_time, end_time, schritt)
+    notiere('stundenraster', s, mb, len(df))
+    del df
+
+    _, s, mb = _messe(lade_stundendaten_stream, pfad, SENSOREN, start_time, end_time,
+                      schritt=schritt)
+    notiere('stream_einlesen', s, mb, resultate['csv_lesen']['zeilen'])
+
+    erweitere_pv(combined_df)
+    pv_uebrig = combined_df['pv_uebrig_kwh']
+    _, s, mb = _messe(simuliere_akku, pv_uebrig.to_numpy(), 20.0,
+                      zeitintervall=schritt_ns(schritt) / STUNDE_NS)
+    notiere('simulation', s, mb, len(pv_uebrig))
+
+    _, s, mb = _messe(kapazitaets_sweep, pv_uebrig, SWEEP_KAPAZITAETEN)
+    notiere('sweep', s, mb, len(pv_uebrig) * len(SWEEP_KAPAZITAETEN))
+    return resultate
+
+
+def lade_baseline(pfad=BASELINE_DATEI):
+    if not os.path.exists(pfad):
+        return {}
+    with open(pfad) as f:
+        return json.load(f)
+
+
+def speichere_baseline(resultate, pfad=BASELINE_DATEI):
+    """Übernimmt die Resultate (pro Szenario) in die Baseline-Datei."""
+    baseline = lade_baseline(pfad)
+    baseline.update(resultate)
+    os.makedirs(os.path.dirname(pfad), exist_ok=True)
+    with open(pfad, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def vergleiche(resultate, baseline, toleranz=1.5):
+    """Stufen, die mehr als toleranz-mal langsamer sind oder mehr Speicher brauchen als die Baseline.
+
+    Gibt eine Liste (szenario, stufe, grösse, baseline, aktuell) zurück. Sehr kurze
+    Stufen (unter 5 ms) werden bei der Laufzeit nicht bewertet, sie schwanken zu stark.
+    """
+    verschlechtert = []
+    for szenario, stufen in resultate.items():
+        for stufe, wert in stufen.items():
+            alt = baseline.get(szenario, {}).get(stufe)
+            if alt is None:
+                continue
+            if wert['sekunden'] > toleranz * alt['sekunden'] and wert['sekunden'] > 0.005:
+                verschlechtert.append((szenario, stufe, 'sekunden', alt['sekunden'], wert['sekunden']))
+            if wert['spitzen_mb'] > toleranz * alt['spitzen_mb'] and wert['spitzen_mb'] > 1:
+                verschlechtert.append((szenario, stufe, 'spitzen_mb', alt['spitzen_mb'], wert['spitzen_mb']))
+    return verschlechtert
+
+
+def drucke_resultate(resultate, baseline):
+    for szenario, stufen in resultate.items():
+        print(f"\n=== {szenario} ===")
+        print(f"{'Stufe':<18}{'Zeilen':>12}{'Sekunden':>11}{'Baseline':>11}{'Spitze MB':>11}")
+        for stufe, wert in stufen.items():
+            alt = baseline.get(szenario, {}).get(stufe, {}).get('sekunden')
+            alt = f"{alt:.4f}" if alt is not None else '-'
+            print(f"{stufe:<18}{wert['zeilen']:>12,}{wert['sekunden']:>11.4f}{alt:>11}{wert['spitzen_mb']:>11.1f}")
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Persistenter Cache für die aufbereiteten Stundendaten (bzw. Daten im Raster schritt)
+
+Der Cache-Schlüssel besteht aus dem SHA-256 der Quelldatei und den
+Parametern der Aufbereitung. Damit grosse Exporte nicht bei jedem Start neu
+gehasht werden, merkt sich eine kleine JSON-Datei Größe, mtime und Hash der
+Quelle; gehasht wird nur, wenn sich Größe oder mtime geändert haben.
+
+Der Ergebnis-Cache legt Simulationsergebnisse (SOC, Flüsse, Kennzahlen) unter
+dem Hash von Dateninhalt und allen Parametern ab, begrenzt auf eine Grösse
+mit Verdrängung der am längsten unbenutzten Einträge.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from batterysim.loader import (END_TIME, SCHRITT, SENSOREN, START_TIME, WERTE_DTYPE, lade_stundendaten,
+                               lade_stundendaten_stream, schritt_ns)
+from batterysim.profiling import gemessen, stufe
+
+# Bei Änderungen an der Aufbereitung erhöhen, damit alte Cache-Dateien ungültig werden
+CACHE_VERSION = 3
+
+
+def datei_hash(pfad, cache_dir):
+    """SHA-256 der Datei, wiederverwendet solange Größe und mtime gleich bleiben."""
+    stat = os.stat(pfad)
+    merker = os.path.join(cache_dir, os.path.basename(pfad) + '.hash.json')
+    try:
+        with open(merker) as f:
+            gespeichert = json.load(f)
+        if gespeichert['size'] == stat.st_size and gespeichert['mtime_ns'] == stat.st_mtime_ns:
+            return gespeichert['sha256']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    sha = hashlib.sha256()
+    with open(pfad, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    digest = sha.hexdigest()
+
+    with open(merker, 'w') as f:
+        json.dump({'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}, f)
+    return digest
+
+
+def _schreibe_atomar(pfad, **arrays):
+    # Eigene Temp-Datei pro Aufruf, damit parallele Prozesse mit demselben Schlüssel nicht kollidieren
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(pfad) or '.', suffix='.tmp.npz', delete=False) as tmp:
+        try:
+            np.savez(tmp, **arrays)
+        except BaseException:
+            tmp.close()
+            os.remove(tmp.name)
+            raise
+    os.replace(tmp.name, pfad)
+
+
+@gemessen('daten_cache')
+def lade_stundendaten_gecacht(full_path, sensors=SENSOREN, start_time=START_TIME,
+                              end_time=END_TIME, cache_dir=None, chunksize=None, schritt=SCHRITT,
+                              dtype=WERTE_DTYPE):
+    """Wie lade_stundendaten, aber mit binärem Cache (.npz) neben der Quelldatei.
+
+    Beim Warmstart wird nur die Cache-Datei gelesen (Zeit als int64-ns, Werte
+    in dtype); die CSV wird nur geparst, wenn sie sich geändert hat oder andere
+    Parameter verlangt werden. Mit chunksize wird die CSV dabei blockweise
+    gelesen (lade_stundendaten_stream).
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(full_path) or '.', '.cache')
+    os.makedirs(cache_dir, exist_ok=True)
+
+    parameter = {'version': CACHE_VERSION, 'sensors': list(sensors),
+                 'start_time': str(start_time), 'end_time': str(end_time),
+                 'schritt': str(pd.Timedelta(schritt_ns(schritt))), 'dtype': np.dtype(dtype).name}
+    schluessel = hashlib.sha256(
+        (datei_hash(full_path, cache_dir) + json.dumps(parameter, sort_keys=True)).encode()
+    ).hexdigest()[:16]
+    stamm = os.path.splitext(os.path.basename(full_path))[0]
+    cache_datei = os.path.join(cache_dir, f"{stamm}-{schluessel}.npz")
+
+    if os.path.exists(cache_datei):
+        with stufe('cache_lesen'), np.load(cache_datei) as npz:
+            index = pd.DatetimeIndex(npz['zeit_ns'], tz='UTC')
+            return pd.DataFrame(npz['werte'], index=index, columns=npz['spalten'].tolist())
+
+    if chunksize:
+        combined_df = lade_stundendaten_stream(full_path, sensors, start_time, end_time, chunksize, schritt, dtype)
+    else:
+        combined_df = lade_stundendaten(full_path, sensors, start_time, end_time, schritt, dtype)
+    with stufe('cache_schreiben'):
+        _schreibe_atomar(cache_datei,
+                         zeit_ns=combined_df.index.asi8,
+                         spalten=np.array(combined_df.columns, dtype=str),
+                         werte=combined_df.to_numpy(dtype=dtype))
+    return combined_df
+
+
+# ------------------- ERGEBNIS-CACHE -------------------
+
+# Bei Änderungen an Engine, Optimierer oder Bewertung erhöhen
+ERGEBNIS_VERSION = 1
+ERGEBNIS_CACHE_DIR = os.path.join('.cache', 'ergebnisse')
+MAX_ERGEBNIS_MB = 256
+
+
+def daten_fingerabdruck(*daten):
+    """SHA-256 über den Inhalt von Arrays, Serien oder DataFrames (inkl. Index und Spalten)."""
+    sha = hashlib.sha256()
+    for d in daten:
+        if isinstance(d, (pd.DataFrame, pd.Series)):
+            if isinstance(d, pd.DataFrame):
+                sha.update(json.dumps([str(c) for c in d.columns]).encode())
+            d = pd.util.hash_pandas_object(d, index=True).to_numpy()
+        d = np.ascontiguousarray(d)
+        sha.update(f"{d.dtype.str}{d.shape}".encode())
+        sha.update(d.tobytes())
+    return sha.hexdigest()
+
+
+def _kanonisch(wert):
+    """Parameter in eine JSON-Form bringen, die nicht von Typ oder Reihenfolge abhängt."""
+    if isinstance(wert, dict):
+        return {str(k): _kanonisch(v) for k, v in wert.items()}
+    if isinstance(wert, np.ndarray):
+        return _kanonisch(wert.tolist())
+    if isinstance(wert, (list, tuple)):
+        return [_kanonisch(v) for v in wert]
+    if wert is None or isinstance(wert, (bool, np.bool_)):
+        return wert if wert is None else bool(wert)
+    if isinstance(wert, (int, float, np.integer, np.floating)):
+        return float(wert)
+    return str(wert)
+
+
+def ergebnis_schluessel(fingerabdruck, parameter):
+    """Cache-Schlüssel aus Daten-Fingerabdruck und allen Parametern (Simulation, Tarife, ...)."""
+    text = json.dumps({'version': ERGEBNIS_VERSION, 'daten': fingerabdruck, 'parameter': _kanonisch(parameter)},
+                      sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode()).hexdigest()[:24]
+
+
+def _raeume_auf(cache_dir, max_mb):
+    """Älteste Einträge (zuletzt benutzt laut mtime) löschen, bis der Cache unter max_mb liegt."""
+    eintraege = []
+    for name in os.listdir(cache_dir):
+        if name.endswith('.npz') and not name.endswith('.tmp.npz'):
+            try:
+                stat = os.stat(os.path.join(cache_dir, name))
+            except OSError:
+                continue
+            eintraege.append((stat.st_mtime_ns, stat.st_size, name))
+    groesse = sum(e[1] for e in eintraege)
+    for _, bytes_, name in sorted(eintraege):
+        if groesse <= max_mb * 1e6:
+            break
+        try:
+            os.remove(os.path.join(cache_dir, name))
+        except OSError:
+            continue
+        groesse -= bytes_
+
+
+def ergebnis_gecacht(berechne, fingerabdruck, parameter, cache_dir=ERGEBNIS_CACHE_DIR,
+                     max_mb=MAX_ERGEBNIS_MB):
+    """Ergebnis von berechne() aus dem Cache oder neu berechnet und abgelegt.
+
+    berechne() gibt (arrays, metriken) zurück: ein dict mit numpy-Arrays (z.B.
+    SOC und Flüsse) und ein dict mit JSON-fähigen Kennzahlen. Der Schlüssel
+    ist der Inhalt der Daten (fingerabdruck) plus der kanonische Hash von
+    parameter. Jeder Treffer frischt die mtime auf; übersteigt der Cache
+    max_mb, fallen die am längsten unbenutzten Einträge weg (LRU).
+    Gibt (arrays, metriken, treffer) zurück.
+    """
+    schluessel = ergebnis_schluessel(fingerabdruck, parameter)
+    cache_datei = os.path.join(cache_dir, f"{schluessel}.npz")
+    try:
+        with stufe('ergebnis_cache_lesen'), np.load(cache_datei) as npz:
+            arrays = {name: npz[name] for name in npz.files if name != '_metriken'}
+            metriken = json.loads(str(npz['_metriken']))
+        os.utime(cache_datei)
+        return arrays, metriken, True
+    except (OSError, ValueError, KeyError):
+        pass
+
+    arrays, metriken = berechne()
+    os.makedirs(cache_dir, exist_ok=True)
+    _schreibe_atomar(cache_datei, _metriken=np.array(json.dumps(_kanonisch(metriken))),
+                     **{name: np.asarray(wert) for name, wert in arrays.items()})
+    _raeume_auf(cache_dir, max_mb)
+    return arrays, metriken, False
+
+
+def simuliere_akku_gecacht(pv_uebrig_kwh, max_akku_kapazitat, cache_dir=ERGEBNIS_CACHE_DIR,
+                           max_mb=MAX_ERGEBNIS_MB, **akku_parameter):
+    """Wie simuliere_akku, aber aus dem Ergebnis-Cache. Gibt (AkkuErgebnis, treffer) zurück."""
+    from batterysim.engine import AkkuErgebnis, simuliere_akku
+
+    pv_uebrig = np.asarray(pv_uebrig_kwh, dtype=np.float64)
+    # Standardwerte ausgeschrieben, damit ein explizit übergebener Standard denselben Schlüssel ergibt
+    aufruf = inspect.signature(simuliere_akku).bind(pv_uebrig, max_akku_kapazitat, **akku_parameter)
+    aufruf.apply_defaults()
+    parameter = {'funktion': 'simuliere_akku', **aufruf.arguments}
+    del parameter['pv_uebrig_kwh']
+    arrays, _, treffer = ergebnis_gecacht(
+        lambda: (simuliere_akku(pv_uebrig, max_akku_kapazitat, **akku_parameter)._asdict(), {}),
+        daten_fingerabdruck(pv_uebrig), parameter, cache_dir, max_mb)
+    return AkkuErgebnis(**arrays), treffer
@@ -0,0 +1,597 @@
+# -*- coding: utf-8 -*-
+"""
+Kommandozeile: batterysim [--profil zeit|speicher] simulate | sweep | montecarlo | lifetime | size | tariffs | optimize | windows | check | quality | fleet | archive | bench
+
+Die schweren Abhängigkeiten (pandas, Loader, Engine) werden erst im
+jeweiligen Unterbefehl importiert, damit --help und der Start schnell bleiben.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+STANDARD_DATEI = "data/energyData24Hourly.csv"
+
+
+def _lade(args):
+    from batterysim.cache import lade_stundendaten_gecacht
+    from batterysim.loader import erweitere_pv, zeitintervall_h
+
+    if args.archiv:
+        from batterysim.store import oeffne_standort
+
+        if not args.standort:
+            sys.exit("--archiv verlangt --standort")
+        combined_df = oeffne_standort(args.archiv, args.standort).daten(args.start, args.ende,
+                                                                         west_faktor=args.west_faktor)
+        if getattr(args, 'zeitintervall', 0) is None:
+            args.zeitintervall = zeitintervall_h(combined_df.index)
+        return combined_df
+    combined_df = lade_stundendaten_gecacht(args.daten, start_time=args.start, end_time=args.ende,
+                                            chunksize=args.chunksize, schritt=args.schritt)
+    # Ohne --zeitintervall gilt der Schritt der Daten (Leistungsgrenzen in kWh pro Schritt)
+    if getattr(args, 'zeitintervall', 0) is None:
+        args.zeitintervall = zeitintervall_h(combined_df.index)
+    return erweitere_pv(combined_df, west_faktor=args.west_faktor)
+
+
+def _akku_parameter(args):
+    return {'min_soc': args.min_soc, 'max_lade_leistung': args.lade_leistung,
+            'max_entlade_leistung': args.entlade_leistung,
+            'akku_wirkungsgrad_laden': args.wirkungsgrad_laden,
+            'akku_wirkungsgrad_entladen': args.wirkungsgrad_entladen,
+            'zeitintervall': args.zeitintervall, 'start_soc': args.start_soc}
+
+
+def _cache_dir(args):
+    # Neben den Daten: im Archiv, sonst im Ordner des Exports
+    if args.cache_dir:
+        return args.cache_dir
+    if args.archiv:
+        return os.path.join(args.archiv, '.cache', 'ergebnisse')
+    return os.path.join(os.path.dirname(args.daten) or '.', '.cache', 'ergebnisse')
+
+
+def _gecacht(args, combined_df, parameter, berechne):
+    """berechne() -> (arrays, metriken) über den Ergebnis-Cache, Treffer werden gemeldet."""
+    if args.kein_cache:
+        return berechne()
+    from batterysim.cache import daten_fingerabdruck, ergebnis_gecacht
+
+    arrays, metriken, treffer = ergebnis_gecacht(berechne, daten_fingerabdruck(combined_df),
+                                                 {'befehl': args.befehl, **parameter},
+                                                 _cache_dir(args), args.cache_mb)
+    # Bei --json nach stderr, damit stdout gültiges JSON bleibt
+    print(f"Ergebnis-Cache: {'Treffer' if treffer else 'neu berechnet'}",
+          file=sys.stderr if args.json else sys.stdout)
+    return arrays, metriken
+
+
+def _tarif_schluessel(args, tarife):
+    """Tarife für den Cache-Schlüssel; bei Preis-CSVs zählt deren Inhalt, nicht der Pfad."""
+    from batterysim.cache import datei_hash
+
+    os.makedirs(_cache_dir(args), exist_ok=True)
+    return [{**tarif, 'csv': datei_hash(tarif['csv'], _cache_dir(args))} if 'csv' in tarif else tarif
+            for tarif in tarife]
+
+
+def _tabelle(metriken, index):
+    import pandas as pd
+
+    return pd.DataFrame(metriken).set_index(index)
+
+
+def simulate(args):
+    from batterysim.economics import akku_ersparnis, energie_summary
+    from batterysim.engine import simuliere_akku
+    from batterysim.report import drucke_energie_summary, drucke_jahresstatistik
+
+    combined_df = _lade(args)
+
+    def berechne():
+        akku_ergebnis = simuliere_akku(combined_df['pv_uebrig_kwh'].to_numpy(), args.kapazitaet,
+                                       **_akku_parameter(args))
+        summary = energie_summary(combined_df, akku_ergebnis)
+        ersparnis = akku_ersparnis(summary['akku_energie_von_pv_kwh'], summary['akku_entnahmen_kwh'],
+                                   args.bezug_rp, args.einspeisung_rp)
+        return akku_ergebnis._asdict(), {'summary': summary, 'ersparnis': ersparnis}
+
+    parameter = {'kapazitaet': args.kapazitaet, 'einspeisung_rp': args.einspeisung_rp,
+                 'bezug_rp': args.bezug_rp, **_akku_parameter(args)}
+    _, metriken = _gecacht(args, combined_df, parameter, berechne)
+    summary, ersparnis = metriken['summary'], metriken['ersparnis']
+    if args.json:
+        print(json.dumps({k: float(v) for k, v in {**summary, **ersparnis}.items()}, indent=2))
+    else:
+        drucke_jahresstatistik(combined_df, zusatz=' (ohne Akku)')
+        drucke_energie_summary(summary, ersparnis)
+
+
+def sweep(args):
+    from batterysim.report import drucke_sweep
+    from batterysim.sweep import kapazitaets_sweep
+
+    combined_df = _lade(args)
+
+    def berechne():
+        akku_resultate = kapazitaets_sweep(combined_df['pv_uebrig_kwh'], args.kapazitaeten,
+                                           strompreis_bezug_rp=args.bezug_rp,
+                                           einspeiseverg_rp=args.einspeisung_rp, **_akku_parameter(args))
+        return {}, akku_resultate.reset_index().to_dict(orient='list')
+
+    parameter = {'kapazitaeten': args.kapazitaeten, 'einspeisung_rp': args.einspeisung_rp,
+                 'bezug_rp': args.bezug_rp, **_akku_parameter(args)}
+    akku_resultate = _tabelle(_gecacht(args, combined_df, parameter, berechne)[1], 'kapazitaet_kwh')
+    if args.csv:
+        akku_resultate.to_csv(args.csv)
+    if args.json:
+        print(akku_resultate.reset_index().to_json(orient='records', indent=2))
+    else:
+        drucke_sweep(akku_resultate)
+
+
+def montecarlo(args):
+    from batterysim.montecarlo import monte_carlo_sweep
+    from batterysim.report import drucke_monte_carlo
+
+    combined_df = _lade(args)
+
+    def berechne():
+        tabelle, ersparnis = monte_carlo_sweep(combined_df['pv_uebrig_kwh'], args.kapazitaeten, jahre=args.jahre,
+                                               strompreis_bezug_rp=args.bezug_rp,
+                                               einspeiseverg_rp=args.einspeisung_rp, block_tage=args.block_tage,
+                                               seed=args.seed, prozesse=args.prozesse, **_akku_parameter(args))
+        return {'ersparnis': ersparnis}, tabelle.reset_index().to_dict(orient='list')
+
+    # Die Anzahl Prozesse ändert das Ergebnis nicht und gehört deshalb nicht in den Schlüssel
+    parameter = {'kapazitaeten': args.kapazitaeten, 'jahre': args.jahre, 'block_tage': args.block_tage,
+                 'seed': args.seed, 'einspeisung_rp': args.einspeisung_rp, 'bezug_rp': args.bezug_rp,
+                 **_akku_parameter(args)}
+    arrays, metriken = _gecacht(args, combined_df, parameter, berechne)
+    tabelle = _tabelle(metriken, 'kapazitaet_kwh')
+    if args.csv:
+        import pandas as pd
+
+        pd.DataFrame(arrays['ersparnis'], columns=tabelle.index).to_csv(args.csv, index_label='jahr')
+    if args.json:
+        print(tabelle.reset_index().to_json(orient='records', indent=2))
+    else:
+        drucke_monte_carlo(tabelle, args.jahre)
+
+
+def lifetime(args):
+    from batterysim.degradation import simuliere_mit_alterung
+    from batterysim.report import drucke_lebensdauer
+
+    combined_df = _lade(args)
+    modell = {'zyklen_100': args.zyklen_100, 'woehler_exponent': args.woehler_exponent,
+              'kalender_verlust_10j': args.kalender_verlust}
+
+    def berechne():
+        tabelle = simuliere_mit_alterung(combined_df['pv_uebrig_kwh'].to_numpy(), args.kapazitaeten,
+                                         jahre=args.jahre, strompreis_bezug_rp=args.bezug_rp,
+                                         einspeiseverg_rp=args.einspeisung_rp, modell=modell,
+                                         **_akku_parameter(args))
+        return {}, tabelle.reset_index().to_dict(orient='list')
+
+    parameter = {'kapazitaeten': args.kapazitaeten, 'jahre': args.jahre, 'modell': modell,
+                 'einspeisung_rp': args.einspeisung_rp, 'bezug_rp': args.bezug_rp, **_akku_parameter(args)}
+    tabelle = _tabelle(_gecacht(args, combined_df, parameter, berechne)[1], ['kapazitaet_kwh', 'jahr'])
+    if args.csv:
+        tabelle.to_csv(args.csv)
+    if args.json:
+        print(tabelle.reset_index().to_json(orient='records', indent=2))
+    else:
+        drucke_lebensdauer(tabelle)
+
+
+def size(args):
+    from batterysim.economics import annuitaet
+    from batterysim.report import drucke_optimale_kapazitaet
+    from batterysim.sweep import optimale_kapazitaet
+
+    combined_df = _lade(args)
+    kosten = args.kosten_pro_kwh
+    if kosten is None:
+        kosten = annuitaet(args.preis_pro_kwh, args.lebensdauer, args.zins)
+
+    def berechne():
+        optimum = optimale_kapazitaet(combined_df['pv_uebrig_kwh'], kosten, strompreis_bezug_rp=args.bezug_rp,
+                                      einspeiseverg_rp=args.einspeisung_rp, k_max=args.k_max,
+                                      aufloesung=args.aufloesung, toleranz_chf_pro_kwh=args.toleranz,
+                                      **_akku_parameter(args))
+        return {}, {k: v for k, v in optimum.items() if k != 'punkte'}
+
+    parameter = {'kosten_pro_kwh': kosten, 'k_max': args.k_max, 'aufloesung': args.aufloesung,
+                 'toleranz': args.toleranz, 'einspeisung_rp': args.einspeisung_rp, 'bezug_rp': args.bezug_rp,
+                 **_akku_parameter(args)}
+    _, optimum = _gecacht(args, combined_df, parameter, berechne)
+    # Aus dem Cache kommen alle Zahlen als float
+    optimum['simulationen'] = int(optimum['simulationen'])
+    if args.json:
+        print(json.dumps({k: float(v) for k, v in optimum.items()}, indent=2))
+    else:
+        drucke_optimale_kapazitaet(optimum, kosten)
+
+
+def tariffs(args):
+    from batterysim.engine import simuliere_akku
+    from batterysim.report import drucke_tarife
+    from batterysim.tariff import bewerte_tarife, lade_tarife
+
+    combined_df = _lade(args)
+    tarife = [tarif for pfad in args.tarife for tarif in lade_tarife(pfad)]
+    # Der bisherige Festpreis als Vergleich, sofern keine Datei einen Tarif 'fix' hat
+    if 'fix' not in {tarif['name'] for tarif in tarife}:
+        tarife.insert(0, {'name': 'fix', 'bezug_rp': args.bezug_rp, 'einspeisung_rp': args.einspeisung_rp})
+
+    def berechne():
+        # Eine Simulation, alle Tarife über dieselben Netzflüsse
+        akku_ergebnis = simuliere_akku(combined_df['pv_uebrig_kwh'].to_numpy(), args.kapazitaet,
+                                       **_akku_parameter(args))
+        tabelle = bewerte_tarife(combined_df['pv_uebrig_kwh'], akku_ergebnis, tarife)
+        return akku_ergebnis._asdict(), tabelle.reset_index().to_dict(orient='list')
+
+    parameter = {'kapazitaet': args.kapazitaet, 'tarife': _tarif_schluessel(args, tarife), **_akku_parameter(args)}
+    tabelle = _tabelle(_gecacht(args, combined_df, parameter, berechne)[1], 'tarif')
+    if args.csv:
+        tabelle.to_csv(args.csv)
+    if args.json:
+        print(tabelle.reset_index().to_json(orient='records', indent=2))
+    else:
+        drucke_tarife(tabelle)
+
+
+def optimize(args):
+    import numpy as np
+    import pandas as pd
+
+    from batterysim.dispatch import vergleiche_mit_greedy
+    from batterysim.report import drucke_fahrweise
+    from batterysim.tariff import lade_tarife, preis_matrizen
+
+    combined_df = _lade(args)
+    if args.tarife:
+        tarife = {tarif['name']: tarif for tarif in lade_tarife(args.tarife)}
+        tarif = tarife[args.tarif] if args.tarif else next(iter(tarife.values()))
+    else:
+        tarif = {'name': 'fix', 'bezug_rp': args.bezug_rp, 'einspeisung_rp': args.einspeisung_rp}
+    bezug_rp, einspeisung_rp = preis_matrizen([tarif], combined_df.index)
+
+    kapazitaeten = np.asarray(args.kapazitaeten, dtype=np.float64)
+
+    def berechne():
+        return vergleiche_mit_greedy(combined_df['pv_uebrig_kwh'].to_numpy(), bezug_rp[:, 0], einspeisung_rp[:, 0],
+                                     kapazitaeten, netz_laden=args.netz_laden, netz_entladen=args.netz_entladen,
+                                     **_akku_parameter(args)), {}
+
+    parameter = {'kapazitaeten': kapazitaeten, 'tarif': _tarif_schluessel(args, [tarif])[0],
+                 'netz_laden': args.netz_laden, 'netz_entladen': args.netz_entladen, **_akku_parameter(args)}
+    vergleich, _ = _gecacht(args, combined_df, parameter, berechne)
+    tabelle = pd.DataFrame(vergleich, index=pd.Index(kapazitaeten, name='kapazitaet_kwh'))
+    if args.csv:
+        tabelle.to_csv(args.csv)
+    if args.json:
+        print(tabelle.reset_index().to_json(orient='records', indent=2))
+    else:
+        drucke_fahrweise(tabelle, tarif['name'])
+
+
+def windows(args):
+    import pandas as pd
+
+    from batterysim.engine import simuliere_akku
+    from batterysim.report import drucke_fenster
+    from batterysim.windows import fenster_analyse
+
+    combined_df = _lade(args)
+
+    def berechne():
+        akku_ergebnis = simuliere_akku(combined_df['pv_uebrig_kwh'].to_numpy(), args.kapazitaet,
+                                       **_akku_parameter(args))
+        tabellen = fenster_analyse(combined_df, akku_ergebnis, args.fenster, args.bezug_rp, args.einspeisung_rp,
+                                   laenge=args.laenge, schritt=args.verschiebung)
+        return {}, {art: tabelle.reset_index().to_dict(orient='list') for art, tabelle in tabellen.items()}
+
+    parameter = {'kapazitaet': args.kapazitaet, 'fenster': args.fenster, 'laenge': args.laenge,
+                 'verschiebung': args.verschiebung, 'einspeisung_rp': args.einspeisung_rp,
+                 'bezug_rp': args.bezug_rp, **_akku_parameter(args)}
+    _, metriken = _gecacht(args, combined_df, parameter, berechne)
+    tabellen = {art: _tabelle(werte, 'fenster') for art, werte in metriken.items()}
+    # Aus dem Cache kommen die Fenstergrenzen als Text
+    for tabelle in tabellen.values():
+        tabelle['von'] = pd.to_datetime(tabelle['von'], utc=True)
+        tabelle['bis'] = pd.to_datetime(tabelle['bis'], utc=True)
+    alle = pd.concat(tabellen, names=['art'])
+    if args.csv:
+        alle.to_csv(args.csv)
+    if args.json:
+        print(alle.reset_index().to_json(orient='records', date_format='iso', indent=2))
+    else:
+        drucke_fenster(tabellen)
+
+
+def check(args):
+    from batterysim.economics import jahresstatistik
+    from batterysim.loader import SENSOREN
+    from batterysim.report import drucke_jahresstatistik, drucke_sensor_statistik
+
+    combined_df = _lade(args)
+    if args.json:
+        werte = combined_df[SENSOREN]
+        sensoren = {sensor: {'schritte': len(werte), 'schritte_mit_werten': int((werte[sensor] != 0).sum())}
+                    for sensor in SENSOREN}
+        statistik = {k: float(v) for k, v in jahresstatistik(combined_df).items()}
+        print(json.dumps({'sensoren': sensoren, **statistik}, indent=2))
+    else:
+        drucke_sensor_statistik(combined_df, SENSOREN)
+        drucke_jahresstatistik(combined_df)
+
+
+def quality(args):
+    from batterysim.quality import pruefe_export, zusammenfassung
+    from batterysim.report import drucke_datenqualitaet
+
+    befunde = pruefe_export(args.daten, max_luecke_h=args.max_luecke_h, spitzen_faktor=args.spitzen_faktor,
+                            max_kw=args.max_kw, haenger_h=args.haenger_h)
+    if args.csv:
+        befunde.to_csv(args.csv, index=False)
+    if args.json:
+        print(befunde.to_json(orient='records', date_format='iso', indent=2))
+    else:
+        drucke_datenqualitaet(befunde, zusammenfassung(befunde))
+    # Für nächtliche Importe: Exit-Code 1, sobald ein nicht ignorierter Befund vorliegt
+    if (~befunde['art'].isin(args.ignoriere)).any():
+        sys.exit(1)
+
+
+def fleet(args):
+    from batterysim.fleet import simuliere_flotte
+
+    parameter = _akku_parameter(args)
+    zeitintervall = parameter.pop('zeitintervall')
+    resultate = simuliere_flotte(args.quelle, args.start, args.ende, schritt=args.schritt,
+                                 west_faktor=args.west_faktor,
+                                 strompreis_bezug_rp=args.bezug_rp, einspeiseverg_rp=args.einspeisung_rp,
+                                 zeitintervall=zeitintervall, max_speicher_mb=args.max_speicher_mb,
+                                 prozesse=args.prozesse, max_akku_kapazitat=args.kapazitaet, **parameter)
+    if args.csv:
+        resultate.to_csv(args.csv)
+    if args.json:
+        print(resultate.reset_index().to_json(orient='records', indent=2))
+    else:
+        print(resultate.to_string(float_format=lambda x: f"{x:.2f}"))
+
+
+def archive(args):
+    from batterysim.store import archiv_index, importiere_standorte
+
+    if args.quelle:
+        tabelle = importiere_standorte(args.quelle, args.archiv, args.start, args.ende, schritt=args.schritt,
+                                       west_faktor=args.west_faktor, chunksize=args.chunksize,
+                                       prozesse=args.prozesse)
+    else:
+        tabelle = archiv_index(args.archiv)
+    if args.json:
+        print(tabelle.reset_index().to_json(orient='records', date_format='iso', indent=2))
+    else:
+        print(tabelle.to_string())
+
+
+def bench(args):
+    from batterysim.benchmark import (drucke_resultate, fuehre_szenario_aus, lade_baseline,
+                                      speichere_baseline, vergleiche)
+
+    baseline = lade_baseline()
+    resultate = {name: fuehre_szenario_aus(name, args.ordner) for name in args.szenario}
+    drucke_resultate(resultate, baseline)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(resultate, f, indent=2)
+    if args.baseline_speichern:
+        speichere_baseline(resultate)
+        print("\nBaseline aktualisiert.")
+        return
+
+    verschlechtert = vergleiche(resultate, baseline, args.toleranz)
+    for szenario, stufe, groesse, alt, neu in verschlechtert:
+        print(f"VERSCHLECHTERT {szenario}/{stufe}: {groesse} {alt} -> {neu}")
+    if verschlechtert:
+        sys.exit(1)
+
+
+def _daten_optionen(west_faktor):
+    """Gemeinsame Optionen der Befehle mit Daten; west_faktor ist der Standard von --west-faktor
+    (None: loader.WEST_FAKTOR)."""
+    daten = argparse.ArgumentParser(add_help=False)
+    daten.add_argument('--daten', default=STANDARD_DATEI, help="HomeAssistant Export (entity_id, state, last_changed)")
+    daten.add_argument('--start', default='2024-01-01 00:00:00', help="Beginn des Stundenrasters (UTC)")
+    daten.add_argument('--ende', default='2024-12-31 23:00:00', help="Ende des Stundenrasters (UTC), beliebig viele Jahre")
+    daten.add_argument('--schritt', default='h', help="Zeitschritt des Rasters, z.B. h, 15min, 5min, 1min")
+    daten.add_argument('--chunksize', type=int, help="CSV blockweise lesen (grosse Exporte)")
+    daten.add_argument('--archiv', help="Statt --daten aus einem Archiv lesen (siehe archive, Schritt des Archivs)")
+    daten.add_argument('--standort', help="Standort im Archiv")
+    daten.add_argument('--west-faktor', type=float, default=west_faktor,
+                       help=f"Erweiterungsfaktor der West-Anlage (Standard: {west_faktor or 'WEST_FAKTOR'})")
+    daten.add_argument('--json', action='store_true', help="Ergebnis als JSON ausgeben")
+    return daten
+
+
+def _parser():
+    parser = argparse.ArgumentParser(prog='batterysim',
+                                     description="Akku Simulation mit HomeAssistant Energie Daten")
+    parser.add_argument('--profil', choices=['zeit', 'speicher'],
+                        help="Laufzeit (und Speicher) pro Stufe messen, Tabelle nach stderr")
+    parser.add_argument('--profil-json', help="Profil zusätzlich als JSON speichern ('-': eine Zeile nach stderr)")
+    unterbefehle = parser.add_subparsers(dest='befehl', required=True)
+
+    daten = _daten_optionen(west_faktor=None)
+
+    akku = argparse.ArgumentParser(add_help=False)
+    akku.add_argument('--min-soc', type=float, default=0.1)
+    akku.add_argument('--lade-leistung', type=float, default=3.0, help="kW")
+    akku.add_argument('--entlade-leistung', type=float, default=3.0, help="kW")
+    akku.add_argument('--wirkungsgrad-laden', type=float, default=0.95)
+    akku.add_argument('--wirkungsgrad-entladen', type=float, default=0.95)
+    akku.add_argument('--start-soc', type=float, default=0.5)
+    akku.add_argument('--zeitintervall', type=float, help="Stunden pro Zeitschritt (Standard: aus den Daten)")
+    # Preise ohne Angabe aus economics (siehe _standardwerte), für alle Befehle gleich
+    akku.add_argument('--bezug-rp', type=float, help="Strompreis Bezug (Rp/kWh, Standard: STROMPREIS_BEZUG_RP)")
+    akku.add_argument('--einspeisung-rp', type=float,
+                      help="Einspeisevergütung (Rp/kWh, Standard: EINSPEISEVERG_RP; tariffs: für den Festpreis-Tarif)")
+
+    ergebnis = argparse.ArgumentParser(add_help=False)
+    ergebnis.add_argument('--cache-dir', help="Ergebnis-Cache (Standard: .cache/ergebnisse neben --daten)")
+    ergebnis.add_argument('--cache-mb', type=float, default=256, help="Grösse des Ergebnis-Caches (LRU)")
+    ergebnis.add_argument('--kein-cache', action='store_true', help="Immer neu rechnen")
+
+    p = unterbefehle.add_parser('simulate', parents=[daten, akku, ergebnis], help="Einen Akku simulieren (wie 01_BatteryCalculator)")
+    p.add_argument('--kapazitaet', type=float, default=20.0, help="kWh")
+    p.set_defaults(funktion=simulate)
+
+    p = unterbefehle.add_parser('sweep', parents=[daten, akku, ergebnis], help="Mehrere Akkugrößen vergleichen (wie 02_BatteryDimensioniser, dort --einspeisung-rp 7.5)")
+    p.add_argument('--kapazitaeten', type=float, nargs='+', default=[5, 10, 15, 20, 25, 35], help="kWh")
+    p.add_argument('--csv', help="Ergebnistabelle zusätzlich als CSV speichern")
+    p.set_defaults(funktion=sweep)
+
+    p = unterbefehle.add_parser('montecarlo', parents=[daten, akku, ergebnis],
+                                help="Ersparnis-Perzentile pro Akkugröße über synthetische Jahre")
+    p.add_argument('--kapazitaeten', type=float, nargs='+', default=[5, 10, 15, 20, 25, 35], help="kWh")
+    p.add_argument('--jahre', type=int, default=1000, help="Anzahl synthetischer Jahre")
+    p.add_argument('--block-tage', type=int, default=7, help="Länge der gezogenen Blöcke (Tage)")
+    p.add_argument('--seed', type=int, default=0, help="Startwert des Zufallsgenerators")
+    p.add_argument('--prozesse', type=int, help="Anzahl Prozesse (Standard: alle Kerne)")
+    p.add_argument('--csv', help="Ersparnis jedes synthetischen Jahres als CSV speichern")
+    p.set_defaults(funktion=montecarlo)
+
+    p = unterbefehle.add_parser('lifetime', parents=[daten, akku, ergebnis],
+                                help="Mehrjahressimulation mit Zyklen- und Kalenderalterung")
+    p.add_argument('--kapazitaeten', type=float, nargs='+', default=[5, 10, 15, 20, 25, 35], help="kWh")
+    p.add_argument('--jahre', type=int, default=15, help="Betriebsjahre (die Daten werden wiederholt)")
+    p.add_argument('--zyklen-100', type=float, default=6000.0, help="Vollzyklen mit 100%% Tiefe bis zum Lebensende")
+    p.add_argument('--woehler-exponent', type=float, default=1.3, help="Exponent der Zyklentiefe")
+    p.add_argument('--kalender-verlust', type=float, default=0.08, help="Kalendarischer Verlust nach 10 Jahren")
+    p.add_argument('--csv', help="Tabelle pro Akkugröße und Jahr als CSV speichern")
+    p.set_defaults(funktion=lifetime)
+
+    p = unterbefehle.add_parser('size', parents=[daten, akku, ergebnis], help="Akkugröße mit dem höchsten Nettowert suchen")
+    p.add_argument('--preis-pro-kwh', type=float, default=600.0, help="Investition pro kWh (CHF)")
+    p.add_argument('--lebensdauer', type=float, default=15.0, help="Jahre")
+    p.add_argument('--zins', type=float, default=0.0, help="Kalkulationszins, z.B. 0.02")
+    p.add_argument('--kosten-pro-kwh', type=float, help="Jährliche Kosten pro kWh direkt (statt Preis/Lebensdauer)")
+    p.add_argument('--k-max', type=float, help="Grösste zulässige Kapazität (kWh)")
+    p.add_argument('--aufloesung', type=float, default=0.1, help="kWh")
+    p.add_argument('--toleranz', type=float, default=0.0, help="Abbruch, wenn der Nettowert pro kWh weniger ändert (CHF)")
+    p.set_defaults(funktion=size)
+
+    p = unterbefehle.add_parser('tariffs', parents=[daten, akku, ergebnis], help="Netzkosten unter mehreren Tarifen vergleichen")
+    p.add_argument('tarife', nargs='+', help="JSON-Dateien mit Tarifen (Zeitfenster oder Preis-CSV, siehe batterysim.tariff)")
+    p.add_argument('--kapazitaet', type=float, default=20.0, help="kWh")
+    p.add_argument('--csv', help="Tabelle pro Tarif als CSV speichern")
+    p.set_defaults(funktion=tariffs)
+
+    p = unterbefehle.add_parser('optimize', parents=[daten, akku, ergebnis],
+                                help="Kostenoptimale Fahrweise mit der bisherigen vergleichen")
+    p.add_argument('--kapazitaeten', type=float, nargs='+', default=[5, 10, 15, 20, 25, 35], help="kWh")
+    p.add_argument('--tarife', help="JSON-Datei mit Tarifen (ohne: Festpreis aus --bezug-rp/--einspeisung-rp)")
+    p.add_argument('--tarif', help="Name des Tarifs aus --tarife (Standard: der erste)")
+    p.add_argument('--netz-laden', action='store_true', help="Laden aus dem Netz erlauben")
+    p.add_argument('--netz-entladen', action='store_true', help="Einspeisen aus dem Akku erlauben")
+    p.add_argument('--csv', help="Tabelle pro Akkugröße als CSV speichern")
+    p.set_defaults(funktion=optimize)
+
+    p = unterbefehle.add_parser('windows', parents=[daten, akku, ergebnis],
+                                help="Autarkie, Eigenverbrauch und Ersparnis pro Jahr, Saison und rollendem Fenster")
+    p.add_argument('--kapazitaet', type=float, default=20.0, help="kWh")
+    p.add_argument('--fenster', nargs='+', choices=['jahr', 'saison', 'rollend'], default=['jahr', 'saison', 'rollend'])
+    p.add_argument('--laenge', default='30D', help="Länge der rollenden Fenster")
+    p.add_argument('--verschiebung', default='1D', help="Verschiebung der rollenden Fenster")
+    p.add_argument('--csv', help="Alle Fenster als CSV speichern")
+    p.set_defaults(funktion=windows)
+
+    # Eigene Optionen, weil DataChecker die West-Anlage mit 7 statt 6 erweitert
+    p = unterbefehle.add_parser('check', parents=[_daten_optionen(west_faktor=7.0)],
+                                help="Sensor- und Jahresstatistik (wie DataChecker, --west-faktor 7)")
+    p.set_defaults(funktion=check)
+
+    # Arten wie quality.BEFUND_ARTEN, hier ohne Import, damit --help schnell bleibt
+    befund_arten = ['ungueltig', 'doppelt', 'luecke', 'reset', 'spitze', 'haenger']
+    p = unterbefehle.add_parser('quality', help="Rohe Zählerstände prüfen (Lücken, Resets, Sprünge, ...)")
+    p.add_argument('--daten', default=STANDARD_DATEI, help="HomeAssistant Export (entity_id, state, last_changed)")
+    p.add_argument('--max-luecke-h', type=float, help="Grösster erlaubter Abstand (Standard: 3x typischer Abstand)")
+    p.add_argument('--spitzen-faktor', type=float, default=20.0, help="Vielfaches des 99%%-Quantils der Leistung")
+    p.add_argument('--max-kw', type=float, help="Höchste plausible Leistung (kW)")
+    p.add_argument('--haenger-h', type=float, default=48.0, help="Stunden ohne Änderung bis zum Befund")
+    p.add_argument('--ignoriere', nargs='*', default=[], choices=befund_arten,
+                   help="Befund-Arten, die den Exit-Code nicht auf 1 setzen")
+    p.add_argument('--csv', help="Befunde als CSV speichern")
+    p.add_argument('--json', action='store_true', help="Befunde als JSON ausgeben")
+    p.set_defaults(funktion=quality)
+
+    p = unterbefehle.add_parser('fleet', parents=[akku], help="Viele Standorte gemeinsam simulieren")
+    p.add_argument('quelle', help="Ordner mit Exporten (*.csv), Archiv oder Manifest (standort, datei, ...)")
+    p.add_argument('--start', default='2024-01-01 00:00:00', help="Beginn des gemeinsamen Stundenrasters")
+    p.add_argument('--ende', default='2024-12-31 23:00:00', help="Ende des gemeinsamen Stundenrasters")
+    p.add_argument('--schritt', default='h', help="Zeitschritt des Rasters, z.B. h, 15min, 5min, 1min")
+    p.add_argument('--west-faktor', type=float, default=1.0,
+                   help="Erweiterungsfaktor der West-Anlage (Standard: 1.0, fremde Standorte ohne Ausbau)")
+    p.add_argument('--kapazitaet', type=float, default=20.0, help="kWh (sofern nicht im Manifest)")
+    p.add_argument('--max-speicher-mb', type=float, default=2048, help="Grösse der Matrix bis zur Aufteilung")
+    p.add_argument('--prozesse', type=int, help="Anzahl Prozesse (Standard: alle Kerne)")
+    p.add_argument('--csv', help="Tabelle pro Standort als CSV speichern")
+    p.add_argument('--json', action='store_true', help="Ergebnis als JSON ausgeben")
+    p.set_defaults(funktion=fleet)
+
+    p = unterbefehle.add_parser('archive', help="Standorte in ein memory-mapped Archiv importieren oder auflisten")
+    p.add_argument('archiv', help="Ordner des Archivs")
+    p.add_argument('--import', dest='quelle', help="Ordner mit Exporten (*.csv) oder Manifest; ohne: Archiv auflisten")
+    p.add_argument('--start', default='2024-01-01 00:00:00', help="Beginn des importierten Zeitraums (UTC)")
+    p.add_argument('--ende', default='2024-12-31 23:00:00', help="Ende des importierten Zeitraums (UTC)")
+    p.add_argument('--schritt', default='h', help="Zeitschritt des Rasters, z.B. h, 15min, 5min, 1min")
+    p.add_argument('--chunksize', type=int, help="CSV blockweise lesen (grosse Exporte)")
+    p.add_argument('--west-faktor', type=float, help="Erweiterungsfaktor der West-Anlage (Standard: WEST_FAKTOR)")
+    p.add_argument('--prozesse', type=int, help="Anzahl Prozesse (Standard: alle Kerne)")
+    p.add_argument('--json', action='store_true', help="Ergebnis als JSON ausgeben")
+    p.set_defaults(funktion=archive)
+
+    # Namen wie benchmark.SZENARIEN, hier ohne Import, damit --help schnell bleibt
+    szenarien = ['1j_60min', '1j_15min', '3j_60min_20sensoren', 'gross']
+    p = unterbefehle.add_parser('bench', help="Benchmarks auf synthetischen Exporten")
+    p.add_argument('--szenario', nargs='+', choices=szenarien, default=szenarien[:3])
+    p.add_argument('--ordner', default='benchmarks/.daten', help="Ablage der erzeugten Exporte")
+    p.add_argument('--toleranz', type=float, default=1.5, help="Faktor gegenüber der Baseline")
+    p.add_argument('--baseline-speichern', action='store_true', help="Resultate als neue Baseline übernehmen")
+    p.add_argument('--json', help="Resultate zusätzlich als JSON speichern")
+    p.set_defaults(funktion=bench)
+    return parser
+
+
+def _standardwerte(args):
+    """Nicht angegebene Preise und West-Faktor aus economics bzw. loader einsetzen. Erst
+    hier importiert, damit --help schnell bleibt; so gilt pro Parameter ein einziger Standard."""
+    namen = ('bezug_rp', 'einspeisung_rp', 'west_faktor')
+    if not any(getattr(args, name, 0) is None for name in namen):
+        return
+    from batterysim.economics import EINSPEISEVERG_RP, STROMPREIS_BEZUG_RP
+    from batterysim.loader import WEST_FAKTOR
+
+    for name, wert in zip(namen, (STROMPREIS_BEZUG_RP, EINSPEISEVERG_RP, WEST_FAKTOR)):
+        if getattr(args, name, 0) is None:
+            setattr(args, name, wert)
+
+
+def main(argv=None):
+    args = _parser().parse_args(argv)
+    _standardwerte(args)
+    from batterysim import profiling
+
+    if args.profil or args.profil_json:
+        profiling.aktiviere(args.profil or 'zeit', args.profil_json)
+    with profiling.stufe(args.befehl):
+        args.funktion(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+Akku-Alterung: Rainflow-Zählung des SOC-Verlaufs und Kapazitätsverlust
+
+Die Zyklen werden mit dem Vier-Punkt-Verfahren gezählt (gleiche volle Zyklen
+wie ASTM E1049, der Rest am Ende zählt als halbe Zyklen). Gezählt wird
+gleichzeitig für alle Konfigurationen: ein Stapel pro Konfiguration als Zeile
+eines Arrays, jeder Zeitschritt ist eine Handvoll Masken-Operationen über alle
+Zeilen. Zyklen werden nicht gespeichert, sondern sofort in Schaden, Anzahl
+Vollzyklen und ein Histogramm der Zyklentiefe aufsummiert. Der Verlauf darf
+blockweise kommen (z.B. Jahr für Jahr über 15 Jahre in Minutenauflösung),
+vorher fallen alle Zeitschritte weg, die für keine Konfiguration ein
+Umkehrpunkt sind.
+
+Kapazitätsverlust = zyklisch + kalendarisch:
+    zyklisch     lebensende_verlust * Σ w * Tiefe^woehler_exponent / zyklen_100
+                 (w = 1 voller, 0.5 halber Zyklus, Tiefe relativ zur Kapazität)
+    kalendarisch kalender_verlust_10j * sqrt(Jahre / 10) * exp(soc_faktor * (mittlerer SOC - 0.5))
+"""
+
+import numpy as np
+import pandas as pd
+
+from batterysim.economics import EINSPEISEVERG_RP, STROMPREIS_BEZUG_RP
+from batterysim.engine import simuliere_akku
+from batterysim.profiling import gemessen, notiere_zeilen, stufe
+
+# Modellparameter mit Standardwert (grob für LFP-Heimspeicher)
+ALTERUNGS_MODELL = {
+    'zyklen_100': 6000.0,           # Vollzyklen mit 100 % Tiefe bis zum Lebensende
+    'woehler_exponent': 1.3,        # > 1: flache Zyklen schaden weniger als anteilig
+    'lebensende_verlust': 0.2,      # Kapazitätsverlust am Lebensende (80 % Restkapazität)
+    'kalender_verlust_10j': 0.08,   # Kalendarischer Verlust nach 10 Jahren bei 50 % SOC
+    'soc_faktor': 1.0,              # Einfluss des mittleren SOC auf die kalendarische Alterung
+}
+
+# Klassengrenzen der Zyklentiefe (Anteil der Kapazität) für das Histogramm
+TIEFEN_KLASSEN = np.linspace(0.0, 1.0, 11)
+
+
+def _modell(modell):
+    unbekannt = set(modell or {}) - set(ALTERUNGS_MODELL)
+    if unbekannt:
+        raise ValueError(f"Unbekannte Alterungs-Parameter: {sorted(unbekannt)}")
+    return {**ALTERUNGS_MODELL, **(modell or {})}
+
+
+# ------------------- RAINFLOW -------------------
+
+def rainflow_zustand(konfigurationen, woehler_exponent=ALTERUNGS_MODELL['woehler_exponent'], tiefe=64):
+    """Leerer Zählerzustand für konfigurationen SOC-Verläufe (wächst bei Bedarf)."""
+    return {
+        'stapel': np.zeros((konfigurationen, tiefe)),
+        'groesse': np.zeros(konfigurationen, dtype=np.int64),
+        'woehler_exponent': woehler_exponent,
+        'schaden': np.zeros(konfigurationen),
+        'vollzyklen': np.zeros(konfigurationen),
+        'histogramm': np.zeros((konfigurationen, len(TIEFEN_KLASSEN) - 1)),
+        'soc_summe': np.zeros(konfigurationen),
+        'schritte': 0,
+    }
+
+
+def _umkehrpunkte(soc):
+    """Zeilen, die für mindestens eine Spalte ein Umkehrpunkt sind, dazu erste und letzte Zeile.
+
+    Flache Stücke (Akku voll oder leer) zählen zur vorherigen Richtung.
+    """
+    richtung = np.sign(np.diff(soc, axis=0))
+    n = len(richtung)
+    # Letzte Richtung ungleich 0 bis einschliesslich Zeile j (vorwärts aufgefüllt)
+    letzte = np.where(richtung != 0, np.arange(n)[:, np.newaxis], 0)
+    np.maximum.accumulate(letzte, axis=0, out=letzte)
+    bisher = np.take_along_axis(richtung, letzte, axis=0)
+    umkehr = (richtung[1:] != 0) & (bisher[:-1] != 0) & (richtung[1:] != bisher[:-1])
+    return np.flatnonzero(np.r_[True, umkehr.any(axis=1), True])
+
+
+def _zaehle(zustand, zeilen, tiefen, gewicht):
+    """Zyklen (Tiefe und Gewicht je Eintrag) in Schaden, Vollzyklen und Histogramm aufsummieren."""
+    # add.at, weil eine Konfiguration mehrfach vorkommen darf (Rest am Ende)
+    np.add.at(zustand['schaden'], zeilen, gewicht * tiefen ** zustand['woehler_exponent'])
+    np.add.at(zustand['vollzyklen'], zeilen, gewicht * tiefen)
+    klasse = np.clip(np.searchsorted(TIEFEN_KLASSEN, tiefen, side='right') - 1, 0, len(TIEFEN_KLASSEN) - 2)
+    np.add.at(zustand['histogramm'], (zeilen, klasse), gewicht)
+
+
+@gemessen('rainflow')
+def rainflow_fortsetzen(zustand, soc):
+    """Zählt den nächsten Block eines SOC-Verlaufs (Anteil der Kapazität, 0..1).
+
+    soc hat die Zeit auf Achse 0 und eine Spalte pro Konfiguration (oder ist
+    1-D für eine). Der Zustand aus rainflow_zustand wird fortgeschrieben.
+    """
+    soc = np.asarray(soc, dtype=np.float64)
+    if soc.ndim == 1:
+        soc = soc[:, np.newaxis]
+    if len(soc) == 0:
+        return zustand
+    notiere_zeilen(soc.size)
+    zustand['soc_summe'] += soc.sum(axis=0)
+    zustand['schritte'] += len(soc)
+
+    with stufe('umkehrpunkte'):
+        punkte = soc[_umkehrpunkte(soc)] if len(soc) > 2 else soc
+    alle = np.arange(soc.shape[1])
+    groesse = zustand['groesse']
+    for x in punkte:
+        stapel = zustand['stapel']
+        if groesse.max() + 1 >= stapel.shape[1]:
+            stapel = zustand['stapel'] = np.pad(stapel, ((0, 0), (0, stapel.shape[1])))
+        oben = stapel[alle, np.maximum(groesse - 1, 0)]
+        darunter = stapel[alle, np.maximum(groesse - 2, 0)]
+        # Gleiche Richtung wie das letzte Stück: Endpunkt verschieben, sonst neuen Punkt anlegen
+        weiter = (groesse >= 2) & ((x - oben) * (oben - darunter) >= 0)
+        neu = ~weiter & ((groesse == 0) | (x != oben))
+        stapel[alle, np.where(neu, groesse, np.maximum(groesse - 1, 0))] = np.where(weiter | neu, x, oben)
+        groesse += neu
+
+        # Vier-Punkt-Regel: |b - c| <= |a - b| und <= |c - d| schliesst den vollen Zyklus b-c
+        while True:
+            zeilen = np.flatnonzero(groesse >= 4)
+            if len(zeilen) == 0:
+                break
+            g = groesse[zeilen]
+            a, b, c, d = (stapel[zeilen, g - i] for i in (4, 3, 2, 1))
+            bc = np.abs(b - c)
+            zu = (bc <= np.abs(a - b)) & (bc <= np.abs(c - d))
+            if not zu.any():
+                break
+            zeilen, g = zeilen[zu], g[zu]
+            _zaehle(zustand, zeilen, bc[zu], 1.0)
+            stapel[zeilen, g - 3] = d[zu]
+            groesse[zeilen] -= 2
+    return zustand
+
+
+def rainflow_ergebnis(zustand):
+    """Zählung bis jetzt; der offene Rest zählt als halbe Zyklen (der Zustand bleibt unverändert).
+
+    Gibt ein dict mit Arrays pro Konfiguration zurück: vollzyklen (Σ w * Tiefe,
+    äquivalente Vollzyklen), schaden (Σ w * Tiefe^k), histogramm (Zyklen pro
+    Klasse aus TIEFEN_KLASSEN) und mittlerer_soc.
+    """
+    rest = {name: zustand[name].copy() for name in ('schaden', 'vollzyklen', 'histogramm')}
+    rest['woehler_exponent'] = zustand['woehler_exponent']
+    stapel, groesse = zustand['stapel'], zustand['groesse']
+    tiefen = np.abs(np.diff(stapel, axis=1))
+    zeilen, spalten = np.nonzero(np.arange(tiefen.shape[1]) < (groesse - 1)[:, np.newaxis])
+    _zaehle(rest, zeilen, tiefen[zeilen, spalten], 0.5)
+    rest.pop('woehler_exponent')
+    rest['mittlerer_soc'] = zustand['soc_summe'] / max(zustand['schritte'], 1)
+    return rest
+
+
+def kapazitaetsverlust(schaden, jahre, mittlerer_soc, modell=None):
+    """Zyklischer und kalendarischer Kapazitätsverlust (Anteile) nach ALTERUNGS_MODELL."""
+    m = _modell(modell)
+    zyklisch = m['lebensende_verlust'] * np.asarray(schaden) / m['zyklen_100']
+    kalendarisch = (m['kalender_verlust_10j'] * np.sqrt(np.maximum(jahre, 0.0) / 10)
+                    * np.exp(m['soc_faktor'] * (np.asarray(mittlerer_soc) - 0.5)))
+    return zyklisch, kalendarisch
+
+
+@gemessen('alterung')
+def zyklen_und_alterung(soc_kwh, max_akku_kapazitat, zeitintervall=1.0, block=8760, modell=None):
+    """Rainflow-Zählung und Kapazitätsverlust eines simulierten SOC-Verlaufs (z.B. simu_akku_kwh).
+
+    soc_kwh hat die Zeit auf Achse 0 und optional eine Spalte pro Konfiguration
+    (wie simuliere_akku mit Array-Parametern); gezählt wird in Blöcken von
+    block Zeitschritten. Gibt eine Tabelle mit einer Zeile pro Konfiguration
+    zurück: vollzyklen, schaden, mittlerer_soc, verlust_zyklisch,
+    verlust_kalendarisch, restkapazitaet (Anteil) und die Zyklen pro Tiefenklasse.
+    """
+    m = _modell(modell)
+    soc = np.asarray(soc_kwh, dtype=np.float64)
+    if soc.ndim == 1:
+        soc = soc[:, np.newaxis]
+    kapazitaet = np.broadcast_to(np.asarray(max_akku_kapazitat, dtype=np.float64), soc.shape[1:])
+    zustand = rainflow_zustand(soc.shape[1], m['woehler_exponent'])
+    for start in range(0, len(soc), block):
+        rainflow_fortsetzen(zustand, soc[start:start + block] / kapazitaet)
+    return _alterungs_tabelle(rainflow_ergebnis(zustand), len(soc) * zeitintervall / 8760,
+                              pd.Index(kapazitaet, name='kapazitaet_kwh'), m)
+
+
+def _alterungs_tabelle(ergebnis, jahre, index, modell):
+    zyklisch, kalendarisch = kapazitaetsverlust(ergebnis['schaden'], jahre, ergebnis['mittlerer_soc'], modell)
+    tabelle = pd.DataFrame({'vollzyklen': ergebnis['vollzyklen'], 'schaden': ergebnis['schaden'],
+                            'mittlerer_soc': ergebnis['mittlerer_soc'], 'verlust_zyklisch': zyklisch,
+                            'verlust_kalendarisch': kalendarisch,
+                            'restkapazitaet': 1 - zyklisch - kalendarisch}, index=index)
+    for i, (unten, oben) in enumerate(zip(TIEFEN_KLASSEN[:-1], TIEFEN_KLASSEN[1:])):
+        tabelle[f"zyklen_{unten:.0%}_{oben:.0%}"] = ergebnis['histogramm'][:, i]
+    return tabelle
+
+
+# ------------------- MEHRJAHRESSIMULATION -------------------
+
+@gemessen('lebensdauer')
+def simuliere_mit_alterung(pv_uebrig_kwh, akku_groessen, jahre=15, schritte_pro_jahr=None,
+                           aktualisierungen_pro_jahr=12, strompreis_bezug_rp=STROMPREIS_BEZUG_RP,
+                           einspeiseverg_rp=EINSPEISEVERG_RP, zeitintervall=1.0, min_soc=0.1, start_soc=0.5, modell=None, **akku_parameter):
+    """Simuliert alle Akkugrößen über jahre Jahre mit nachlassender Kapazität.
+
+    pv_uebrig_kwh ist der Überschuss eines Jahres (schritte_pro_jahr, Standard
+    die ganze Reihe) und wird jedes Jahr wiederholt; längere Reihen werden
+    durchlaufen und am Ende von vorn begonnen. Das Jahr wird in
+    aktualisierungen_pro_jahr Abschnitte geteilt: jeder Abschnitt läuft mit der
+    Kapazität aus dem bisherigen Verlust, der SOC-Verlauf geht in die
+    Rainflow-Zählung und der Akku-Stand in den nächsten Abschnitt.
+
+    Gibt eine Tabelle mit einer Zeile pro Akkugröße und Jahr (Index
+    kapazitaet_kwh, jahr) zurück: kapazitaet_ende_kwh, restkapazitaet,
+    verlust_zyklisch, verlust_kalendarisch, vollzyklen (im Jahr), geladen_kwh,
+    entladen_kwh und ersparnis_chf.
+    """
+    m = _modell(modell)
+    pv_uebrig = np.asarray(pv_uebrig_kwh, dtype=np.float64)
+    nominal = np.asarray(akku_groessen, dtype=np.float64)
+    schritte_pro_jahr = schritte_pro_jahr or len(pv_uebrig)
+    grenzen = np.linspace(0, schritte_pro_jahr, aktualisierungen_pro_jahr + 1).round().astype(int)
+
+    zustand = rainflow_zustand(len(nominal), m['woehler_exponent'])
+    stand = nominal * start_soc
+    restkapazitaet = np.ones(len(nominal))
+    zeilen = []
+    for jahr in range(1, jahre + 1):
+        summen = {'geladen_kwh': 0.0, 'entladen_kwh': 0.0}
+        vollzyklen_vorher = rainflow_ergebnis(zustand)['vollzyklen']
+        for von, bis in zip(grenzen[:-1], grenzen[1:]):
+            kapazitaet = nominal * restkapazitaet
+            schritte = np.arange((jahr - 1) * schritte_pro_jahr + von, (jahr - 1) * schritte_pro_jahr + bis)
+            ergebnis = simuliere_akku(pv_uebrig[schritte % len(pv_uebrig)], kapazitaet, min_soc=min_soc,
+                                      start_soc=np.clip(stand / kapazitaet, min_soc, 1.0),
+                                      zeitintervall=zeitintervall, **akku_parameter)
+            rainflow_fortsetzen(zustand, ergebnis.soc / kapazitaet)
+            summen['geladen_kwh'] = summen['geladen_kwh'] + ergebnis.geladen.sum(axis=0)
+            summen['entladen_kwh'] = summen['entladen_kwh'] + ergebnis.entladen.sum(axis=0)
+            stand = ergebnis.soc[-1]
+
+            stand_jetzt = rainflow_ergebnis(zustand)
+            zyklisch, kalendarisch = kapazitaetsverlust(stand_jetzt['schaden'], zustand['schritte'] * zeitintervall
+                                                        / 8760, stand_jetzt['mittlerer_soc'], m)
+            restkapazitaet = np.maximum(1 - zyklisch - kalendarisch, 0.0)
+
+        zeilen.append(pd.DataFrame({
+            'kapazitaet_kwh': nominal, 'jahr': jahr, 'kapazitaet_ende_kwh': nominal * restkapazitaet,
+            'restkapazitaet': restkapazitaet, 'verlust_zyklisch': zyklisch,
+            'verlust_kalendarisch': kalendarisch, 'vollzyklen': stand_jetzt['vollzyklen'] - vollzyklen_vorher,
+            **summen,
+            'ersparnis_chf': (summen['entladen_kwh'] * strompreis_bezug_rp
+                              - summen['geladen_kwh'] * einspeiseverg_rp) / 100,
+        }))
+    return pd.concat(zeilen).set_index(['kapazitaet_kwh', 'jahr']).sort_index()
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Kostenoptimale Fahrweise des Akkus bei zeitabhängigen Preisen
+
+Dynamische Programmierung rückwärts über die Zeit, ohne den Akku-Stand zu
+rastern. Die Netzkosten eines Zeitschritts sind in der Änderung des
+Akku-Stands stückweise linear und konvex (drei Stücke: Einspeisen aus dem
+Akku, Eigenverbrauch bzw. PV-Überschuss laden, Laden aus dem Netz). Damit
+bleiben die Restkosten V stückweise linear und konvex, und ihre Steigungen
+sind immer Steigungen dieser Kostenstücke. V wird deshalb nur über
+P(σ) = kleinstes Minimum von V(x) - σx auf den vorkommenden Steigungen σ
+geführt: die Minimierung über den nächsten Zustand (Infimal-Faltung) wird zur
+Addition von P beider Funktionen, die Kapazitätsgrenzen zum Klemmen.
+"""
+
+import numpy as np
+
+from batterysim.engine import AkkuErgebnis, simuliere_akku
+from batterysim.profiling import gemessen
+
+# Preise gehen auf dieses Raster gerundet in die Entscheidung ein, damit z.B.
+# bei Spotpreisen nicht jede Stunde eine eigene Stufe braucht (Rp/kWh)
+PREIS_RASTER_RP = 0.1
+
+
+def _zeitreihe(werte, form):
+    """Skalar, (Zeitschritte,) oder (Zeitschritte, Konfigurationen) auf form bringen."""
+    werte = np.asarray(werte, dtype=np.float64)
+    return np.broadcast_to(werte.reshape(-1, 1) if werte.ndim < 2 else werte, form)
+
+
+def standard_restwert_rp(einspeisung_rp, akku_wirkungsgrad_entladen=0.95):
+    """Wert einer kWh im Akku am Ende: mittlerer Einspeisepreis nach Entladeverlust."""
+    einspeisung = np.asarray(einspeisung_rp, dtype=np.float64)
+    mittel = einspeisung.mean(axis=0) if einspeisung.ndim else einspeisung
+    return np.asarray(akku_wirkungsgrad_entladen, dtype=np.float64) * mittel
+
+
+@gemessen('optimierung', zeilen=lambda ergebnis: ergebnis.soc.size)
+def optimiere_akku(pv_uebrig_kwh, bezug_rp, einspeisung_rp, max_akku_kapazitat, min_soc=0.1,
+                   max_lade_leistung=3.0, max_entlade_leistung=3.0,
+                   akku_wirkungsgrad_laden=0.95, akku_wirkungsgrad_entladen=0.95,
+                   zeitintervall=1.0, start_soc=0.5, netz_laden=False, netz_entladen=False,
+                   restwert_rp=None, preis_raster_rp=PREIS_RASTER_RP):
+    """Fahrplan mit minimalen Netzkosten bei bekannten Preisen (Rp/kWh pro Zeitschritt).
+
+    Grenzen und Wirkungsgrade wie in simuliere_akku; Akku-Parameter dürfen
+    1-D Arrays sein (eine Konfiguration pro Eintrag), pv_uebrig_kwh und die
+    Preise auch (Zeitschritte, Konfigurationen). netz_laden erlaubt Laden aus
+    dem Netz, netz_entladen Einspeisen aus dem Akku; ohne beides entscheidet
+    der Optimierer nur, wie viel PV-Überschuss geladen und wann der Akku für
+    das Haus entladen wird. Der Akku-Stand am Ende zählt restwert_rp pro kWh
+    (Standard: standard_restwert_rp), sonst würde der Akku zum Schluss nur
+    geleert. Die Preise gehen auf preis_raster_rp gerundet in die
+    Entscheidung ein (None: exakt), die Flüsse im Ergebnis sind exakt.
+    Gibt ein AkkuErgebnis zurück (geladen/entladen auf der Hausseite).
+    """
+    pv_uebrig = np.asarray(pv_uebrig_kwh, dtype=np.float64)
+    parameter = [np.asarray(p, dtype=np.float64) for p in (
+        max_akku_kapazitat, min_soc, max_lade_leistung, max_entlade_leistung,
+        akku_wirkungsgrad_laden, akku_wirkungsgrad_entladen, start_soc)]
+    eindimensional = pv_uebrig.ndim == 1 and all(p.ndim == 0 for p in parameter)
+    k = np.broadcast_shapes(*(p.shape for p in parameter), pv_uebrig.shape[1:], (1,))[0]
+    (max_akku_kapazitat, min_soc, max_lade_leistung, max_entlade_leistung,
+     eta_l, eta_e, start_soc) = [np.broadcast_to(p, (k,)) for p in parameter]
+    form = (len(pv_uebrig), k)
+    u = _zeitreihe(pv_uebrig, form)
+    p_bezug, p_einsp = _zeitreihe(bezug_rp, form), _zeitreihe(einspeisung_rp, form)
+    if (netz_laden or netz_entladen) and (p_einsp > p_bezug).any():
+        raise ValueError("Einspeisepreis über dem Bezugspreis: Laden und Einspeisen über den Akku "
+                         "wäre unbegrenzt lohnend (netz_laden/netz_entladen)")
+
+    untere = max_akku_kapazitat * min_soc
+    obere = max_akku_kapazitat
+    akku_start = max_akku_kapazitat * start_soc
+
+    # Änderung des Akku-Stands pro Schritt: Leistungsgrenzen und die zwei Knicke
+    # (Defizit gedeckt bzw. Überschuss aufgebraucht), dazwischen liegt Änderung 0
+    d_min = np.broadcast_to(-max_entlade_leistung * zeitintervall / eta_e, form)
+    d_max = np.broadcast_to(max_lade_leistung * zeitintervall * eta_l, form)
+    knick_unten = np.maximum(np.minimum(u, 0.0) / eta_e, d_min)
+    knick_oben = np.minimum(np.maximum(u, 0.0) * eta_l, d_max)
+    if not netz_entladen:
+        d_min = knick_unten
+    if not netz_laden:
+        d_max = knick_oben
+
+    # Kostensteigungen der drei Stücke (Rp pro kWh Akku-Stand), aufsteigend
+    steigungen = np.stack([eta_e * p_einsp, np.where(u < 0, eta_e * p_bezug, p_einsp / eta_l),
+                           p_bezug / eta_l], axis=1)
+    if restwert_rp is None:
+        restwert_rp = standard_restwert_rp(p_einsp, eta_e)
+    restwert_rp = np.broadcast_to(np.asarray(restwert_rp, dtype=np.float64), (k,))
+    if preis_raster_rp:
+        steigungen = np.round(steigungen / preis_raster_rp) * preis_raster_rp
+        restwert_rp = np.round(restwert_rp / preis_raster_rp) * preis_raster_rp
+
+    # Stufen σ: alle Steigungen, die V haben kann; P an Stufe m gilt für σ in (σ_m-1, σ_m]
+    stufen = np.unique(np.concatenate([-steigungen.ravel(), -restwert_rp]))
+    nummern = np.searchsorted(stufen, -steigungen)
+    m = np.arange(len(stufen))
+    zeilen = np.arange(k) * len(stufen)
+    untere_s, obere_s = untere[:, np.newaxis], obere[:, np.newaxis]
+
+    # Am Ende V(x) = -restwert * x: das kleinste Minimum liegt unten für σ <= -restwert
+    stellen = np.where(stufen <= -restwert_rp[:, np.newaxis], untere_s, obere_s)
+
+    # Rückwärts; pro Schritt nur die Minima von Steigung * x + V(x) der drei Stücke merken
+    minima = np.empty((form[0], 3, k))
+    for t in range(form[0] - 1, -1, -1):
+        minima[t] = stellen.ravel().take(nummern[t] + zeilen)
+        # Kosten als Funktion von -Änderung: kleinstes Minimum am Ende eines Stücks, je nach σ
+        stueck = (m > nummern[t, 2][:, np.newaxis]).astype(np.intp)
+        stueck += m > nummern[t, 1][:, np.newaxis]
+        stueck += m > nummern[t, 0][:, np.newaxis]
+        enden = np.stack([d_max[t], knick_oben[t], knick_unten[t], d_min[t]], axis=1)
+        stellen -= enden.ravel().take(stueck + (np.arange(k) * 4)[:, np.newaxis])
+        np.clip(stellen, untere_s, obere_s, out=stellen)
+
+    # Vorwärts: Minimum der konvexen Funktion über alle Stücke, auf das Erreichbare geklemmt
+    soc = np.empty(form)
+    stand = akku_start
+    for t in range(form[0]):
+        m_a, m_b, m_c = minima[t]
+        ziel = np.maximum(np.minimum(m_a, stand + knick_unten[t]), np.minimum(m_b, stand + knick_oben[t]))
+        np.maximum(ziel, np.minimum(m_c, stand + d_max[t]), out=ziel)
+        soc[t] = stand = np.clip(ziel, np.maximum(stand + d_min[t], untere), np.minimum(stand + d_max[t], obere))
+
+    delta = np.diff(soc, axis=0, prepend=akku_start[np.newaxis])
+    geladen = np.maximum(delta, 0.0) / eta_l
+    entladen = np.maximum(-delta, 0.0) * eta_e
+    netz = geladen - entladen - u
+    ergebnis = AkkuErgebnis(soc, geladen, entladen, np.maximum(netz, 0.0), np.maximum(-netz, 0.0))
+    if eindimensional:
+        return AkkuErgebnis(*(a[:, 0] for a in ergebnis))
+    return ergebnis
+
+
+def netzkosten_chf(akku_ergebnis, bezug_rp, einspeisung_rp):
+    """Netzkosten (CHF): Bezug minus Einspeisevergütung, pro Konfiguration."""
+    form = akku_ergebnis.netzbezug.shape
+    netzbezug = akku_ergebnis.netzbezug.reshape(form[0], -1)
+    einspeisung = akku_ergebnis.einspeisung.reshape(form[0], -1)
+    kosten = ((netzbezug * _zeitreihe(bezug_rp, netzbezug.shape)).sum(axis=0)
+              - (einspeisung * _zeitreihe(einspeisung_rp, einspeisung.shape)).sum(axis=0)) / 100
+    return kosten.reshape(form[1:])
+
+
+def vergleiche_mit_greedy(pv_uebrig_kwh, bezug_rp, einspeisung_rp, max_akku_kapazitat,
+                          netz_laden=False, netz_entladen=False, preis_raster_rp=PREIS_RASTER_RP,
+                          **akku_parameter):
+    """Netzkosten der bisherigen Fahrweise (simuliere_akku) und der optimalen im Vergleich.
+
+    Beide Fahrpläne werden mit denselben Preisen und demselben Restwert des
+    Akku-Stands am Ende (gegenüber dem Start) bewertet. Gibt ein dict mit
+    Werten pro Konfiguration zurück: kosten_ohne_akku_chf, kosten_greedy_chf,
+    kosten_optimal_chf und luecke_chf (was die optimale Fahrweise zusätzlich spart).
+    """
+    pv_uebrig = np.asarray(pv_uebrig_kwh, dtype=np.float64)
+    greedy = simuliere_akku(pv_uebrig, max_akku_kapazitat, **akku_parameter)
+    optimal = optimiere_akku(pv_uebrig, bezug_rp, einspeisung_rp, max_akku_kapazitat, netz_laden=netz_laden,
+                             netz_entladen=netz_entladen, preis_raster_rp=preis_raster_rp, **akku_parameter)
+
+    restwert_rp = standard_restwert_rp(einspeisung_rp, akku_parameter.get('akku_wirkungsgrad_entladen', 0.95))
+    start = np.asarray(max_akku_kapazitat, dtype=np.float64) * akku_parameter.get('start_soc', 0.5)
+
+    def bewertet(ergebnis):
+        return netzkosten_chf(ergebnis, bezug_rp, einspeisung_rp) - (ergebnis.soc[-1] - start) * restwert_rp / 100
+
+    ohne_akku = AkkuErgebnis(None, None, None, np.maximum(-pv_uebrig, 0.0), np.maximum(pv_uebrig, 0.0))
+    kosten_greedy = bewertet(greedy)
+    kosten_optimal = bewertet(optimal)
+    return {
+        'kosten_ohne_akku_chf': np.broadcast_to(netzkosten_chf(ohne_akku, bezug_rp, einspeisung_rp),
+                                                kosten_greedy.shape),
+        'kosten_greedy_chf': kosten_greedy,
+        'kosten_optimal_chf': kosten_optimal,
+        'luecke_chf': kosten_greedy - kosten_optimal,
+    }
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Energiebilanz und Wirtschaftlichkeit eines simulierten Akkus
+"""
+
+import numpy as np
+import pandas as pd
+
+from batterysim.loader import EINSPEISUNG_SENSOR, NETZBEZUG_SENSOR
+from batterysim.profiling import gemessen, notiere_zeilen
+
+STROMPREIS_BEZUG_RP = 22.5      # Rappen pro kWh für Bezug
+EINSPEISEVERG_RP = 7.5 * 0.8    # Rappen pro kWh für Einspeisung
+
+
+@gemessen('energie_summary')
+def energie_summary(combined_df, akku_ergebnis):
+    """Energiebilanz über den ganzen Zeitraum (kWh) für combined_df mit
+    pv_gesamt_kwh_erweitert und hausverbrauch_kwh (siehe erweitere_pv).
+
+    Statt eines DataFrames geht auch ein dict mit (Stunden x Standorte)-Arrays;
+    dann ist jeder Wert ein Array mit einem Eintrag pro Standort.
+    """
+    verbrauch = np.asarray(combined_df['hausverbrauch_kwh'])
+    pv = np.asarray(combined_df['pv_gesamt_kwh_erweitert'])
+
+    # Gesamtverbrauch (Haus) und Gesamt-PV-Produktion
+    gesamt_verbrauch_kwh = verbrauch.sum(axis=0)
+    gesamt_pv_kwh = pv.sum(axis=0)
+
+    # PV direkt genutzt (nicht eingespeist)
+    pv_direktnutzung_kwh = np.where(pv >= verbrauch, verbrauch, pv).sum(axis=0)
+
+    # PV-Energie in den Akku bzw. aus dem Akku
+    akku_energie_von_pv_kwh = akku_ergebnis.geladen.sum(axis=0)
+    akku_entnahmen_kwh = akku_ergebnis.entladen.sum(axis=0)
+
+    # Autarkiegrad (wie viel % des Verbrauchs durch PV + Akku gedeckt wurde)
+    eingespart_kwh = pv_direktnutzung_kwh + akku_entnahmen_kwh
+
+    return {
+        'gesamt_verbrauch_kwh': gesamt_verbrauch_kwh,
+        'gesamt_pv_kwh': gesamt_pv_kwh,
+        'pv_direktnutzung_kwh': pv_direktnutzung_kwh,
+        'akku_energie_von_pv_kwh': akku_energie_von_pv_kwh,
+        'akku_entnahmen_kwh': akku_entnahmen_kwh,
+        'netzbezug_kwh': np.asarray(combined_df[NETZBEZUG_SENSOR]).sum(axis=0),
+        'eingespart_kwh': eingespart_kwh,
+        'autarkiegrad': eingespart_kwh / gesamt_verbrauch_kwh * 100,
+    }
+
+
+def jahresstatistik(combined_df):
+    """Summen (kWh) sowie Autarkie-Grad und Eigenverbrauchsquote (%) laut Sensoren, ohne Akku."""
+    summen = combined_df.sum()
+    return {
+        'pv_gesamt_kwh_erweitert': summen['pv_gesamt_kwh_erweitert'],
+        'hausverbrauch_kwh': summen['hausverbrauch_kwh'],
+        'pv_uebrig_kwh': summen['pv_uebrig_kwh'],
+        'netznutzung_kwh': summen[NETZBEZUG_SENSOR],
+        'netzeinspeisung_kwh': summen[EINSPEISUNG_SENSOR],
+        'autarkie_grad': (1 - summen[NETZBEZUG_SENSOR] / summen['hausverbrauch_kwh']) * 100,
+        'eigenverbrauchsquote': ((summen['pv_gesamt_kwh_erweitert'] - summen[EINSPEISUNG_SENSOR])
+                                 / summen['pv_gesamt_kwh_erweitert'] * 100),
+    }
+
+
+def akku_ersparnis(akku_energie_von_pv_kwh, akku_entnahmen_kwh,
+                   strompreis_bezug_rp=STROMPREIS_BEZUG_RP, einspeiseverg_rp=EINSPEISEVERG_RP):
+    """Nettoersparnis durch den Akku: vermiedener Netzbezug minus entgangene Einspeisevergütung."""
+    ersparnis_rp = akku_entnahmen_kwh * strompreis_bezug_rp
+    verlust_rp = akku_energie_von_pv_kwh * einspeiseverg_rp
+    return {
+        'ersparnis_durch_vermeidung_netbezug_rp': ersparnis_rp,
+        'verlust_durch_verhinderte_einspeisung_rp': verlust_rp,
+        'netto_ersparnis_akku_chf': (ersparnis_rp - verlust_rp) / 100,
+    }
+
+
+def annuitaet(preis_chf, jahre, zins=0.0):
+    """Jährliche Kosten einer Investition über ihre Lebensdauer (Annuität, bei zins 0 linear)."""
+    if zins == 0:
+        return preis_chf / jahre
+    return preis_chf * zins / (1 - (1 + zins) ** -jahre)
+
+
+# ------------------- PERIODEN (MONAT, JAHR, ...) -------------------
+
+def perioden_index(zeitindex, periode='M'):
+    """Periodennummer pro Zeitschritt und die Perioden selbst (sortiert), z.B. für 'M' oder 'Y'.
+
+    Einmal berechnet, lassen sich damit beliebig viele Reihen per bincount summieren.
+    """
+    zeitindex = pd.DatetimeIndex(zeitindex)
+    if zeitindex.tz is not None:
+        zeitindex = zeitindex.tz_convert('UTC').tz_localize(None)
+    nummern, perioden = pd.factorize(zeitindex.to_period(periode), sort=True)
+    return nummern, perioden
+
+
+def summiere_perioden(werte, nummern, anzahl):
+    """Summen pro Periode für werte der Form (Zeitschritte,) oder (Zeitschritte, Konfigurationen).
+
+    Liegen die Perioden zeitlich am Stück (z.B. Monate eines sortierten Index),
+    reicht ein np.add.reduceat über die Periodenanfänge; sonst (z.B. Saison über
+    mehrere Jahre) ein einziges bincount, in dem jede (Periode, Konfiguration)
+    einen eigenen Behälter hat. Ergebnis: (anzahl,) bzw. (anzahl, Konfigurationen).
+    """
+    werte = np.asarray(werte, dtype=np.float64)
+    wechsel = np.diff(nummern)
+    if len(nummern) and nummern[0] == 0 and ((wechsel == 0) | (wechsel == 1)).all() and nummern[-1] == anzahl - 1:
+        anfaenge = np.flatnonzero(np.r_[True, wechsel != 0])
+        return np.add.reduceat(werte, anfaenge, axis=0)
+    if werte.ndim == 1:
+        return np.bincount(nummern, weights=werte, minlength=anzahl)
+    k = werte.shape[1]
+    behaelter = (nummern[:, np.newaxis] * k + np.arange(k)).ravel()
+    return np.bincount(behaelter, weights=werte.ravel(), minlength=anzahl * k).reshape(anzahl, k)
+
+
+# Zeitschritte pro Block, so dass ein Block vieler Konfigurationen im Cache bleibt
+_BLOCK_ZEITSCHRITTE = 128
+
+
+def _soc_summen(soc, akku_start, perioden_nummern):
+    """Summe der SOC-Differenzen und ihres positiven Teils pro Periode, blockweise über
+    die Zeit, ohne die Differenzen aller Zeitschritte auf einmal zu speichern.
+
+    perioden_nummern ist ein dict {periode: (nummern, anzahl)}; Ergebnis
+    {periode: (netto, geladen)} mit Arrays (anzahl,) bzw. (anzahl, Konfigurationen).
+    """
+    soc = np.asarray(soc, dtype=np.float64)
+    vorher = soc[:1] if akku_start is None else np.broadcast_to(akku_start, (1,) + soc.shape[1:])
+    summen = {p: (np.zeros((anzahl,) + soc.shape[1:]), np.zeros((anzahl,) + soc.shape[1:]))
+              for p, (_, anzahl) in perioden_nummern.items()}
+
+    for a in range(0, len(soc), _BLOCK_ZEITSCHRITTE):
+        b = min(a + _BLOCK_ZEITSCHRITTE, len(soc))
+        akku_diff = soc[a:b] - (soc[a - 1:b - 1] if a > 0 else np.concatenate([vorher, soc[:b - 1]]))
+        positiv = np.maximum(akku_diff, 0.0)
+        for p, (nummern, _) in perioden_nummern.items():
+            nr = nummern[a:b]
+            erste, letzte = nr.min(), nr.max() + 1
+            netto, geladen = summen[p]
+            netto[erste:letzte] += summiere_perioden(akku_diff, nr - erste, letzte - erste)
+            geladen[erste:letzte] += summiere_perioden(positiv, nr - erste, letzte - erste)
+    return summen
+
+
+@gemessen('perioden_summen')
+def ersparnis_pro_periode(soc, zeitindex, strompreis_bezug_rp=STROMPREIS_BEZUG_RP,
+                          einspeiseverg_rp=EINSPEISEVERG_RP, perioden=('M', 'Y'), akku_start=None,
+                          akku_wirkungsgrad_laden=0.95, akku_wirkungsgrad_entladen=0.95):
+    """Geladen, entladen (kWh) und Nettoersparnis (CHF) pro Kalenderperiode für
+    einen oder viele SOC-Verläufe.
+
+    soc hat die Form (Zeitschritte,) oder (Zeitschritte, Konfigurationen),
+    akku_start ist der Stand vor dem ersten Zeitschritt (wie in der Engine;
+    ohne Angabe zählt die erste Änderung nicht). Pro Periode genügen zwei
+    Summen, die der SOC-Differenz und die ihres positiven Teils; geladen und
+    entladen sind wie in AkkuErgebnis die Flüsse auf der Hausseite (geteilt
+    bzw. mal den Wirkungsgrad). Lade-, Entlade- und Ersparnis-Arrays pro
+    Zeitschritt und Konfiguration entstehen nicht.
+    Gibt pro Periode in perioden ein dict mit DataFrames (Perioden x Konfigurationen)
+    'geladen_kwh', 'entladen_kwh' und 'netto_chf' zurück.
+    """
+    notiere_zeilen(np.size(soc))
+    index = {periode: perioden_index(zeitindex, periode) for periode in perioden}
+    summen = _soc_summen(soc, akku_start, {p: (n, len(l)) for p, (n, l) in index.items()})
+
+    ergebnis = {}
+    for periode, (_, labels) in index.items():
+        netto, hinein = summen[periode]
+        geladen = hinein / akku_wirkungsgrad_laden
+        entladen = (hinein - netto) * akku_wirkungsgrad_entladen
+        ergebnis[periode] = {
+            'geladen_kwh': pd.DataFrame(geladen, index=labels),
+            'entladen_kwh': pd.DataFrame(entladen, index=labels),
+            'netto_chf': pd.DataFrame((entladen * strompreis_bezug_rp - geladen * einspeiseverg_rp) / 100,
+                                      index=labels),
+        }
+    return ergebnis
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""
+Akku-Simulation (State of Charge) ohne Python-Schleife über die Zeit
+
+Jeder Zeitschritt ist eine Abbildung  soc -> clip(soc + d, min, max).
+Relativ zur kumulierten Summe von d wird daraus eine reine Begrenzung, und
+die Verkettung von Begrenzungen ist wieder eine Begrenzung. Deshalb lässt
+sich der ganze SOC-Verlauf mit einem Prefix-Scan in log2(n) vektorisierten
+Schritten berechnen.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+from batterysim.profiling import gemessen
+
+
+class AkkuErgebnis(NamedTuple):
+    soc: np.ndarray          # Akku-Stand am Ende jedes Zeitschritts (kWh)
+    geladen: np.ndarray      # PV-Energie, die in den Akku floss (kWh, vor Ladeverlust)
+    entladen: np.ndarray     # Energie aus dem Akku an das Haus (kWh, nach Entladeverlust)
+    netzbezug: np.ndarray    # Restlicher Netzbezug (kWh)
+    einspeisung: np.ndarray  # Restliche Netzeinspeisung (kWh)
+
+
+def _clip_scan(untere, obere):
+    """Inklusiver Prefix-Scan über Achse 0 für reine Begrenzungen x -> clip(x, untere_t, obere_t).
+
+    Zwei hintereinander ausgeführte Begrenzungen sind wieder eine Begrenzung:
+    clip(clip(x, l1, h1), l2, h2) = clip(x, clip(l1, l2, h2), clip(h1, l2, h2)).
+    """
+    l, h = untere.copy(), obere.copy()
+    l2, h2 = l.copy(), h.copy()
+    n = len(l)
+    s = 1
+    while s < n:
+        # Elemente vor s sind fertig; im Zielpuffer fehlt nur der Bereich s//2 .. s
+        l2[s // 2:s], h2[s // 2:s] = l[s // 2:s], h[s // 2:s]
+        np.maximum(l[:-s], l[s:], out=l2[s:])
+        np.minimum(l2[s:], h[s:], out=l2[s:])
+        np.maximum(h[:-s], l[s:], out=h2[s:])
+        np.minimum(h2[s:], h[s:], out=h2[s:])
+        l, l2, h, h2 = l2, l, h2, h
+        s *= 2
+    return l, h
+
+
+def _soc_zeitschleife(d, min_akku_kapazitat, max_akku_kapazitat, akku_start):
+    """Ein Durchlauf über die Zeit, jeder Schritt vektorisiert über alle Konfigurationen."""
+    n = d.shape[0]
+    soc = np.empty(np.broadcast_shapes(d.shape, np.shape(max_akku_kapazitat)))
+    stand = np.array(np.broadcast_to(akku_start, soc.shape[1:]), dtype=np.float64)
+    for i in range(n):
+        stand += d[i]
+        np.maximum(stand, min_akku_kapazitat, out=stand)
+        np.minimum(stand, max_akku_kapazitat, out=stand)
+        soc[i] = stand
+    return soc
+
+
+# Ab dieser Anzahl Konfigurationen ist die Zeitschleife schneller als der Scan
+_SCAN_MAX_KONFIGURATIONEN = 64
+
+
+def _soc_verlauf(d, min_akku_kapazitat, max_akku_kapazitat, akku_start):
+    """SOC-Verlauf für Änderungen d (Zeit auf Achse 0, optional Konfigurationen auf Achse 1)."""
+    konfigurationen = int(np.prod(np.broadcast_shapes(d.shape, np.shape(max_akku_kapazitat))[1:]))
+    if konfigurationen > _SCAN_MAX_KONFIGURATIONEN:
+        return _soc_zeitschleife(d, min_akku_kapazitat, max_akku_kapazitat, akku_start)
+
+    # In Koordinaten relativ zur kumulierten Summe ist jeder Schritt eine reine Begrenzung
+    kumuliert = np.cumsum(d, axis=0)
+    l, h = _clip_scan(min_akku_kapazitat - kumuliert, max_akku_kapazitat - kumuliert)
+    soc = kumuliert + np.clip(akku_start, l, h)
+    # Sicherheitscheck gegen Rundungsfehler der kumulierten Summe
+    np.clip(soc, min_akku_kapazitat, max_akku_kapazitat, out=soc)
+    return soc
+
+
+def soll_aenderung(pv_uebrig_kwh, max_lade_leistung=3.0, max_entlade_leistung=3.0,
+                   akku_wirkungsgrad_laden=0.95, akku_wirkungsgrad_entladen=0.95, zeitintervall=1.0):
+    """Wunsch-Änderung des Akku-Stands pro Schritt (kWh), vor Begrenzung durch die Kapazität."""
+    laden = np.minimum(np.maximum(pv_uebrig_kwh, 0.0), max_lade_leistung * zeitintervall) * akku_wirkungsgrad_laden
+    entladen = np.minimum(np.maximum(-pv_uebrig_kwh, 0.0), max_entlade_leistung * zeitintervall) / akku_wirkungsgrad_entladen
+    return laden - entladen
+
+
+@gemessen('simulation', zeilen=lambda ergebnis: ergebnis.soc.size)
+def simuliere_akku(pv_uebrig_kwh, max_akku_kapazitat, min_soc=0.1,
+                   max_lade_leistung=3.0, max_entlade_leistung=3.0,
+                   akku_wirkungsgrad_laden=0.95, akku_wirkungsgrad_entladen=0.95,
+                   zeitintervall=1.0, start_soc=0.5):
+    """Simuliert den Akku für eine Reihe von PV-Überschüssen (kWh pro Zeitschritt).
+
+    Positiver Überschuss lädt den Akku (begrenzt durch Ladeleistung und Platz),
+    negativer Überschuss entlädt ihn (begrenzt durch Entladeleistung und min_soc).
+    Die Leistungsgrenzen gelten auf der Hausseite, die Wirkungsgrade dazwischen.
+
+    Alle Akku-Parameter dürfen auch 1-D Arrays sein (eine Konfiguration pro
+    Eintrag); dann haben die Ergebnisse die Form (Zeitschritte, Konfigurationen)
+    und alle Konfigurationen werden gemeinsam simuliert.
+    """
+    pv_uebrig = np.asarray(pv_uebrig_kwh, dtype=np.float64)
+    parameter = [np.asarray(p, dtype=np.float64) for p in (
+        max_akku_kapazitat, min_soc, max_lade_leistung, max_entlade_leistung,
+        akku_wirkungsgrad_laden, akku_wirkungsgrad_entladen, start_soc)]
+    if pv_uebrig.ndim == 1 and any(p.ndim > 0 for p in parameter):
+        pv_uebrig = pv_uebrig[:, np.newaxis]
+    (max_akku_kapazitat, min_soc, max_lade_leistung, max_entlade_leistung,
+     akku_wirkungsgrad_laden, akku_wirkungsgrad_entladen, start_soc) = parameter
+
+    min_akku_kapazitat = max_akku_kapazitat * min_soc
+    akku_start = max_akku_kapazitat * start_soc
+
+    ueberschuss = np.maximum(pv_uebrig, 0.0)
+    defizit = np.maximum(-pv_uebrig, 0.0)
+    d = soll_aenderung(pv_uebrig, max_lade_leistung, max_entlade_leistung,
+                       akku_wirkungsgrad_laden, akku_wirkungsgrad_entladen, zeitintervall)
+
+    form = np.broadcast_shapes(d.shape, max_akku_kapazitat.shape)
+    if form[0] == 0:
+        leer = np.zeros(form)
+        return AkkuErgebnis(leer, leer, leer, leer, leer)
+
+    soc = _soc_verlauf(d, min_akku_kapazitat, max_akku_kapazitat, akku_start)
+
+    # Tatsächliche Flüsse aus der Änderung des Akku-Stands
+    delta = np.diff(soc, axis=0, prepend=np.broadcast_to(akku_start, (1,) + form[1:]))
+    geladen = np.maximum(delta, 0.0) / akku_wirkungsgrad_laden
+    entladen_haus = np.maximum(-delta, 0.0) * akku_wirkungsgrad_entladen
+
+    netzbezug = np.maximum(defizit - entladen_haus, 0.0)
+    einspeisung = np.maximum(ueberschuss - geladen, 0.0)
+
+    return AkkuErgebnis(soc, geladen, entladen_haus, netzbezug, einspeisung)
+
+
+@gemessen('simulation_summen', zeilen=lambda ergebnis: ergebnis.soc.size)
+def akku_summen(pv_uebrig_kwh, max_akku_kapazitat, min_soc=0.1,
+                max_lade_leistung=3.0, max_entlade_leistung=3.0,
+                akku_wirkungsgrad_laden=0.95, akku_wirkungsgrad_entladen=0.95,
+                zeitintervall=1.0, start_soc=0.5):
+    """Wie simuliere_akku, aber nur die Summen über die Zeit; für sehr viele Konfigurationen.
+
+    pv_uebrig_kwh hat die Zeit auf Achse 0, die übrigen Achsen werden mit den
+    Akku-Parametern gebroadcastet (z.B. (Zeit, Jahre, 1) und Kapazitäten (K,)).
+    Der Verlauf wird nicht gespeichert, der Speicher wächst nur mit der Anzahl
+    Konfigurationen. Pro Schritt wird nur die Bewegung |Δsoc| aufsummiert; mit
+    dem Endstand ergeben sich daraus Laden und Entladen, und da der Akku nie
+    mehr lädt als der Überschuss bzw. mehr entlädt als das Defizit, auch
+    Netzbezug und Einspeisung.
+
+    Gibt ein AkkuErgebnis mit den Summen zurück; soc ist der Endstand.
+    """
+    pv_uebrig = np.asarray(pv_uebrig_kwh, dtype=np.float64)
+    (max_akku_kapazitat, min_soc, max_lade_leistung, max_entlade_leistung,
+     akku_wirkungsgrad_laden, akku_wirkungsgrad_entladen, start_soc) = [np.asarray(p, dtype=np.float64) for p in (
+        max_akku_kapazitat, min_soc, max_lade_leistung, max_entlade_leistung,
+        akku_wirkungsgrad_laden, akku_wirkungsgrad_entladen, start_soc)]
+    min_akku_kapazitat = max_akku_kapazitat * min_soc
+    akku_start = max_akku_kapazitat * start_soc
+
+    d = soll_aenderung(pv_uebrig, max_lade_leistung, max_entlade_leistung,
+                       akku_wirkungsgrad_laden, akku_wirkungsgrad_entladen, zeitintervall)
+    form = np.broadcast_shapes(d.shape[1:], max_akku_kapazitat.shape, min_akku_kapazitat.shape)
+    stand = np.array(np.broadcast_to(akku_start, form), dtype=np.float64)
+    neu = np.empty(form)
+    bewegung = np.zeros(form)
+    for schritt in d:
+        np.add(stand, schritt, out=neu)
+        np.maximum(neu, min_akku_kapazitat, out=neu)
+        np.minimum(neu, max_akku_kapazitat, out=neu)
+        # stand wird zum Puffer für |Δsoc| und danach mit dem neuen Stand getauscht
+        np.subtract(neu, stand, out=stand)
+        np.abs(stand, out=stand)
+        bewegung += stand
+        stand, neu = neu, stand
+
+    netto = stand - akku_start
+    geladen = (bewegung + netto) / 2 / akku_wirkungsgrad_laden
+    entladen_haus = (bewegung - netto) / 2 * akku_wirkungsgrad_entladen
+    netzbezug = np.maximum(np.maximum(-pv_uebrig, 0.0).sum(axis=0) - entladen_haus, 0.0)
+    einspeisung = np.maximum(np.maximum(pv_uebrig, 0.0).sum(axis=0) - geladen, 0.0)
+    return AkkuErgebnis(stand, geladen, entladen_haus, netzbezug, einspeisung)
+
+
+def _ladefunktion(u, max_lade_leistung, max_entlade_leistung,
+                  akku_wirkungsgrad_laden, akku_wirkungsgrad_entladen):
+    """Änderungsrate des Akku-Stands (kW) bei PV-Überschussleistung u (kW), ohne Kapazitätsgrenzen."""
+    return (np.minimum(np.maximum(u, 0.0), max_lade_leistung) * akku_wirkungsgrad_laden
+            - np.minimum(np.maximum(-u, 0.0), max_entlade_leistung) / akku_wirkungsgrad_entladen)
+
+
+def simuliere_akku_linear(pv_uebrig_kw, dauer_h, max_akku_kapazitat, min_soc=0.1,
+                          max_lade_leistung=3.0, max_entlade_leistung=3.0,
+                          akku_wirkungsgrad_laden=0.95, akku_wirkungsgrad_entladen=0.95,
+                          start_soc=0.5):
+    """Exakte Simulation für stückweise lineare Überschussleistung.
+
+    pv_uebrig_kw sind n Stützstellen (kW), dauer_h die n-1 Abstände dazwischen
+    (Stunden). Zwischen zwei Stützstellen wird linear interpoliert, genau wie
+    resample('1min').interpolate(), nur ohne Minutenraster: jedes Segment wird
+    an den Nulldurchgängen und den Leistungsgrenzen geteilt. In jedem Teilstück
+    ist die Laderate linear, das Integral also exakt (Trapez) und der Akku
+    bewegt sich monoton, so dass der Clip-Scan der Teilstücke den exakten
+    Verlauf liefert.
+
+    Gibt (AkkuErgebnis pro Segment, saettigung) zurück. saettigung enthält für
+    jedes Erreichen einer Grenze das Segment, die Zeit ab Segmentbeginn (h)
+    und +1 (voll) bzw. -1 (leer).
+    """
+    u = np.asarray(pv_uebrig_kw, dtype=np.float64)
+    dauer = np.asarray(dauer_h, dtype=np.float64)
+    min_akku_kapazitat = max_akku_kapazitat * min_soc
+    akku_start = max_akku_kapazitat * start_soc
+    rate = (max_lade_leistung, max_entlade_leistung, akku_wirkungsgrad_laden, akku_wirkungsgrad_entladen)
+
+    # Knickstellen (Leistungsgrenzen und Nulldurchgang) als Anteil 0..1 des Segments
+    u0, u1 = u[:-1, np.newaxis], u[1:, np.newaxis]
+    niveaus = np.array([max_lade_leistung, 0.0, -max_entlade_leistung])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tau = (niveaus - u0) / (u1 - u0)
+    tau = np.where((tau > 0) & (tau < 1), tau, 1.0)
+    tau.sort(axis=1)
+    grenzen = np.hstack([np.zeros((len(dauer), 1)), tau, np.ones((len(dauer), 1))])
+
+    # Leistung an den Teilstück-Grenzen und Energie pro Teilstück (Trapez ist exakt)
+    u_grenzen = u0 + (u1 - u0) * grenzen
+    f = _ladefunktion(u_grenzen, *rate)
+    teil_dauer = np.diff(grenzen, axis=1) * dauer[:, np.newaxis]
+    d = ((f[:, :-1] + f[:, 1:]) / 2 * teil_dauer).ravel()
+
+    if len(d) == 0:
+        leer = np.zeros(0)
+        return AkkuErgebnis(leer, leer, leer, leer, leer), {'segment': leer, 'zeit_h': leer, 'grenze': leer}
+
+    soc_teil = _soc_verlauf(d, min_akku_kapazitat, max_akku_kapazitat, akku_start)
+    vorher = np.r_[akku_start, soc_teil[:-1]]
+    delta = (soc_teil - vorher).reshape(-1, 4)
+    geladen = np.maximum(delta, 0.0).sum(axis=1) / akku_wirkungsgrad_laden
+    entladen_haus = np.maximum(-delta, 0.0).sum(axis=1) * akku_wirkungsgrad_entladen
+
+    ueberschuss = np.maximum(u_grenzen, 0.0)
+    defizit = np.maximum(-u_grenzen, 0.0)
+    ueberschuss_kwh = ((ueberschuss[:, :-1] + ueberschuss[:, 1:]) / 2 * teil_dauer).sum(axis=1)
+    defizit_kwh = ((defizit[:, :-1] + defizit[:, 1:]) / 2 * teil_dauer).sum(axis=1)
+    netzbezug = np.maximum(defizit_kwh - entladen_haus, 0.0)
+    einspeisung = np.maximum(ueberschuss_kwh - geladen, 0.0)
+
+    # Sättigung: Teilstücke, in denen die Grenze die Bewegung abgeschnitten hat
+    gekappt = np.abs(soc_teil - vorher - d) > 1e-12
+    gekappt &= np.isin(soc_teil, (min_akku_kapazitat, max_akku_kapazitat))
+    gekappt &= np.abs(vorher - soc_teil) > 0  # nicht schon vorher an der Grenze
+    k = np.flatnonzero(gekappt)
+    fa, fb = f[:, :-1].ravel()[k], f[:, 1:].ravel()[k]
+    td = teil_dauer.ravel()[k]
+    # vorher + fa*t + (fb-fa)/(2*td)*t^2 = Grenze, kleinste Lösung in [0, td]
+    ziel = soc_teil[k] - vorher[k]
+    a = (fb - fa) / (2 * td)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        wurzel = np.sqrt(np.maximum(fa * fa + 4 * a * ziel, 0.0))
+        t_quadratisch = np.where(ziel >= 0, 2 * ziel / (fa + wurzel), 2 * ziel / (fa - wurzel))
+        t = np.where(np.abs(a) > 1e-15, t_quadratisch, ziel / fa)
+    segment = k // 4
+    zeit_h = grenzen[:, :-1].ravel()[k] * dauer[segment] + np.clip(t, 0.0, td)
+    saettigung = {'segment': segment, 'zeit_h': zeit_h,
+                  'grenze': np.where(soc_teil[k] >= max_akku_kapazitat, 1, -1)}
+
+    soc = soc_teil[3::4]
+    return AkkuErgebnis(soc, geladen, entladen_haus, netzbezug, einspeisung), saettigung
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Flotten-Simulation: viele Haushalte auf einem gemeinsamen Stundenraster
+
+Alle Standorte werden als (Stunden x Standorte)-Matrix in einem Durchlauf
+simuliert. Wird die Matrix zu gross, werden die Standorte in Blöcke geteilt
+und parallel in mehreren Prozessen gerechnet.
+"""
+
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+from batterysim.cache import lade_stundendaten_gecacht
+from batterysim.economics import EINSPEISEVERG_RP, STROMPREIS_BEZUG_RP, akku_ersparnis, energie_summary
+from batterysim.engine import simuliere_akku
+from batterysim.loader import (EINSPEISUNG_SENSOR, END_TIME, NETZBEZUG_SENSOR, PV_OST_SENSOR,
+                               PV_WEST_SENSOR, SCHRITT, SENSOREN, START_TIME, STUNDE_NS, schritt_ns)
+from batterysim.profiling import gemessen
+from batterysim.store import archiv_index, ist_archiv, oeffne_standort
+
+# Akku-Parameter, die im Manifest pro Standort gesetzt werden können (mit Standardwert)
+AKKU_PARAMETER = {
+    'max_akku_kapazitat': 20.0,
+    'min_soc': 0.1,
+    'max_lade_leistung': 3.0,
+    'max_entlade_leistung': 3.0,
+    'akku_wirkungsgrad_laden': 0.95,
+    'akku_wirkungsgrad_entladen': 0.95,
+    'start_soc': 0.5,
+}
+
+# Grob geschätzte Anzahl float64-Arrays pro Standort während der Simulation
+_ARRAYS_PRO_STANDORT = 24
+
+
+def lade_manifest(quelle):
+    """Standorte aus einem Ordner (alle *.csv), einem Archiv (store) oder einer Manifest-CSV.
+
+    Das Manifest hat die Spalten standort und datei (relativ zum Manifest) und
+    optional Spalten aus AKKU_PARAMETER. Gibt einen DataFrame mit Index standort zurück.
+    """
+    if ist_archiv(quelle):
+        standorte = list(archiv_index(quelle).index)
+        manifest = pd.DataFrame({'standort': standorte, 'datei': [os.path.join(quelle, s) for s in standorte]})
+    elif os.path.isdir(quelle):
+        dateien = sorted(glob.glob(os.path.join(quelle, '*.csv')))
+        manifest = pd.DataFrame({'standort': [os.path.splitext(os.path.basename(d))[0] for d in dateien],
+                                 'datei': dateien})
+    else:
+        manifest = pd.read_csv(quelle)
+        fehlend = {'standort', 'datei'} - set(manifest.columns)
+        if fehlend:
+            raise ValueError(f"Manifest {quelle} ohne Spalten {sorted(fehlend)}")
+        basis = os.path.dirname(quelle)
+        manifest['datei'] = [d if os.path.isabs(d) else os.path.join(basis, d) for d in manifest['datei']]
+    if manifest.empty:
+        raise ValueError(f"Keine Standorte in {quelle}")
+    return manifest.set_index('standort')
+
+
+def _lade_standort(pfad, start_time, end_time, schritt):
+    # Standort-Ordner eines Archivs: nur der Zeitraum wird von der Platte gelesen
+    if os.path.isdir(pfad):
+        standort = oeffne_standort(os.path.dirname(pfad), os.path.basename(pfad))
+        if standort.schritt_ns != schritt_ns(schritt):
+            raise ValueError(f"{pfad}: Archiv hat den Schritt {pd.Timedelta(standort.schritt_ns)}, nicht {schritt}")
+        return standort.raster(start_time, end_time, SENSOREN)
+    return lade_stundendaten_gecacht(pfad, SENSOREN, start_time, end_time, schritt=schritt)[SENSOREN].to_numpy()
+
+
+def _lade_matrizen(dateien, start_time, end_time, prozesse=None, schritt=SCHRITT):
+    """Werte aller Standorte als {sensor: (Schritte x Standorte)-Array}.
+
+    Mit prozesse > 1 wird in mehreren Prozessen geladen (das Parsen ist an den
+    GIL gebunden), sonst in Threads (z.B. innerhalb eines Pool-Workers).
+    """
+    dateien = list(dateien)
+    n = len(dateien)
+    if prozesse and prozesse > 1:
+        executor = ProcessPoolExecutor(min(prozesse, n))
+    else:
+        executor = ThreadPoolExecutor()
+    with executor as pool:
+        bloecke = list(pool.map(_lade_standort, dateien, [start_time] * n, [end_time] * n, [schritt] * n))
+    daten = np.stack(bloecke, axis=2)
+    return {sensor: daten[:, i, :] for i, sensor in enumerate(SENSOREN)}
+
+
+def _flotten_block(auftrag):
+    """Lädt und simuliert einen Block von Standorten. Gibt die Kennzahlen als DataFrame zurück."""
+    standorte, start_time, end_time, schritt, west_faktor, preise, zeitintervall, prozesse = auftrag
+    m = _lade_matrizen(standorte['datei'], start_time, end_time, prozesse, schritt)
+
+    pv_gesamt = m[PV_OST_SENSOR] + m[PV_WEST_SENSOR] * west_faktor
+    hausverbrauch = m[PV_OST_SENSOR] + m[PV_WEST_SENSOR] - m[EINSPEISUNG_SENSOR] + m[NETZBEZUG_SENSOR]
+    pv_uebrig = pv_gesamt - hausverbrauch
+
+    akku_parameter = {name: standorte[name].to_numpy(dtype=np.float64) for name in AKKU_PARAMETER}
+    ergebnis = simuliere_akku(pv_uebrig, zeitintervall=zeitintervall, **akku_parameter)
+
+    summen = {
+        'pv_gesamt_kwh_erweitert': pv_gesamt.sum(axis=0),
+        'hausverbrauch_kwh': hausverbrauch.sum(axis=0),
+        'pv_uebrig_kwh': pv_uebrig.sum(axis=0),
+        'netznutzung_kwh': m[NETZBEZUG_SENSOR].sum(axis=0),
+        'netzeinspeisung_kwh': m[EINSPEISUNG_SENSOR].sum(axis=0),
+    }
+    # Kennzahlen ohne Akku (laut Sensoren), wie in der Jahresstatistik des Rechners
+    summen['autarkie_grad_ohne_akku'] = (1 - summen['netznutzung_kwh'] / summen['hausverbrauch_kwh']) * 100
+    summen['eigenverbrauchsquote_ohne_akku'] = ((summen['pv_gesamt_kwh_erweitert'] - summen['netzeinspeisung_kwh'])
+                                                / summen['pv_gesamt_kwh_erweitert'] * 100)
+
+    summary = energie_summary({'hausverbrauch_kwh': hausverbrauch, 'pv_gesamt_kwh_erweitert': pv_gesamt,
+                               NETZBEZUG_SENSOR: m[NETZBEZUG_SENSOR]}, ergebnis)
+    ersparnis = akku_ersparnis(summary['akku_energie_von_pv_kwh'], summary['akku_entnahmen_kwh'], *preise)
+    return pd.DataFrame({**summen, **summary, **ersparnis}, index=standorte.index)
+
+
+@gemessen('flotte', zeilen=len)
+def simuliere_flotte(quelle, start_time=START_TIME, end_time=END_TIME, schritt=SCHRITT, west_faktor=1.0,
+                     strompreis_bezug_rp=STROMPREIS_BEZUG_RP, einspeiseverg_rp=EINSPEISEVERG_RP,
+                     zeitintervall=None, max_speicher_mb=2048, prozesse=None, **akku_parameter):
+    """Simuliert den Akku aller Standorte aus quelle (Ordner, Archiv oder Manifest, siehe lade_manifest).
+
+    akku_parameter setzen die Werte für alle Standorte, Manifest-Spalten haben
+    Vorrang; zeitintervall (Stunden) folgt ohne Angabe aus schritt. Passt die
+    (Schritte x Standorte)-Matrix nicht in max_speicher_mb, wird in Blöcken
+    über mehrere Prozesse gerechnet. Gibt eine Tabelle mit einer Zeile pro
+    Standort und den Kennzahlen des Akkurechners zurück.
+    """
+    unbekannt = set(akku_parameter) - set(AKKU_PARAMETER)
+    if unbekannt:
+        raise ValueError(f"Unbekannte Akku-Parameter: {sorted(unbekannt)}")
+    standorte = lade_manifest(quelle)
+    for name, standard in {**AKKU_PARAMETER, **akku_parameter}.items():
+        wert = akku_parameter.get(name, standard)
+        standorte[name] = standorte[name].fillna(wert) if name in standorte else wert
+
+    schritte = (pd.Timestamp(end_time) - pd.Timestamp(start_time)).value // schritt_ns(schritt) + 1
+    mb_pro_standort = schritte * 8 * _ARRAYS_PRO_STANDORT / 2**20
+    block_groesse = max(1, int(max_speicher_mb // mb_pro_standort))
+    preise = (strompreis_bezug_rp, einspeiseverg_rp)
+    zeitintervall = schritt_ns(schritt) / STUNDE_NS if zeitintervall is None else zeitintervall
+    prozesse = prozesse or os.cpu_count()
+    auftraege = [(standorte.iloc[i:i + block_groesse], start_time, end_time, schritt, west_faktor, preise,
+                  zeitintervall)
+                 for i in range(0, len(standorte), block_groesse)]
+
+    # Passt alles in den Speicher: parallel laden, dann ein einziger vektorisierter Durchlauf
+    if len(auftraege) == 1:
+        return _flotten_block(auftraege[0] + (prozesse,))
+    with Pool(min(prozesse, len(auftraege))) as pool:
+        return pd.concat(pool.map(_flotten_block, [a + (1,) for a in auftraege]))
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Inkrementelle Mehrtagessimulation über tägliche Exportdateien
+
+Ein kleiner Zustandsspeicher (JSON) merkt sich, welche Tagesdateien mit
+welchem Inhalt schon verarbeitet wurden, den Akku-Stand am Ende, die letzte
+Stundenzeile (für das Segment über die Dateigrenze) und die aufsummierten
+Energiewerte. Neue Dateien setzen die Simulation dort fort.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from batterysim.engine import simuliere_akku_linear
+from batterysim.loader import (EINSPEISUNG_SENSOR, NETZBEZUG_SENSOR, TAGES_PV_OST_SENSOR,
+                               TAGES_PV_WEST_SENSOR, lade_tagesdateien)
+
+# Bei Änderungen an der Berechnung erhöhen, damit alte Zustände neu aufgebaut werden
+ZUSTAND_VERSION = 2
+
+SUMMEN = ['gesamt_verbrauch_kwh', 'gesamt_pv_kwh', 'pv_direktnutzung_kwh',
+          'akku_energie_von_pv_kwh', 'akku_entnahmen_kwh', 'netzbezug_kwh']
+
+_SPALTEN = [TAGES_PV_WEST_SENSOR, TAGES_PV_OST_SENSOR, NETZBEZUG_SENSOR, EINSPEISUNG_SENSOR]
+
+
+def _datei_info(pfad, bekannt):
+    """Größe, mtime und SHA-256 der Datei; gehasht wird nur, wenn Größe oder mtime neu sind."""
+    stat = os.stat(pfad)
+    if bekannt and bekannt['size'] == stat.st_size and bekannt['mtime_ns'] == stat.st_mtime_ns:
+        return bekannt
+    with open(pfad, 'rb') as f:
+        sha256 = hashlib.sha256(f.read()).hexdigest()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+
+
+def _leerer_zustand(akku_parameter):
+    return {'version': ZUSTAND_VERSION, 'akku_parameter': akku_parameter, 'dateien': {},
+            'letzte_zeile': None, 'akku_stand': None, 'summen': dict.fromkeys(SUMMEN, 0.0)}
+
+
+def _lade_stunden(pfade):
+    """Stundenzeilen mehrerer Tagesdateien, zeitlich sortiert und ohne doppelte Stunden."""
+    return lade_tagesdateien(pfade, sensors=_SPALTEN)
+
+
+def _integral_kwh(werte, dauer_h):
+    """Integral einer stückweise linearen Leistung (kW) über alle Segmente."""
+    return ((werte[:-1] + werte[1:]) / 2 * dauer_h).sum()
+
+
+def _simuliere_abschnitt(stunden, zustand):
+    """Simuliert neue Stundenzeilen (exakt auf den linearen Segmenten) und aktualisiert den Zustand."""
+    p = zustand['akku_parameter']
+
+    # Letzte bekannte Zeile voranstellen, damit das Segment über die Dateigrenze mitgerechnet wird
+    letzte = zustand['letzte_zeile']
+    if letzte is not None:
+        vorher = pd.DataFrame([letzte['werte']], index=pd.DatetimeIndex([letzte['zeit']]))
+        stunden = pd.concat([vorher, stunden])
+    stunden = stunden.interpolate(method='time')
+    dauer_h = np.diff(stunden.index.asi8) / 3.6e12
+
+    pv_sum = (stunden[TAGES_PV_OST_SENSOR] + stunden[TAGES_PV_WEST_SENSOR]).to_numpy()
+    netznutzung = stunden[NETZBEZUG_SENSOR].to_numpy()
+    hausverbrauch = pv_sum - stunden[EINSPEISUNG_SENSOR].to_numpy() + netznutzung
+    pv_uebrig = pv_sum - hausverbrauch
+
+    kapazitaet = p['max_akku_kapazitat']
+    akku_stand = zustand['akku_stand']
+    start_soc = p['start_soc'] if akku_stand is None else akku_stand / kapazitaet
+    ergebnis, _ = simuliere_akku_linear(
+        pv_uebrig, dauer_h, kapazitaet,
+        min_soc=p['min_soc'], max_lade_leistung=p['max_lade_leistung'],
+        max_entlade_leistung=p['max_entlade_leistung'],
+        akku_wirkungsgrad_laden=p['akku_wirkungsgrad_laden'],
+        akku_wirkungsgrad_entladen=p['akku_wirkungsgrad_entladen'],
+        start_soc=start_soc)
+
+    summen = zustand['summen']
+    gesamt_pv_kwh = _integral_kwh(pv_sum, dauer_h)
+    summen['gesamt_verbrauch_kwh'] += _integral_kwh(hausverbrauch, dauer_h)
+    summen['gesamt_pv_kwh'] += gesamt_pv_kwh
+    summen['pv_direktnutzung_kwh'] += gesamt_pv_kwh - (ergebnis.einspeisung + ergebnis.geladen).sum()
+    summen['akku_energie_von_pv_kwh'] += ergebnis.geladen.sum()
+    summen['akku_entnahmen_kwh'] += ergebnis.entladen.sum()
+    summen['netzbezug_kwh'] += _integral_kwh(netznutzung, dauer_h)
+
+    if len(ergebnis.soc):
+        zustand['akku_stand'] = float(ergebnis.soc[-1])
+    zustand['letzte_zeile'] = {'zeit': stunden.index[-1].isoformat(),
+                               'werte': {k: float(v) for k, v in stunden.iloc[-1].items()}}
+
+
+def aktualisiere_mehrtagessimulation(dateien, zustand_datei, max_akku_kapazitat=15.0, min_soc=0.1,
+                                     max_lade_leistung=10.0, max_entlade_leistung=10.0,
+                                     akku_wirkungsgrad_laden=0.8, akku_wirkungsgrad_entladen=0.9,
+                                     start_soc=0.5):
+    """Verarbeitet nur die noch unbekannten Tagesdateien und setzt die Simulation
+    vom gespeicherten Akku-Stand aus fort. Gibt den aktualisierten Zustand zurück.
+
+    Der Zustand wird neu aufgebaut, wenn sich die Akku-Parameter geändert haben,
+    eine bereits verarbeitete Datei einen neuen Inhalt hat oder eine neue Datei
+    vor dem bisher simulierten Zeitraum liegt.
+    """
+    akku_parameter = {'max_akku_kapazitat': max_akku_kapazitat, 'min_soc': min_soc,
+                      'max_lade_leistung': max_lade_leistung, 'max_entlade_leistung': max_entlade_leistung,
+                      'akku_wirkungsgrad_laden': akku_wirkungsgrad_laden,
+                      'akku_wirkungsgrad_entladen': akku_wirkungsgrad_entladen,
+                      'start_soc': start_soc}
+
+    zustand = None
+    if os.path.exists(zustand_datei):
+        with open(zustand_datei) as f:
+            zustand = json.load(f)
+        if zustand.get('version') != ZUSTAND_VERSION or zustand.get('akku_parameter') != akku_parameter:
+            zustand = None
+
+    # Neue oder geänderte Dateien bestimmen
+    bekannt = zustand['dateien'] if zustand else {}
+    pfade = {os.path.basename(d): d for d in dateien}
+    infos = {name: _datei_info(pfad, bekannt.get(name)) for name, pfad in pfade.items()}
+    if any(infos[name]['sha256'] != info['sha256'] for name, info in bekannt.items() if name in infos):
+        zustand = None
+    if zustand is None:
+        zustand = _leerer_zustand(akku_parameter)
+    neu = [name for name in infos if name not in zustand['dateien']]
+
+    if neu:
+        stunden = _lade_stunden([pfade[name] for name in neu])
+        letzte = zustand['letzte_zeile']
+        if letzte is not None and stunden.index[0] <= pd.Timestamp(letzte['zeit']):
+            # Nachgelieferte ältere Datei: alles neu rechnen
+            zustand = _leerer_zustand(akku_parameter)
+            neu = list(infos)
+            stunden = _lade_stunden([pfade[name] for name in neu])
+        _simuliere_abschnitt(stunden, zustand)
+    zustand['dateien'].update(infos)
+
+    tmp = zustand_datei + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(zustand, f, indent=2)
+    os.replace(tmp, zustand_datei)
+    return zustand
@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+"""
+Einlesen der HomeAssistant Energie-Exporte (entity_id, state, last_changed)
+und Aufbereitung zu Differenzen pro Zeitschritt auf einem vollständigen Zeitindex
+
+Das Raster ist stündlich, sofern nicht ein anderer fester Schritt (schritt,
+z.B. '5min' oder '1min') verlangt wird. Die Werte liegen als float32 vor,
+der Zeitindex als ganze Nanosekunden seit 1970 (UTC); gerechnet wird in der
+Engine trotzdem in float64.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from batterysim.profiling import gemessen, notiere_zeilen, stufe
+
+# Liste der Sensoren
+NETZBEZUG_SENSOR = 'sensor.netznutzung_kwh'
+EINSPEISUNG_SENSOR = 'sensor.netzeinspeisung_kwh'
+PV_OST_SENSOR = 'sensor.sma_st_80_total_yield'
+PV_WEST_SENSOR = 'sensor.sn_3012091531_pv_gen_meter'
+
+SENSOREN = [NETZBEZUG_SENSOR, EINSPEISUNG_SENSOR, PV_OST_SENSOR, PV_WEST_SENSOR]
+
+START_TIME = '2024-01-01 00:00:00'
+END_TIME = '2024-12-31 23:00:00'
+
+STUNDE_NS = 3600 * 10**9
+
+# Standard-Zeitschritt des Rasters und Datentyp der Werte (kWh pro Schritt)
+SCHRITT = 'h'
+WERTE_DTYPE = np.float32
+
+# Erweiterungsfaktor der West-Anlage (geplanter Ausbau)
+WEST_FAKTOR = 6.0
+
+
+def erweitere_stundendaten(combined_df):
+    """Ergänzt pv_gesamt_kwh und hausverbrauch_kwh aus den Sensor-Spalten."""
+    # Berechne PV gesamt (sma_st_80_total_yield + sn_3012091531_pv_gen_meter)
+    combined_df['pv_gesamt_kwh'] = combined_df[PV_OST_SENSOR] + combined_df[PV_WEST_SENSOR]
+
+    # Berechne den Hausverbrauch für jede Stunde
+    combined_df['hausverbrauch_kwh'] = (combined_df['pv_gesamt_kwh'] -
+                                        combined_df[EINSPEISUNG_SENSOR] +
+                                        combined_df[NETZBEZUG_SENSOR])
+    return combined_df
+
+
+def schritt_ns(schritt):
+    """Länge eines Zeitschritts ('h', '15min', pd.Timedelta, ...) in Nanosekunden."""
+    return pd.Timedelta(pd.tseries.frequencies.to_offset(schritt)).value
+
+
+def zeitintervall_h(zeitindex):
+    """Zeitschritt eines regelmässigen Zeitindex in Stunden (zeitintervall der Engine)."""
+    zeit = pd.DatetimeIndex(zeitindex).asi8
+    return float(np.median(np.diff(zeit))) / STUNDE_NS if len(zeit) > 1 else 1.0
+
+
+@gemessen('erweitere_pv', zeilen=len)
+def erweitere_pv(combined_df, west_faktor=WEST_FAKTOR):
+    """Skaliert die West-Anlage mit west_faktor und ergänzt pv_gesamt_kwh_erweitert
+    und pv_uebrig_kwh (PV Überschuss gegenüber dem Hausverbrauch)."""
+    combined_df[PV_WEST_SENSOR + '_erweitert'] = combined_df[PV_WEST_SENSOR] * west_faktor
+    combined_df['pv_gesamt_kwh_erweitert'] = (combined_df[PV_OST_SENSOR] +
+                                              combined_df[PV_WEST_SENSOR + '_erweitert'])
+    combined_df['pv_uebrig_kwh'] = combined_df['pv_gesamt_kwh_erweitert'] - combined_df['hausverbrauch_kwh']
+    return combined_df
+
+
+@gemessen('lade_daten')
+def lade_stundendaten(full_path, sensors=SENSOREN, start_time=START_TIME, end_time=END_TIME,
+                      schritt=SCHRITT, dtype=WERTE_DTYPE):
+    """Liest den Export und liefert combined_df: eine Spalte pro Sensor mit den
+    Differenzen pro Zeitschritt (fehlende Schritte = 0) plus pv_gesamt_kwh und
+    hausverbrauch_kwh (falls alle SENSOREN geladen werden), Index im Abstand
+    schritt (Standard stündlich) in UTC von start_time bis end_time.
+    """
+    # CSV laden
+    with stufe('csv_lesen'):
+        df = pd.read_csv(full_path, usecols=['entity_id', 'state', 'last_changed'])
+        notiere_zeilen(len(df))
+    return stundenraster(df, sensors, start_time, end_time, schritt, dtype)
+
+
+def _zeit_ns(last_changed):
+    """Zeitstempel als ns seit 1970 (UTC). Gleich lange ISO-Zeitstempel in UTC ('...Z',
+    wie im HomeAssistant-Export) parst numpy direkt, alles andere geht über pd.to_datetime."""
+    notiere_zeilen(len(last_changed))
+    text = last_changed.to_numpy().astype(str)
+    laenge = text.dtype.itemsize // 4
+    if len(text) and laenge > 1:
+        # Letztes Zeichen jeder Zeile; kürzere Zeilen enden hier mit '\0'
+        if (text.view(np.uint32).reshape(len(text), laenge)[:, -1] == ord('Z')).all():
+            try:
+                return np.array(text.astype(f'U{laenge - 1}'), dtype='datetime64[ns]').astype(np.int64)
+            except ValueError:
+                pass
+    return pd.DatetimeIndex(pd.to_datetime(last_changed, utc=True)).asi8
+
+
+def _relevante_zeilen(df, sensors):
+    """Sensor-Code, Zeit (ns, UTC) und Zählerstand der Zeilen, die zu sensors gehören."""
+    # Sensor als Kategorie-Code, nicht benötigte Sensoren (-1) sofort verwerfen
+    with stufe('sensoren_filtern'):
+        notiere_zeilen(len(df))
+        codes = pd.Categorical(df['entity_id'], categories=sensors).codes
+        relevant = codes >= 0
+    with stufe('zeitstempel'):
+        zeit = _zeit_ns(df['last_changed'][relevant])
+    with stufe('zaehlerstaende'):
+        state = pd.to_numeric(df['state'][relevant], errors='coerce').to_numpy(dtype=np.float64)
+        notiere_zeilen(len(state))
+    return codes[relevant], zeit, state
+
+
+@gemessen('differenzen_runden')
+def _stundenwerte(codes, zeit, state, start_time, end_time, schritt=STUNDE_NS):
+    """Sortiert nach (Sensor, Zeit), bildet Differenzen pro Sensor-Gruppe und ordnet
+    sie einem Zeitschritt (ns) zu. Gibt (codes, position, hourly_diff) der gültigen
+    Differenzen zurück, position ist der Schrittindex ab start_time (noch nicht
+    summiert/begrenzt), pro Sensor aufsteigend.
+
+    Eine Differenz zählt zu dem Schritt, in dem die Mitte ihres Intervalls
+    seit der vorherigen Messung liegt (höchstens einen halben Schritt vor der
+    Messung); ein Schritt trägt wie bisher den Zeitstempel seines Endes. Bei
+    Messungen im Takt des Schritts oder mit Lücken entspricht das dem Runden
+    auf den nächsten Schritt, feinere Messungen (z.B. alle 15 Minuten im
+    Stundenraster) fallen vollständig in ihre Stunde.
+
+    Ist schritt feiner als die Abtastung der Daten, gibt es einen ValueError:
+    die Differenz eines ganzen Intervalls landete sonst in einem einzigen
+    Schritt und die übrigen Schritte blieben 0.
+    """
+    notiere_zeilen(len(codes))
+    reihenfolge = np.lexsort((zeit, codes))
+    codes, zeit, state = codes[reihenfolge], zeit[reihenfolge], state[reihenfolge]
+    neue_gruppe = np.r_[True, codes[1:] != codes[:-1]]
+
+    # Typischer Abstand der Messungen innerhalb eines Sensors (Median, etwas Toleranz für Jitter)
+    abstand = np.diff(zeit)[~neue_gruppe[1:]]
+    abstand = abstand[abstand > 0]
+    if len(abstand) and np.median(abstand) > 1.1 * schritt:
+        raise ValueError(f"Schritt {pd.Timedelta(schritt)} ist feiner als die Abtastung der Daten "
+                         f"({pd.Timedelta(int(np.median(abstand)))}); gröberen Schritt wählen")
+
+    # Differenzen innerhalb jeder Sensor-Gruppe (erster Wert jeder Gruppe hat keine Differenz)
+    hourly_diff = np.full(len(state), np.nan)
+    hourly_diff[1:] = state[1:] - state[:-1]
+    hourly_diff[neue_gruppe] = np.nan
+    mitte = zeit.copy()
+    mitte[1:] -= np.minimum(zeit[1:] - zeit[:-1], schritt) // 2
+
+    # Nur Daten aus den Jahren des Zeitraums
+    jahre = zeit.astype('datetime64[ns]').astype('datetime64[Y]').astype(np.int64) + 1970
+    gueltig = ~np.isnan(hourly_diff) & (jahre >= start_time.year) & (jahre <= end_time.year)
+    codes, mitte, hourly_diff = codes[gueltig], mitte[gueltig], hourly_diff[gueltig]
+
+    # Schritt, in dem die Mitte des Intervalls liegt (beschriftet mit seinem Ende)
+    position = (mitte - start_time.value) // schritt + 1
+    return codes, position, hourly_diff
+
+
+def _summiere_schritte(codes, position, hourly_diff):
+    """Summe der Differenzen pro (Sensor, Schritt); erwartet pro Sensor aufsteigende Positionen."""
+    reihenfolge = np.argsort(codes, kind='stable')
+    codes, position, hourly_diff = codes[reihenfolge], position[reihenfolge], hourly_diff[reihenfolge]
+    anfang = np.flatnonzero(np.r_[True, (codes[1:] != codes[:-1]) | (position[1:] != position[:-1])])
+    if len(anfang) == 0:
+        return codes, position, hourly_diff
+    return codes[anfang], position[anfang], np.add.reduceat(hourly_diff, anfang)
+
+
+def _combined_df(werte, full_time_index, sensors):
+    combined_df = pd.DataFrame(werte, index=full_time_index, columns=list(sensors))
+    if set(SENSOREN) <= set(sensors):
+        erweitere_stundendaten(combined_df)
+    return combined_df
+
+
+@gemessen('stundenraster')
+def stundenraster(df, sensors=SENSOREN, start_time=START_TIME, end_time=END_TIME, schritt=SCHRITT,
+                  dtype=WERTE_DTYPE):
+    """Bringt einen Export im Langformat in einem Durchlauf auf das Raster (Standard stündlich).
+
+    Alle Sensoren werden gemeinsam verarbeitet: nach (Sensor, Zeit) sortieren,
+    Differenzen innerhalb jeder Sensor-Gruppe, einem Zeitschritt zuordnen
+    (siehe _stundenwerte), pro Sensor und Schritt summieren und direkt in die
+    Matrix (Schritte x Sensoren, dtype) schreiben. Fehlende Schritte bleiben 0.
+    """
+    # Erstelle einen vollständigen Zeitindex
+    start_time = pd.Timestamp(start_time, tz='UTC')
+    end_time = pd.Timestamp(end_time, tz='UTC')
+    full_time_index = pd.date_range(start=start_time, end=end_time, freq=pd.Timedelta(schritt_ns(schritt)))
+
+    codes, position, hourly_diff = _summiere_schritte(*_stundenwerte(*_relevante_zeilen(df, sensors), start_time,
+                                                                     end_time, schritt_ns(schritt)))
+    im_zeitraum = (position >= 0) & (position < len(full_time_index))
+
+    with stufe('raster_fuellen'):
+        werte = np.zeros((len(full_time_index), len(sensors)), dtype=dtype)
+        werte[position[im_zeitraum], codes[im_zeitraum]] = hourly_diff[im_zeitraum]
+        notiere_zeilen(im_zeitraum.sum())
+        return _combined_df(werte, full_time_index, sensors)
+
+
+def _stream_bloecke(full_path, sensors, start_time, end_time, chunksize, schritt=STUNDE_NS):
+    """Liest die CSV blockweise und liefert pro Block (position, code, hourly_diff).
+
+    Der letzte Zählerstand jedes Sensors wird in den nächsten Block übernommen,
+    damit die Differenz über die Blockgrenze stimmt. Die Summe des letzten
+    Schritts jedes Sensors bleibt offen, bis ein späterer Schritt kommt (oder
+    die Datei endet), so dass jeder Schritt genau einmal mit der vollen Summe
+    geliefert wird. Erwartet wie der HomeAssistant-Export pro Sensor zeitlich
+    sortierte Zeilen.
+    """
+    anzahl_stunden = (end_time.value - start_time.value) // schritt + 1
+    letzter_code = np.zeros(0, dtype=np.int8)
+    letzte_zeit = np.zeros(0, dtype=np.int64)
+    letzter_state = np.zeros(0, dtype=np.float64)
+    offen_code = np.zeros(0, dtype=np.int8)
+    offen_position = np.zeros(0, dtype=np.int64)
+    offen_summe = np.zeros(0, dtype=np.float64)
+
+    def im_zeitraum(position, codes, hourly_diff):
+        drin = (position >= 0) & (position < anzahl_stunden)
+        return position[drin], codes[drin], hourly_diff[drin]
+
+    bloecke = pd.read_csv(full_path, usecols=['entity_id', 'state', 'last_changed'], chunksize=chunksize)
+    while True:
+        with stufe('csv_lesen'):
+            chunk = next(bloecke, None)
+            notiere_zeilen(0 if chunk is None else len(chunk))
+        if chunk is None:
+            break
+        codes, zeit, state = _relevante_zeilen(chunk, sensors)
+        if len(codes) == 0:
+            continue
+
+        # Übertrag aus dem vorherigen Block voranstellen
+        codes = np.concatenate([letzter_code, codes])
+        zeit = np.concatenate([letzte_zeit, zeit])
+        state = np.concatenate([letzter_state, state])
+
+        reihenfolge = np.lexsort((zeit, codes))
+        letzter = np.r_[codes[reihenfolge][1:] != codes[reihenfolge][:-1], True]
+        uebertrag = reihenfolge[letzter]
+        letzter_code, letzte_zeit, letzter_state = codes[uebertrag], zeit[uebertrag], state[uebertrag]
+
+        codes, position, hourly_diff = _stundenwerte(codes, zeit, state, start_time, end_time, schritt)
+        codes, position, hourly_diff = _summiere_schritte(np.concatenate([offen_code, codes]),
+                                                          np.concatenate([offen_position, position]),
+                                                          np.concatenate([offen_summe, hourly_diff]))
+
+        # Letzter Schritt jedes Sensors bleibt offen, er kann im nächsten Block weitergehen
+        offen = np.r_[codes[1:] != codes[:-1], True] if len(codes) else np.zeros(0, dtype=bool)
+        offen_code, offen_position, offen_summe = codes[offen], position[offen], hourly_diff[offen]
+        yield im_zeitraum(position[~offen], codes[~offen], hourly_diff[~offen])
+
+    yield im_zeitraum(offen_position, offen_code, offen_summe)
+
+
+def stundenraster_stream(full_path, sensors=SENSOREN, start_time=START_TIME, end_time=END_TIME,
+                         chunksize=1_000_000, schritt=SCHRITT):
+    """Generator über die Werte pro Zeitschritt eines grossen Exports, Block für Block.
+
+    Liefert pro gelesenem Block ein DataFrame (Index: voller Zeitschritt in UTC,
+    Spalten entity_id und hourly_diff) mit den Schritten, die dieser Block
+    ergeben hat. Der Speicherbedarf hängt von chunksize ab, nicht von der Dateigröße.
+    """
+    start_time = pd.Timestamp(start_time, tz='UTC')
+    end_time = pd.Timestamp(end_time, tz='UTC')
+    for position, codes, hourly_diff in _stream_bloecke(full_path, sensors, start_time, end_time, chunksize,
+                                                        schritt_ns(schritt)):
+        index = pd.DatetimeIndex(start_time.value + position * schritt_ns(schritt), tz='UTC')
+        yield pd.DataFrame({'entity_id': pd.Categorical.from_codes(codes, categories=sensors),
+                            'hourly_diff': hourly_diff}, index=index)
+
+
+@gemessen('lade_daten')
+def lade_stundendaten_stream(full_path, sensors=SENSOREN, start_time=START_TIME, end_time=END_TIME,
+                             chunksize=1_000_000, schritt=SCHRITT, dtype=WERTE_DTYPE):
+    """Wie lade_stundendaten, liest die CSV aber blockweise (für grosse Recorder-Exporte)."""
+    start_time = pd.Timestamp(start_time, tz='UTC')
+    end_time = pd.Timestamp(end_time, tz='UTC')
+    full_time_index = pd.date_range(start=start_time, end=end_time, freq=pd.Timedelta(schritt_ns(schritt)))
+
+    werte = np.zeros((len(full_time_index), len(sensors)), dtype=dtype)
+    for position, codes, hourly_diff in _stream_bloecke(full_path, sensors, start_time, end_time, chunksize,
+                                                        schritt_ns(schritt)):
+        werte[position, codes] = hourly_diff
+    return _combined_df(werte, full_time_index, sensors)
+
+
+# ------------------- TAGESDATEIEN (BREITFORMAT) -------------------
+
+# Sensoren in den täglichen Exporten (eine Zeile pro Sensor, eine Spalte pro Stunde)
+TAGES_PV_OST_SENSOR = 'sensor.sma_st_80_pv_gen_meter'
+TAGES_PV_WEST_SENSOR = 'sensor.sungrow_sg12rt_total_yield'
+
+
+def _parse_tagesdatei(pfad):
+    """Sensoren, Zeitstempel (ns, UTC) und Werte (Stunden x Sensoren) einer Tagesdatei."""
+    df = pd.read_csv(pfad, index_col=0)
+    # Nur Zeitspalten (die mit einer Zahl anfangen)
+    date_columns = [c for c in df.columns if c[:4].isdigit()]
+    zeit = pd.to_datetime(date_columns, utc=True).asi8
+    return df.index.str.strip().tolist(), zeit, df[date_columns].to_numpy(dtype=np.float64).T
+
+
+def lade_tagesdateien(pfade, sensors=None, max_workers=None):
+    """Liest viele Tagesdateien parallel und liefert einen zusammenhängenden Block:
+    Zeitindex (UTC, sortiert, jede Stunde nur einmal) x Sensoren (kWh pro Stunde).
+
+    Ohne sensors werden alle Sensoren übernommen, die in einer der Dateien
+    vorkommen; fehlt ein Sensor in einer Datei, sind seine Werte dort NaN.
+    Bei Stunden, die in mehreren Dateien vorkommen, zählt die erste Datei.
+    """
+    with ThreadPoolExecutor(max_workers) as pool:
+        teile = list(pool.map(_parse_tagesdatei, pfade))
+
+    if sensors is None:
+        sensors = list(dict.fromkeys(e for entities, _, _ in teile for e in entities))
+    spalten_position = {sensor: i for i, sensor in enumerate(sensors)}
+
+    anzahl = sum(len(zeit) for _, zeit, _ in teile)
+    zeit = np.empty(anzahl, dtype=np.int64)
+    werte = np.full((anzahl, len(sensors)), np.nan)
+    start = 0
+    for entities, zeit_teil, werte_teil in teile:
+        stop = start + len(zeit_teil)
+        zeit[start:stop] = zeit_teil
+        quelle = [i for i, e in enumerate(entities) if e in spalten_position]
+        ziel = [spalten_position[entities[i]] for i in quelle]
+        werte[start:stop, ziel] = werte_teil[:, quelle]
+        start = stop
+
+    # Sortieren und doppelte Stunden an den Dateigrenzen entfernen (stabil: erste Datei gewinnt)
+    reihenfolge = np.argsort(zeit, kind='stable')
+    zeit, werte = zeit[reihenfolge], werte[reihenfolge]
+    eindeutig = np.r_[True, zeit[1:] != zeit[:-1]]
+
+    index = pd.DatetimeIndex(zeit[eindeutig], tz='UTC', name='Zeit')
+    return pd.DataFrame(werte[eindeutig], index=index, columns=list(sensors))
+
+
+def lese_tagesdatei(pfad):
+    """Liest eine Tagesdatei (entity_id, type, unit, <Zeitstempel>...) und liefert
+    ein DataFrame mit Zeitindex (UTC) und einer Spalte pro Sensor (kWh pro Stunde).
+    """
+    return lade_tagesdateien([pfad], max_workers=1)
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Monte Carlo der Akkugröße mit synthetischen Jahren (Block-Bootstrap ganzer Tage)
+
+Ein aufgezeichnetes Jahr ist nur eine Stichprobe. Synthetische Jahre werden
+aus Blöcken von block_tage aufeinanderfolgenden aufgezeichneten Tagen
+zusammengesetzt; PV und Verbrauch bleiben als Überschuss gemeinsam, Wetterlagen
+und Wochenrhythmus innerhalb eines Blocks erhalten. Jeder Block stammt aus der
+Saison (windows.SAISONS) seiner Position im synthetischen Jahr. Alle Jahre x
+Kapazitäten eines Stapels laufen gemeinsam durch engine.akku_summen, die Stapel
+verteilt auf mehrere Prozesse. Jeder Stapel hat seinen eigenen Zufallsstrom,
+das Ergebnis hängt deshalb nur von seed ab, nicht von der Anzahl Prozesse.
+"""
+
+import os
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+from batterysim.economics import EINSPEISEVERG_RP, STROMPREIS_BEZUG_RP
+from batterysim.engine import akku_summen
+from batterysim.loader import zeitintervall_h
+from batterysim.profiling import gemessen
+from batterysim.windows import SAISONS
+
+PERZENTILE = (5, 10, 25, 50, 75, 90, 95)
+
+# Zeitschritte x Jahre pro Stapel (stündlich rund 500 Jahre, minütlich rund 8)
+_STAPEL_WERTE = 4_500_000
+
+# Zustand der Worker-Prozesse (wird im Initializer gesetzt)
+_worker = {}
+
+
+def tages_matrix(pv_uebrig_kwh):
+    """Überschuss (Serie mit regelmässigem Zeitindex) als (Tage x Schritte pro Tag)-Array.
+
+    Angeschnittene Tage am Anfang und Ende fallen weg. Gibt (matrix, tage) zurück,
+    tage ist der Index der Tagesanfänge.
+    """
+    zeitindex = pd.DatetimeIndex(pv_uebrig_kwh.index)
+    schritt = pd.Timedelta(np.median(np.diff(zeitindex.asi8)), 'ns')
+    pro_tag = int(round(pd.Timedelta('1D') / schritt))
+    erster = int(np.argmax(zeitindex == zeitindex.normalize()))
+    tage = (len(zeitindex) - erster) // pro_tag
+    if tage == 0:
+        raise ValueError("Keine ganzen Tage in den Daten")
+    matrix = pv_uebrig_kwh.to_numpy(dtype=np.float64)[erster:erster + tage * pro_tag].reshape(tage, pro_tag)
+    return matrix, zeitindex[erster:erster + tage * pro_tag:pro_tag]
+
+
+def ziehe_tage(tage, anzahl_jahre, rng, block_tage=7, jahr_tage=365):
+    """Quell-Tage (Index in tage) für anzahl_jahre synthetische Jahre, Form (Jahre, jahr_tage).
+
+    Das synthetische Jahr beginnt am ersten aufgezeichneten Tag. Für jeden Block
+    wird der Anfang zufällig unter den aufgezeichneten Tagen derselben Saison
+    gezogen, von denen aus noch block_tage Tage aufgezeichnet sind.
+    """
+    tage = pd.DatetimeIndex(tage)
+    saison = np.array([SAISONS[m] for m in tage.month])
+    anfaenge = np.arange(0, jahr_tage, block_tage)
+    ziel_saison = [SAISONS[(tage[0] + pd.Timedelta(days=int(a))).month] for a in anfaenge]
+
+    moeglich = np.arange(len(tage)) <= len(tage) - block_tage
+    quelle = np.empty((anzahl_jahre, len(anfaenge)), dtype=np.int64)
+    for name in set(ziel_saison):
+        pool = np.flatnonzero((saison == name) & moeglich)
+        if len(pool) == 0:
+            raise ValueError(f"Keine Blöcke von {block_tage} Tagen für die Saison {name} in den Daten")
+        spalten = [i for i, s in enumerate(ziel_saison) if s == name]
+        quelle[:, spalten] = pool[rng.integers(len(pool), size=(anzahl_jahre, len(spalten)))]
+    return (quelle[:, :, np.newaxis] + np.arange(block_tage)).reshape(anzahl_jahre, -1)[:, :jahr_tage]
+
+
+def _mc_worker_init(matrix, tage, kapazitaeten, preise, optionen, akku_parameter):
+    _worker.update(matrix=matrix, tage=tage, kapazitaeten=kapazitaeten, preise=preise,
+                   optionen=optionen, akku_parameter=akku_parameter)
+
+
+def _mc_block(auftrag):
+    """Simuliert einen Stapel synthetischer Jahre für alle Kapazitäten; Ersparnis (Jahre x Kapazitäten)."""
+    saat, anzahl_jahre = auftrag
+    matrix = _worker['matrix']
+    strompreis_bezug_rp, einspeiseverg_rp = _worker['preise']
+    quelle = ziehe_tage(_worker['tage'], anzahl_jahre, np.random.default_rng(saat), **_worker['optionen'])
+    # (Zeit, Jahre): jeder Zeitschritt aller Jahre liegt zusammen für die Schleife in akku_summen
+    pv_uebrig = np.ascontiguousarray(matrix[quelle].reshape(anzahl_jahre, -1).T)
+    ergebnis = akku_summen(pv_uebrig[:, :, np.newaxis], _worker['kapazitaeten'], **_worker['akku_parameter'])
+    return (ergebnis.entladen * strompreis_bezug_rp - ergebnis.geladen * einspeiseverg_rp) / 100
+
+
+@gemessen('monte_carlo')
+def monte_carlo_sweep(pv_uebrig_kwh, akku_groessen, jahre=1000, strompreis_bezug_rp=STROMPREIS_BEZUG_RP,
+                      einspeiseverg_rp=EINSPEISEVERG_RP, block_tage=7, jahr_tage=365, seed=0, stapel=None,
+                      prozesse=None, perzentile=PERZENTILE, **akku_parameter):
+    """Ersparnis-Verteilung pro Akkugröße über jahre synthetische Jahre.
+
+    pv_uebrig_kwh ist eine Serie mit Zeitindex (mindestens ein Block pro
+    Saison); akku_parameter werden an engine.akku_summen weitergereicht (ohne
+    zeitintervall gilt der Schritt des Index). Je stapel Jahre (Standard: so
+    viele, dass ein Stapel rund _STAPEL_WERTE Werte hat) werden gemeinsam
+    simuliert, mit prozesse > 1 parallel.
+
+    Gibt (tabelle, ersparnis) zurück: tabelle mit einer Zeile pro Akkugröße
+    (mittel_chf, std_chf und p<q>_chf für jedes Perzentil) und ersparnis als
+    (Jahre x Akkugrößen)-Array der Jahresersparnis (CHF).
+    """
+    kapazitaeten = np.asarray(akku_groessen, dtype=np.float64)
+    akku_parameter.setdefault('zeitintervall', zeitintervall_h(pv_uebrig_kwh.index))
+    matrix, tage = tages_matrix(pv_uebrig_kwh)
+    stapel = stapel or max(1, _STAPEL_WERTE // (jahr_tage * matrix.shape[1]))
+    initargs = (matrix, tage, kapazitaeten, (strompreis_bezug_rp, einspeiseverg_rp),
+                {'block_tage': block_tage, 'jahr_tage': jahr_tage}, akku_parameter)
+    saaten = np.random.SeedSequence(seed).spawn(-(-jahre // stapel))
+    auftraege = [(saat, min(stapel, jahre - i * stapel)) for i, saat in enumerate(saaten)]
+
+    prozesse = min(prozesse or os.cpu_count(), len(auftraege))
+    if prozesse > 1:
+        with Pool(prozesse, initializer=_mc_worker_init, initargs=initargs) as pool:
+            bloecke = pool.map(_mc_block, auftraege)
+    else:
+        _mc_worker_init(*initargs)
+        bloecke = [_mc_block(auftrag) for auftrag in auftraege]
+    ersparnis = np.vstack(bloecke)
+
+    tabelle = pd.DataFrame({'mittel_chf': ersparnis.mean(axis=0), 'std_chf': ersparnis.std(axis=0)},
+                           index=pd.Index(kapazitaeten, name='kapazitaet_kwh'))
+    for q, werte in zip(perzentile, np.percentile(ersparnis, perzentile, axis=0)):
+        tabelle[f"p{q:g}_chf"] = werte
+    return tabelle, ersparnis
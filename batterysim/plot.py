@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Optionales Plotten für Skripte und Batch-Läufe
+
+matplotlib wird erst importiert, wenn wirklich geplottet wird. Gesteuert über
+die Umgebungsvariable BATTERYSIM_PLOT:
+
+    anzeigen  interaktive Fenster (plt.show), Standard mit Display
+    aus       keine Plots, matplotlib wird nicht importiert (Standard ohne Display)
+    datei     Plots als PNG nach BATTERYSIM_PLOT_DIR (Standard: plots) speichern
+
+In den Modi 'aus' und 'datei' wird das nicht-interaktive Agg-Backend verwendet.
+"""
+
+import os
+import sys
+
+from batterysim.profiling import stufe
+
+PLOT_MODI = ('anzeigen', 'aus', 'datei')
+
+
+def plot_modus():
+    """Aktueller Plot-Modus aus BATTERYSIM_PLOT, sonst abhängig vom Display."""
+    modus = os.environ.get('BATTERYSIM_PLOT', '').strip().lower()
+    if modus:
+        if modus not in PLOT_MODI:
+            raise ValueError(f"Unbekannter Plot-Modus {modus!r}, erlaubt: {', '.join(PLOT_MODI)}")
+        return modus
+    # Server ohne Display: nicht blockieren und kein Backend aufsetzen
+    if sys.platform.startswith('linux') and not (os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY')):
+        return 'aus'
+    return 'anzeigen'
+
+
+def plots_aktiv():
+    return plot_modus() != 'aus'
+
+
+def pyplot():
+    """Importiert matplotlib.pyplot bei Bedarf, ausserhalb von 'anzeigen' mit Agg-Backend."""
+    import matplotlib
+    if plot_modus() != 'anzeigen':
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def zeige(name):
+    """Zeigt die aktuelle Figur an oder speichert sie als <name>.png (Modus 'datei')."""
+    plt = pyplot()
+    with stufe(f"plot_{name}"):
+        if plot_modus() == 'datei':
+            ordner = os.environ.get('BATTERYSIM_PLOT_DIR', 'plots')
+            os.makedirs(ordner, exist_ok=True)
+            plt.savefig(os.path.join(ordner, f"{name}.png"), dpi=100)
+            plt.close()
+        else:
+            plt.show()
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Laufzeitmessung der Pipeline-Stufen (CSV lesen, Zeitstempel, Stundenraster,
+Simulation, Auswertung, Plots)
+
+Ausgeschaltet kostet eine Stufe nur einen Funktionsaufruf. Eingeschaltet wird
+über die Umgebungsvariable BATTERYSIM_PROFIL oder die CLI (--profil):
+
+    aus       keine Messung (Standard)
+    zeit      Laufzeit, Aufrufe und verarbeitete Zeilen pro Stufe
+    speicher  zusätzlich der Spitzenwert des Speichers pro Stufe (tracemalloc, bremst)
+
+Am Ende des Laufs kommt eine Tabelle nach stderr; mit BATTERYSIM_PROFIL_DATEI
+(bzw. --profil-json) zusätzlich das Profil als JSON, '-' schreibt es als eine
+Zeile nach stderr (z.B. für Produktions-Logs). Stufen dürfen geschachtelt
+sein, sie werden unter ihrem Pfad (z.B. 'simulate/daten_cache/lade_daten/csv_lesen') summiert.
+"""
+
+import atexit
+import contextlib
+import functools
+import json
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+
+PROFIL_MODI = ('aus', 'zeit', 'speicher')
+
+_AKTIV = False
+_SPEICHER = False
+_DATEI = None
+_AUS = contextlib.nullcontext()
+_stapel = []
+_messungen = {}
+_start = None
+
+
+class _Stufe:
+    __slots__ = ('name', 'messung', 'start', 'zeilen', 'speicher_start', 'spitze')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        # Eintrag schon beim Betreten anlegen, damit die Tabelle der Aufrufreihenfolge folgt
+        pfad = '/'.join([stufe.name for stufe in _stapel] + [self.name])
+        self.messung = _messungen.get(pfad)
+        if self.messung is None:
+            self.messung = _messungen[pfad] = {'aufrufe': 0, 'sekunden': 0.0, 'zeilen': 0, 'spitzen_mb': 0.0}
+        self.zeilen = 0
+        if _SPEICHER:
+            aktuell, spitze = tracemalloc.get_traced_memory()
+            # Spitze der offenen Stufe sichern, bevor der Zähler für diese Stufe neu beginnt
+            if _stapel:
+                _stapel[-1].spitze = max(_stapel[-1].spitze, spitze)
+            tracemalloc.reset_peak()
+            self.speicher_start, self.spitze = aktuell, aktuell
+        _stapel.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        sekunden = time.perf_counter() - self.start
+        _stapel.pop()
+        messung = self.messung
+        messung['aufrufe'] += 1
+        messung['sekunden'] += sekunden
+        messung['zeilen'] += self.zeilen
+        if _SPEICHER:
+            self.spitze = max(self.spitze, tracemalloc.get_traced_memory()[1])
+            if _stapel:
+                _stapel[-1].spitze = max(_stapel[-1].spitze, self.spitze)
+            messung['spitzen_mb'] = max(messung['spitzen_mb'], (self.spitze - self.speicher_start) / 2**20)
+        return False
+
+
+def aktiviere(modus='zeit', datei=None):
+    """Messung einschalten (modus 'zeit' oder 'speicher'); am Ende des Laufs wird berichtet."""
+    global _AKTIV, _SPEICHER, _DATEI, _start
+    if modus not in PROFIL_MODI:
+        raise ValueError(f"Unbekannter Profil-Modus {modus!r}, erlaubt: {', '.join(PROFIL_MODI)}")
+    if modus == 'aus':
+        return
+    if not _AKTIV:
+        atexit.register(_berichte)
+        _start = time.perf_counter()
+    _AKTIV = True
+    _DATEI = datei or _DATEI
+    if modus == 'speicher' and not _SPEICHER:
+        _SPEICHER = True
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+
+def aktiv():
+    return _AKTIV
+
+
+def stufe(name):
+    """Kontextmanager, der den Block als Stufe name misst (ausgeschaltet: ohne Wirkung)."""
+    return _Stufe(name) if _AKTIV else _AUS
+
+
+def gemessen(name, zeilen=None):
+    """Dekorator: jeder Aufruf ist eine Stufe; zeilen(ergebnis) gibt die verarbeiteten Zeilen an."""
+    def dekorator(funktion):
+        @functools.wraps(funktion)
+        def verpackt(*args, **kwargs):
+            if not _AKTIV:
+                return funktion(*args, **kwargs)
+            with _Stufe(name) as offen:
+                ergebnis = funktion(*args, **kwargs)
+                if zeilen is not None:
+                    offen.zeilen += int(zeilen(ergebnis))
+            return ergebnis
+        return verpackt
+    return dekorator
+
+
+def notiere_zeilen(anzahl):
+    """Verarbeitete Zeilen der innersten offenen Stufe zuzählen."""
+    if _stapel:
+        _stapel[-1].zeilen += int(anzahl)
+
+
+def profil():
+    """Messungen bisher: gesamt_sekunden und eine Liste der Stufen in Reihenfolge des ersten Aufrufs."""
+    gesamt = time.perf_counter() - _start if _start is not None else 0.0
+    return {
+        'befehl': ' '.join(sys.argv),
+        'zeitpunkt': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'modus': 'speicher' if _SPEICHER else 'zeit' if _AKTIV else 'aus',
+        'gesamt_sekunden': round(gesamt, 4),
+        'stufen': [{'stufe': pfad, 'aufrufe': m['aufrufe'], 'sekunden': round(m['sekunden'], 4),
+                    'zeilen': m['zeilen'], 'spitzen_mb': round(m['spitzen_mb'], 1) if _SPEICHER else None}
+                   for pfad, m in _messungen.items()],
+    }
+
+
+def drucke_profil(daten, datei=sys.stderr):
+    """Tabelle pro Stufe: Aufrufe, Sekunden, Anteil am Lauf, Zeilen, Zeilen/s und Speicher."""
+    gesamt = daten['gesamt_sekunden'] or 1.0
+    print(f"\n=== PROFIL ({daten['gesamt_sekunden']:.3f} s) ===", file=datei)
+    print(f"{'Stufe':<40}{'Aufrufe':>8}{'Sekunden':>10}{'Anteil':>8}{'Zeilen':>13}{'Zeilen/s':>13}"
+          f"{'Spitze MB':>11}", file=datei)
+    for wert in daten['stufen']:
+        tiefe = wert['stufe'].count('/')
+        name = '  ' * tiefe + wert['stufe'].rsplit('/', 1)[-1]
+        zeilen = f"{wert['zeilen']:,}" if wert['zeilen'] else '-'
+        rate = f"{wert['zeilen'] / wert['sekunden']:,.0f}" if wert['zeilen'] and wert['sekunden'] else '-'
+        spitze = f"{wert['spitzen_mb']:.1f}" if wert['spitzen_mb'] is not None else '-'
+        print(f"{name:<40}{wert['aufrufe']:>8}{wert['sekunden']:>10.4f}{wert['sekunden'] / gesamt:>8.1%}"
+              f"{zeilen:>13}{rate:>13}{spitze:>11}", file=datei)
+
+
+def _berichte():
+    if not _messungen:
+        return
+    daten = profil()
+    drucke_profil(daten)
+    if _DATEI == '-':
+        print(json.dumps(daten, ensure_ascii=False), file=sys.stderr)
+    elif _DATEI:
+        with open(_DATEI, 'w', encoding='utf-8') as f:
+            json.dump(daten, f, indent=2, ensure_ascii=False)
+
+
+# Ein unbekannter Wert in der Umgebung (z.B. BATTERYSIM_PROFIL=1) darf den Import nicht abbrechen
+_modus = os.environ.get('BATTERYSIM_PROFIL', '').strip().lower() or 'aus'
+if _modus not in PROFIL_MODI:
+    warnings.warn(f"BATTERYSIM_PROFIL={_modus!r} unbekannt (erlaubt: {', '.join(PROFIL_MODI)}), Profil bleibt aus",
+                  stacklevel=2)
+    _modus = 'aus'
+aktiviere(_modus, os.environ.get('BATTERYSIM_PROFIL_DATEI') or None)
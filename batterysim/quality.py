@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Datenqualität der rohen Zählerstände im Langformat (entity_id, state, last_changed)
+
+Alle Sensoren werden gemeinsam in einem Durchlauf geprüft: nach Sensor
+sortieren (stabil, bei kleinen Codes ein Radix-Sort), Differenzen von Zeit
+und Zählerstand innerhalb jeder Sensor-Gruppe, dann reine Masken. Gefunden
+werden Lücken, doppelte Zeitstempel, Zähler-Resets (negative Differenzen),
+unplausible Sprünge, hängende Zähler und nicht numerische Zustände
+('unavailable', 'unknown'). Aufeinanderfolgende Treffer derselben Art werden
+zu einem Intervall zusammengefasst, damit der Bericht kompakt bleibt.
+"""
+
+import numpy as np
+import pandas as pd
+
+from batterysim.loader import _zeit_ns
+from batterysim.profiling import gemessen, notiere_zeilen, stufe
+
+STUNDE_NS = 3600 * 10**9
+
+BEFUND_ARTEN = ('ungueltig', 'doppelt', 'luecke', 'reset', 'spitze', 'haenger')
+
+_SPALTEN = ['entity_id', 'art', 'von', 'bis', 'anzahl', 'dauer_h', 'wert']
+
+
+def _laeufe(maske, neue_gruppe):
+    """Anfang und Ende (inklusiv) jeder zusammenhängenden True-Folge, die nicht über
+    eine Gruppengrenze (neue_gruppe[i]: Zeile i beginnt einen neuen Sensor) geht."""
+    anfang = maske & ~np.r_[False, maske[:-1] & ~neue_gruppe[1:]]
+    ende = maske & ~np.r_[maske[1:] & ~neue_gruppe[1:], False]
+    return np.flatnonzero(anfang), np.flatnonzero(ende)
+
+
+def _befunde(art, anfang, ende, codes, von_ns, bis_ns, wert):
+    return pd.DataFrame({'code': codes[anfang], 'art': art, 'von_ns': von_ns, 'bis_ns': bis_ns,
+                         'anzahl': ende - anfang + 1, 'wert': wert})
+
+
+def zeitluecken(zeitindex, max_luecke=None):
+    """Lücken eines Zeitindex über max_luecke (Standard: 1.5x der typische Abstand)
+    als Tabelle (von, bis, dauer_h)."""
+    zeit = pd.DatetimeIndex(zeitindex).asi8
+    abstand = np.diff(zeit)
+    grenze = 1.5 * np.median(abstand) if max_luecke is None else pd.Timedelta(max_luecke).value
+    luecke = np.flatnonzero(abstand > grenze)
+    return pd.DataFrame({'von': zeitindex[luecke], 'bis': zeitindex[luecke + 1],
+                         'dauer_h': abstand[luecke] / STUNDE_NS})
+
+
+@gemessen('datenqualitaet')
+def pruefe_zaehlerstaende(df, max_luecke_h=None, spitzen_faktor=20.0, max_kw=None, haenger_h=48.0):
+    """Prüft einen Export im Langformat und gibt eine Tabelle der Befunde zurück.
+
+    Eine Zeile pro Intervall: entity_id, art (siehe BEFUND_ARTEN), von, bis,
+    anzahl (betroffene Zeilen) und dauer_h sowie wert je nach Art:
+    luecke      Abstand grösser max_luecke_h (Standard: 3x der typische Abstand
+                des Sensors), über den der Zähler mehr gestiegen ist als in
+                einem Schritt möglich (Messungen fehlen); wert = längster Abstand (h)
+    doppelt     mehrere Zeilen mit gleichem Zeitstempel; wert = grösste Abweichung
+    reset       Zählerstand sinkt; wert = Summe der Rückgänge
+    spitze      Leistung (Differenz pro Stunde) über spitzen_faktor x dem
+                99%-Quantil des Sensors bzw. über max_kw; wert = höchste Leistung
+    haenger     Zählerstand ändert sich mindestens haenger_h Stunden nicht (auch
+                ohne Zeilen dazwischen); wert = Dauer (h)
+    ungueltig   state nicht numerisch; wert = NaN
+    """
+    with stufe('sensoren'):
+        notiere_zeilen(len(df))
+        codes, entities = pd.factorize(df['entity_id'], sort=True)
+    with stufe('zeitstempel'):
+        zeit = _zeit_ns(df['last_changed'])
+    with stufe('zaehlerstaende'):
+        notiere_zeilen(len(df))
+        state = pd.to_numeric(df['state'], errors='coerce').to_numpy(dtype=np.float64)
+
+    with stufe('sortieren'):
+        notiere_zeilen(len(codes))
+        # Stabil nach Sensor (Radix-Sort), nach Zeit nur falls ein Sensor nicht sortiert ist
+        reihenfolge = np.argsort(codes, kind='stable')
+        codes, zeit, state = codes[reihenfolge], zeit[reihenfolge], state[reihenfolge]
+        neue_gruppe = np.r_[True, codes[1:] != codes[:-1]]
+        if (np.diff(zeit)[~neue_gruppe[1:]] < 0).any():
+            reihenfolge = np.lexsort((zeit, codes))
+            codes, zeit, state = codes[reihenfolge], zeit[reihenfolge], state[reihenfolge]
+
+    teile = []
+    with stufe('ungueltig'):
+        ungueltig = np.isnan(state)
+        anfang, ende = _laeufe(ungueltig, neue_gruppe)
+        teile.append(_befunde('ungueltig', anfang, ende, codes, zeit[anfang], zeit[ende], np.nan))
+        # Für alle weiteren Prüfungen nur gültige Zählerstände
+        codes, zeit, state = codes[~ungueltig], zeit[~ungueltig], state[~ungueltig]
+        neue_gruppe = np.r_[True, codes[1:] != codes[:-1]]
+
+    with stufe('differenzen'):
+        notiere_zeilen(len(codes))
+        # Differenz zur Vorgängerzeile; am Gruppenanfang ungültig
+        abstand = np.diff(zeit, prepend=zeit[:1])
+        diff = np.diff(state, prepend=state[:1])
+        innen = ~neue_gruppe
+        abstand[neue_gruppe], diff[neue_gruppe] = 0, 0.0
+        vorher = np.maximum(np.arange(len(zeit)) - 1, 0)
+
+        # Typischer Abstand und Leistung pro Sensor (Median bzw. 99%-Quantil, ohne Gruppenanfänge)
+        proben = pd.DataFrame({'code': codes[innen], 'abstand': abstand[innen]})
+        schritt = proben.loc[proben['abstand'] > 0].groupby('code')['abstand'].median()
+        schritt = schritt.reindex(range(len(entities))).fillna(STUNDE_NS).to_numpy()
+        leistung = np.zeros(len(diff))
+        positiv = innen & (abstand > 0) & (diff > 0)
+        leistung[positiv] = diff[positiv] / (abstand[positiv] / STUNDE_NS)
+        quantil = pd.Series(leistung[positiv]).groupby(codes[positiv]).quantile(0.99)
+        quantil = quantil.reindex(range(len(entities))).fillna(np.inf).to_numpy()
+
+    with stufe('befunde'):
+        def diff_befunde(art, maske, werte, funktion):
+            # werte sind ausserhalb der Maske 0 und sonst >= 0, deshalb reicht reduceat ab jedem Anfang
+            anfang, ende = _laeufe(maske, neue_gruppe)
+            wert = funktion.reduceat(werte, anfang) if len(anfang) else np.zeros(0)
+            teile.append(_befunde(art, anfang, ende, codes, zeit[vorher[anfang]], zeit[ende], wert))
+
+        doppelt = innen & (abstand == 0)
+        diff_befunde('doppelt', doppelt, np.abs(diff) * doppelt, np.maximum)
+
+        grenze = (3 * schritt if max_luecke_h is None else np.full(len(entities), max_luecke_h * STUNDE_NS))
+        # HomeAssistant schreibt nur bei Änderungen: ein langer Abstand ist erst dann eine
+        # Lücke, wenn der Zähler dabei mehr gestiegen ist, als in einem Schritt möglich wäre
+        ein_schritt = quantil * schritt / STUNDE_NS
+        luecke = innen & (abstand > grenze[codes]) & (diff > ein_schritt[codes])
+        diff_befunde('luecke', luecke, abstand * luecke / STUNDE_NS, np.maximum)
+
+        reset = innen & (diff < 0)
+        diff_befunde('reset', reset, -diff * reset, np.add)
+
+        schwelle = spitzen_faktor * quantil[codes]
+        if max_kw is not None:
+            schwelle = np.minimum(schwelle, max_kw)
+        spitze = (leistung > schwelle) & ~luecke
+        diff_befunde('spitze', spitze, leistung * spitze, np.maximum)
+
+        # Hängend: Folge von Differenzen 0 (ohne Lücken und Duplikate) über haenger_h
+        steht = innen & (diff == 0) & (abstand > 0)
+        anfang, ende = _laeufe(steht, neue_gruppe)
+        dauer = (zeit[ende] - zeit[vorher[anfang]]) / STUNDE_NS
+        lang = dauer >= haenger_h
+        anfang, ende = anfang[lang], ende[lang]
+        teile.append(_befunde('haenger', anfang, ende, codes, zeit[vorher[anfang]], zeit[ende], dauer[lang]))
+
+    befunde = pd.concat(teile, ignore_index=True)
+    befunde['art'] = pd.Categorical(befunde['art'], categories=BEFUND_ARTEN)
+    befunde = befunde.sort_values(['code', 'von_ns', 'art'], kind='stable', ignore_index=True)
+    befunde.insert(0, 'entity_id', np.asarray(entities)[befunde.pop('code').to_numpy()])
+    befunde['von'] = pd.to_datetime(befunde.pop('von_ns'), utc=True)
+    befunde['bis'] = pd.to_datetime(befunde.pop('bis_ns'), utc=True)
+    befunde['dauer_h'] = (befunde['bis'] - befunde['von']).dt.total_seconds() / 3600
+    return befunde[_SPALTEN]
+
+
+def pruefe_export(full_path, **grenzen):
+    """Wie pruefe_zaehlerstaende, liest den Export (CSV) selbst ein."""
+    with stufe('csv_lesen'):
+        df = pd.read_csv(full_path, usecols=['entity_id', 'state', 'last_changed'],
+                         dtype={'entity_id': 'category'})
+        notiere_zeilen(len(df))
+    return pruefe_zaehlerstaende(df, **grenzen)
+
+
+def zusammenfassung(befunde, entities=None):
+    """Anzahl Intervalle pro Sensor und Befund-Art (Zeilen: Sensoren, Spalten: BEFUND_ARTEN)."""
+    tabelle = pd.crosstab(befunde['entity_id'], befunde['art'], dropna=False)
+    tabelle = tabelle.reindex(columns=list(BEFUND_ARTEN), fill_value=0)
+    if entities is not None:
+        tabelle = tabelle.reindex(list(entities), fill_value=0)
+    return tabelle
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Textausgabe der Statistiken und Ergebnisse (gemeinsam für Skripte und CLI)
+"""
+
+from batterysim.economics import jahresstatistik
+
+
+def zeitraum(index):
+    """Jahr bzw. Jahresbereich des Zeitindex für Überschriften, z.B. '2024' oder '2023–2025'."""
+    erstes, letztes = index[0].year, index[-1].year
+    return str(erstes) if erstes == letztes else f"{erstes}–{letztes}"
+
+
+def drucke_sensor_statistik(combined_df, sensors):
+    """Anzahl Stunden mit Werten und die ersten Nicht-Null Werte pro Sensor."""
+    for sensor in sensors:
+        ds = combined_df[[sensor]].rename(columns={sensor: 'hourly_diff'})
+        non_zero_count = (ds['hourly_diff'] != 0).sum()
+        total_count = len(ds)
+        print(f"\n{sensor}:")
+        print(f"  Datenpunkte mit Werten > 0: {non_zero_count}/{total_count}")
+        print(f"  Erste 5 Nicht-Null Werte:")
+        print(ds[ds['hourly_diff'] != 0].head())
+
+
+def drucke_jahresstatistik(combined_df, zusatz=''):
+    """Jahressummen sowie Autarkie-Grad und Eigenverbrauchsquote laut Sensoren (ohne Akku)."""
+    print(f"\n=== JAHRESSTATISTIKEN {zeitraum(combined_df.index)} ===")
+    statistik = jahresstatistik(combined_df)
+    print(f"PV Gesamt erweitert: {statistik['pv_gesamt_kwh_erweitert']:.1f} kWh")
+    print(f"Hausverbrauch: {statistik['hausverbrauch_kwh']:.1f} kWh")
+    print(f"PV Überschuss: {statistik['pv_uebrig_kwh']:.1f} kWh")
+    print(f"Netznutzung: {statistik['netznutzung_kwh']:.1f} kWh")
+    print(f"Netzeinspeisung: {statistik['netzeinspeisung_kwh']:.1f} kWh")
+
+    print(f"\nAutarkie-Grad{zusatz}: {statistik['autarkie_grad']:.1f}%")
+    print(f"Eigenverbrauchsquote{zusatz}: {statistik['eigenverbrauchsquote']:.1f}%")
+
+
+def drucke_energie_summary(summary, ersparnis):
+    """Energiebilanz mit Akku (energie_summary) und Ersparnis in CHF (akku_ersparnis)."""
+    print("\n=== ENERGIE-SUMMARY MIT AKKU ===")
+    print(f"Gesamtverbrauch:         {summary['gesamt_verbrauch_kwh']:.2f} kWh")
+    print(f"PV-Gesamterzeugung:      {summary['gesamt_pv_kwh']:.2f} kWh")
+    print(f"Direkt genutzte PV:      {summary['pv_direktnutzung_kwh']:.2f} kWh")
+    print(f"Energie in Akku geladen: {summary['akku_energie_von_pv_kwh']:.2f} kWh")
+    print(f"Aus dem Akku entnommen:  {summary['akku_entnahmen_kwh']:.2f} kWh")
+    print(f"Netzbezug:               {summary['netzbezug_kwh']:.2f} kWh")
+    print(f"Gesparte Energie (PV+Akku): {summary['eingespart_kwh']:.2f} kWh")
+    print(f"Autarkiegrad (mit Akku): {summary['autarkiegrad']:.1f}%")
+
+    print("\n=== FINANZIELLE ERSPARNIS (AKKU) ===")
+    print(f"Netzstrom durch Akku vermieden:   {summary['akku_entnahmen_kwh']:.2f} kWh → "
+          f"{ersparnis['ersparnis_durch_vermeidung_netbezug_rp']:.2f} Rp")
+    print(f"Verhinderte Einspeisung:          {summary['akku_energie_von_pv_kwh']:.2f} kWh → "
+          f"{ersparnis['verlust_durch_verhinderte_einspeisung_rp']:.2f} Rp")
+    print(f"💰 Nettoersparnis durch Akku:     {ersparnis['netto_ersparnis_akku_chf']:.2f} CHF")
+    print("=====================================")
+
+
+def drucke_sweep(akku_resultate):
+    """Jahresergebnis pro Akkugröße aus kapazitaets_sweep."""
+    print("\n=== JAHRESERGEBNIS PRO AKKU ===")
+    for k, r in akku_resultate.iterrows():
+        print(f"{k:>3g} kWh Akku:  Ersparnis = {r['netto_chf']:.2f} CHF   "
+              f"(geladen: {r['geladen_kwh']:.1f} kWh, entladen: {r['entladen_kwh']:.1f} kWh)")
+
+
+def drucke_monte_carlo(tabelle, jahre):
+    """Ersparnis-Perzentile pro Akkugröße aus monte_carlo_sweep."""
+    perzentile = [spalte for spalte in tabelle.columns if spalte.startswith('p')]
+    print(f"\n=== ERSPARNIS ÜBER {jahre} SYNTHETISCHE JAHRE (CHF) ===")
+    print(f"{'Akku':>8}{'Mittel':>9}{'Std':>7}" + ''.join(f"{spalte[:-4].upper():>8}" for spalte in perzentile))
+    for k, r in tabelle.iterrows():
+        print(f"{k:>4g} kWh{r['mittel_chf']:>9.1f}{r['std_chf']:>7.1f}"
+              + ''.join(f"{r[spalte]:>8.1f}" for spalte in perzentile))
+
+
+def drucke_tarife(tabelle):
+    """Kosten und Akku-Ersparnis pro Tarif aus bewerte_tarife."""
+    print("\n=== NETZKOSTEN PRO TARIF ===")
+    for name, r in tabelle.iterrows():
+        print(f"{name:<16} Ø Bezug {r['mittlerer_bezugspreis_rp']:5.1f} Rp/kWh   "
+              f"ohne Akku: {r['kosten_ohne_akku_chf']:8.2f} CHF   mit Akku: {r['kosten_mit_akku_chf']:8.2f} CHF   "
+              f"Ersparnis: {r['ersparnis_chf']:.2f} CHF")
+
+
+def drucke_fahrweise(tabelle, tarif):
+    """Netzkosten mit bisheriger und optimaler Fahrweise pro Akkugröße aus vergleiche_mit_greedy."""
+    print(f"\n=== OPTIMALE FAHRWEISE ({tarif}) ===")
+    for k, r in tabelle.iterrows():
+        print(f"{k:>3g} kWh Akku:  ohne Akku {r['kosten_ohne_akku_chf']:8.2f} CHF   "
+              f"bisher {r['kosten_greedy_chf']:8.2f} CHF   optimal {r['kosten_optimal_chf']:8.2f} CHF   "
+              f"Lücke: {r['luecke_chf']:.2f} CHF")
+
+
+def drucke_optimale_kapazitaet(optimum, kosten_chf_pro_kwh):
+    """Ergebnis von optimale_kapazitaet."""
+    print("\n=== OPTIMALE AKKUGRÖSSE ===")
+    print(f"Kosten pro kWh und Jahr: {kosten_chf_pro_kwh:.2f} CHF")
+    print(f"Sättigung (Akku wird nie voll): {optimum['saettigung_kwh']:.1f} kWh")
+    print(f"Optimum: {optimum['kapazitaet_kwh']:g} kWh   Ersparnis = {optimum['ersparnis_chf']:.2f} CHF   "
+          f"Nettowert = {optimum['netto_chf']:.2f} CHF   ({optimum['simulationen']} Simulationen)")
+
+
+def drucke_datenqualitaet(befunde, zusammenfassung, max_zeilen=50):
+    """Anzahl Befunde pro Sensor und Art sowie die Intervalle aus pruefe_zaehlerstaende."""
+    print("\n=== DATENQUALITÄT ===")
+    print(zusammenfassung.to_string())
+    if befunde.empty:
+        print("\n✅ Keine Befunde.")
+        return
+    print(f"\n{len(befunde)} Intervalle" + (f" (die ersten {max_zeilen})" if len(befunde) > max_zeilen else "") + ":")
+    for _, r in befunde.head(max_zeilen).iterrows():
+        print(f"  {r['entity_id']:<36} {r['art']:<10} {r['von']:%Y-%m-%d %H:%M} → {r['bis']:%Y-%m-%d %H:%M}  "
+              f"({r['dauer_h']:.1f} h, {r['anzahl']} Zeilen, Wert {r['wert']:.2f})")
+
+
+def drucke_fenster(tabellen, max_zeilen=12):
+    """Autarkie, Eigenverbrauch und Ersparnis pro Fenster aus fenster_analyse; bei vielen
+    Fenstern nur das schlechteste, das mittlere und das beste nach Autarkiegrad."""
+    for art, tabelle in tabellen.items():
+        print(f"\n=== FENSTER: {art.upper()} ({len(tabelle)}) ===")
+        if len(tabelle) > max_zeilen:
+            sortiert = tabelle.sort_values('autarkiegrad', kind='stable')
+            tabelle = sortiert.iloc[[0, len(sortiert) // 2, -1]]
+            tabelle.index = [f"{name} ({lage})" for name, lage in zip(tabelle.index, ('min', 'median', 'max'))]
+        for name, r in tabelle.iterrows():
+            print(f"{name:<24} {r['stunden']:>6g} h   Verbrauch {r['verbrauch_kwh']:8.1f} kWh   "
+                  f"PV {r['pv_kwh']:8.1f} kWh   Autarkie {r['autarkiegrad']:5.1f} %   "
+                  f"Eigenverbrauch {r['eigenverbrauchsquote']:5.1f} %   Ersparnis {r['ersparnis_chf']:8.2f} CHF")
+
+
+def drucke_alterung(tabelle):
+    """Zyklen und Kapazitätsverlust pro Konfiguration aus zyklen_und_alterung."""
+    print("\n=== ZYKLEN UND ALTERUNG ===")
+    for k, r in tabelle.iterrows():
+        print(f"{k:>4g} kWh Akku:  {r['vollzyklen']:7.1f} Vollzyklen   Ø SOC {r['mittlerer_soc']:.0%}   "
+              f"Verlust zyklisch {r['verlust_zyklisch']:.2%}, kalendarisch {r['verlust_kalendarisch']:.2%}   "
+              f"Restkapazität {r['restkapazitaet']:.1%}")
+
+
+def drucke_lebensdauer(tabelle):
+    """Restkapazität und Ersparnis über die Jahre aus simuliere_mit_alterung."""
+    jahre = int(tabelle.index.get_level_values('jahr').max())
+    print(f"\n=== LEBENSDAUER ÜBER {jahre} JAHRE ===")
+    for k, verlauf in tabelle.groupby(level='kapazitaet_kwh'):
+        ende = verlauf.iloc[-1]
+        print(f"{k:>4g} kWh Akku:  nach {jahre} Jahren {ende['kapazitaet_ende_kwh']:5.1f} kWh "
+              f"({ende['restkapazitaet']:.1%})   Ø {verlauf['vollzyklen'].mean():5.1f} Vollzyklen/Jahr   "
+              f"Ersparnis Jahr 1 {verlauf['ersparnis_chf'].iloc[0]:7.2f} CHF, Jahr {jahre} "
+              f"{ende['ersparnis_chf']:7.2f} CHF, gesamt {verlauf['ersparnis_chf'].sum():8.2f} CHF")
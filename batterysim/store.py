@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+Archiv vieler Standorte als memory-mapped Reihen mit festem Zeitschritt
+
+Pro Standort ein Ordner mit einer Rohdatei pro Reihe (die vier Sensoren und
+die abgeleiteten Reihen PV gesamt, Hausverbrauch und Überschuss), Werte in
+WERTE_DTYPE ohne Kopf, und einer meta.json mit Beginn, Schritt und Länge.
+Der Wert zum Zeitpunkt t liegt damit an Position (t - beginn) / schritt: ein
+Standort wird geöffnet, ohne Daten zu lesen, und ein Ausschnitt ist eine
+Sicht (np.memmap) direkt auf die Datei, die nur die Seiten dieses Zeitraums
+berührt. archiv.json im Archiv fasst die Zeiträume aller Standorte zusammen.
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from batterysim.loader import (END_TIME, PV_WEST_SENSOR, SCHRITT, SENSOREN, START_TIME, WERTE_DTYPE, WEST_FAKTOR,
+                               erweitere_pv, lade_stundendaten, lade_stundendaten_stream, schritt_ns)
+from batterysim.profiling import gemessen
+
+# Bei Änderungen am Format oder an der Aufbereitung (Loader) erhöhen
+ARCHIV_VERSION = 2
+ARCHIV_INDEX = 'archiv.json'
+
+# Reihenfolge wie die Spalten nach lade_stundendaten und erweitere_pv
+REIHEN = SENSOREN + ['pv_gesamt_kwh', 'hausverbrauch_kwh', PV_WEST_SENSOR + '_erweitert',
+                     'pv_gesamt_kwh_erweitert', 'pv_uebrig_kwh']
+
+
+def _schreibe_json(pfad, inhalt):
+    tmp = pfad + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(inhalt, f, indent=1, sort_keys=True)
+    os.replace(tmp, pfad)
+
+
+def _utc_ns(zeitpunkt):
+    zeitpunkt = pd.Timestamp(zeitpunkt)
+    return (zeitpunkt.tz_localize('UTC') if zeitpunkt.tz is None else zeitpunkt).value
+
+
+def _reihen_datei(ordner, reihe):
+    return os.path.join(ordner, reihe + '.bin')
+
+
+class ArchivStandort:
+    """Ein geöffneter Standort; die Reihen werden erst beim ersten Zugriff gemappt."""
+
+    def __init__(self, ordner, meta):
+        self.ordner = ordner
+        self.meta = meta
+        self.beginn_ns = meta['beginn_ns']
+        self.schritt_ns = meta['schritt_ns']
+        self.laenge = meta['laenge']
+        self._maps = {}
+
+    def __repr__(self):
+        return (f"ArchivStandort({os.path.basename(self.ordner)!r}, {self.laenge} Schritte "
+                f"à {pd.Timedelta(self.schritt_ns)})")
+
+    def bereich(self, start_time=None, end_time=None):
+        """Positionen [a, b) der Schritte von start_time bis end_time (inklusiv), auf das Archiv begrenzt."""
+        a = 0 if start_time is None else -(-(_utc_ns(start_time) - self.beginn_ns) // self.schritt_ns)
+        b = self.laenge if end_time is None else (_utc_ns(end_time) - self.beginn_ns) // self.schritt_ns + 1
+        a, b = min(max(a, 0), self.laenge), min(max(b, 0), self.laenge)
+        return a, max(a, b)
+
+    def zeitindex(self, a=0, b=None):
+        """Zeitindex (UTC) der Positionen [a, b), berechnet statt gelesen."""
+        b = self.laenge if b is None else b
+        return pd.DatetimeIndex(self.beginn_ns + np.arange(a, b, dtype=np.int64) * self.schritt_ns, tz='UTC')
+
+    def reihe(self, name, start_time=None, end_time=None):
+        """Reihe name im Zeitraum als schreibgeschützte Sicht auf die Datei (keine Kopie)."""
+        if name not in self._maps:
+            if name not in self.meta['reihen']:
+                raise KeyError(f"Reihe {name} nicht im Archiv ({os.path.basename(self.ordner)})")
+            self._maps[name] = np.memmap(_reihen_datei(self.ordner, name), dtype=self.meta['dtype'], mode='r',
+                                         shape=(self.laenge,))
+        a, b = self.bereich(start_time, end_time)
+        return self._maps[name][a:b]
+
+    def raster(self, start_time, end_time, reihen=SENSOREN):
+        """Reihen auf dem vollen Raster start_time bis end_time als (Schritte x Reihen)-Array;
+        Schritte ausserhalb des Archivs bleiben 0 wie im Raster des Loaders."""
+        start_ns = _utc_ns(start_time)
+        if (start_ns - self.beginn_ns) % self.schritt_ns:
+            raise ValueError(f"{start_time} liegt nicht auf dem Zeitraster des Archivs")
+        werte = np.zeros(((_utc_ns(end_time) - start_ns) // self.schritt_ns + 1, len(reihen)),
+                         dtype=self.meta['dtype'])
+        a, b = self.bereich(start_time, end_time)
+        versatz = (self.beginn_ns - start_ns) // self.schritt_ns + a
+        for i, name in enumerate(reihen):
+            werte[versatz:versatz + b - a, i] = self.reihe(name)[a:b]
+        return werte
+
+    def daten(self, start_time=None, end_time=None, reihen=None, west_faktor=None):
+        """Reihen im Zeitraum als DataFrame wie nach lade_stundendaten und erweitere_pv.
+
+        Weicht west_faktor vom beim Schreiben verwendeten ab, werden die
+        erweiterten Reihen aus den Sensoren neu berechnet. Anders als reihe()
+        kopiert das die Werte des Zeitraums in den DataFrame.
+        """
+        a, b = self.bereich(start_time, end_time)
+        namen = list(REIHEN if reihen is None else reihen)
+        if west_faktor is None or west_faktor == self.meta['west_faktor']:
+            return pd.DataFrame({n: self.reihe(n)[a:b] for n in namen}, index=self.zeitindex(a, b))
+        combined_df = pd.DataFrame({n: self.reihe(n)[a:b] for n in REIHEN[:6]}, index=self.zeitindex(a, b))
+        return erweitere_pv(combined_df, west_faktor)[namen]
+
+
+@gemessen('archiv_oeffnen')
+def oeffne_standort(archiv_dir, standort):
+    """Öffnet einen Standort des Archivs; liest nur dessen meta.json."""
+    ordner = os.path.join(archiv_dir, standort)
+    try:
+        with open(os.path.join(ordner, 'meta.json')) as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        raise KeyError(f"Standort {standort} nicht im Archiv {archiv_dir}") from None
+    if meta.get('version') != ARCHIV_VERSION:
+        raise ValueError(f"Archiv-Version {meta.get('version')} von {standort} wird nicht unterstützt, "
+                         "bitte neu importieren")
+    return ArchivStandort(ordner, meta)
+
+
+def archiv_index(archiv_dir):
+    """Zeiträume aller Standorte als Tabelle (Index standort: beginn, ende, schritt, schritte)."""
+    try:
+        with open(os.path.join(archiv_dir, ARCHIV_INDEX)) as f:
+            index = json.load(f)
+    except FileNotFoundError:
+        index = {}
+    zeilen = {standort: {'beginn': pd.Timestamp(meta['beginn_ns'], tz='UTC'),
+                         'ende': pd.Timestamp(meta['beginn_ns'] + (meta['laenge'] - 1) * meta['schritt_ns'], tz='UTC'),
+                         'schritt': pd.Timedelta(meta['schritt_ns']), 'schritte': meta['laenge']}
+              for standort, meta in index.items()}
+    return pd.DataFrame.from_dict(zeilen, orient='index',
+                                  columns=['beginn', 'ende', 'schritt', 'schritte']).rename_axis('standort')
+
+
+def _aktualisiere_index(archiv_dir, metas):
+    pfad = os.path.join(archiv_dir, ARCHIV_INDEX)
+    try:
+        with open(pfad) as f:
+            index = json.load(f)
+    except FileNotFoundError:
+        index = {}
+    for standort, meta in metas.items():
+        index[standort] = {k: meta[k] for k in ('beginn_ns', 'schritt_ns', 'laenge')}
+    _schreibe_json(pfad, index)
+
+
+def _verschiebe(pfad, schritte, dtype):
+    """Setzt schritte leere Werte vor den Inhalt der Datei (Archiv beginnt früher)."""
+    tmp = pfad + '.tmp'
+    with open(tmp, 'wb') as ziel:
+        ziel.truncate(schritte * np.dtype(dtype).itemsize)
+        ziel.seek(0, os.SEEK_END)
+        with open(pfad, 'rb') as quelle:
+            for block in iter(lambda: quelle.read(1 << 24), b''):
+                ziel.write(block)
+    os.replace(tmp, pfad)
+
+
+def schreibe_standort(archiv_dir, standort, combined_df, west_faktor=WEST_FAKTOR, dtype=WERTE_DTYPE, index=True):
+    """Schreibt die Reihen von combined_df (Ausgabe von lade_stundendaten) ins Archiv.
+
+    Existiert der Standort schon, wird der Zeitraum eingefügt: überlappende
+    Schritte werden überschrieben, Lücken bleiben 0 wie im Raster. Schritt,
+    dtype und west_faktor müssen zum bestehenden Standort passen. Gibt die
+    neue meta zurück; mit index=False bleibt archiv.json unverändert (z.B.
+    beim parallelen Import, der den Index am Ende einmal schreibt).
+    """
+    zeit = pd.DatetimeIndex(combined_df.index)
+    zeit = (zeit.tz_localize('UTC') if zeit.tz is None else zeit.tz_convert('UTC')).asi8
+    if len(zeit) == 0:
+        raise ValueError(f"Keine Daten für {standort}")
+    schritt = int(np.median(np.diff(zeit))) if len(zeit) > 1 else schritt_ns(SCHRITT)
+    if (np.diff(zeit) != schritt).any():
+        raise ValueError(f"Zeitindex von {standort} hat keinen festen Schritt")
+    if 'pv_uebrig_kwh' not in combined_df:
+        combined_df = erweitere_pv(combined_df.copy(), west_faktor)
+
+    ordner = os.path.join(archiv_dir, standort)
+    os.makedirs(ordner, exist_ok=True)
+    meta_pfad = os.path.join(ordner, 'meta.json')
+    dtype = np.dtype(dtype)
+    try:
+        with open(meta_pfad) as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        meta = {'version': ARCHIV_VERSION, 'beginn_ns': int(zeit[0]), 'schritt_ns': schritt, 'laenge': 0,
+                'dtype': dtype.name, 'west_faktor': west_faktor, 'reihen': REIHEN}
+    for name, wert in (('schritt_ns', schritt), ('dtype', dtype.name), ('west_faktor', west_faktor)):
+        if meta[name] != wert:
+            raise ValueError(f"{standort}: {name} {wert} passt nicht zum Archiv ({meta[name]})")
+    if (zeit[0] - meta['beginn_ns']) % schritt:
+        raise ValueError(f"{standort}: Zeitraster um {(zeit[0] - meta['beginn_ns']) % schritt} ns verschoben")
+
+    # Beginnt der neue Zeitraum früher, rücken die bestehenden Werte nach hinten
+    if meta['laenge'] and zeit[0] < meta['beginn_ns']:
+        vorne = (meta['beginn_ns'] - int(zeit[0])) // schritt
+        for name in meta['reihen']:
+            _verschiebe(_reihen_datei(ordner, name), vorne, dtype)
+        meta['laenge'] += vorne
+        meta['beginn_ns'] = int(zeit[0])
+
+    position = (int(zeit[0]) - meta['beginn_ns']) // schritt
+    for name in meta['reihen']:
+        with open(_reihen_datei(ordner, name), 'r+b' if meta['laenge'] else 'wb') as f:
+            f.seek(position * dtype.itemsize)
+            f.write(combined_df[name].to_numpy(dtype=dtype).tobytes())
+    meta['laenge'] = max(meta['laenge'], position + len(zeit))
+    # meta.json zuletzt: ein abgebrochener Schreibvorgang lässt die alte Länge gültig
+    _schreibe_json(meta_pfad, meta)
+    if index:
+        _aktualisiere_index(archiv_dir, {standort: meta})
+    return meta
+
+
+def _importiere_standort(archiv_dir, standort, pfad, start_time, end_time, schritt, west_faktor, chunksize):
+    if chunksize:
+        combined_df = lade_stundendaten_stream(pfad, SENSOREN, start_time, end_time, chunksize, schritt)
+    else:
+        combined_df = lade_stundendaten(pfad, SENSOREN, start_time, end_time, schritt)
+    return schreibe_standort(archiv_dir, standort, combined_df, west_faktor, index=False)
+
+
+@gemessen('archiv_import', zeilen=len)
+def importiere_standorte(quelle, archiv_dir, start_time=START_TIME, end_time=END_TIME, schritt=SCHRITT,
+                         west_faktor=WEST_FAKTOR, chunksize=None, prozesse=None):
+    """Importiert alle Standorte aus quelle (Ordner oder Manifest, siehe fleet.lade_manifest).
+
+    Jeder Standort wird in einem eigenen Prozess geladen und geschrieben;
+    wiederholte Importe weiterer Zeiträume ergänzen das Archiv. Gibt
+    archiv_index der importierten Standorte zurück.
+    """
+    from batterysim.fleet import lade_manifest
+
+    standorte = lade_manifest(quelle)
+    os.makedirs(archiv_dir, exist_ok=True)
+    n = len(standorte)
+    argumente = ([archiv_dir] * n, list(standorte.index), list(standorte['datei']), [start_time] * n,
+                 [end_time] * n, [schritt] * n, [west_faktor] * n, [chunksize] * n)
+    prozesse = min(prozesse or os.cpu_count(), n)
+    if prozesse > 1:
+        with ProcessPoolExecutor(prozesse) as pool:
+            metas = list(pool.map(_importiere_standort, *argumente))
+    else:
+        metas = list(map(_importiere_standort, *argumente))
+    _aktualisiere_index(archiv_dir, dict(zip(standorte.index, metas)))
+    return archiv_index(archiv_dir).loc[list(standorte.index)]
+
+
+def ist_archiv(pfad):
+    """True, wenn pfad ein Archiv-Ordner (mit archiv.json) ist."""
+    return os.path.isfile(os.path.join(pfad, ARCHIV_INDEX))
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+Akku-Dimensionierung: viele Akkugrößen in einem Simulationsdurchlauf
+"""
+
+import inspect
+import os
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+import pandas as pd
+
+from batterysim.economics import EINSPEISEVERG_RP, STROMPREIS_BEZUG_RP, ersparnis_pro_periode
+from batterysim.engine import simuliere_akku, soll_aenderung
+from batterysim.loader import WEST_FAKTOR, zeitintervall_h
+from batterysim.profiling import gemessen
+
+
+@gemessen('sweep')
+def kapazitaets_sweep(pv_uebrig_kwh, akku_groessen, strompreis_bezug_rp=STROMPREIS_BEZUG_RP,
+                      einspeiseverg_rp=EINSPEISEVERG_RP, **akku_parameter):
+    """Simuliert alle Akkugrößen gemeinsam als (Stunden x Größen)-Array.
+
+    pv_uebrig_kwh ist eine Serie mit Zeitindex; akku_parameter werden an
+    simuliere_akku weitergereicht (ohne zeitintervall gilt der Schritt des Index). Zurück kommt eine Tabelle mit einer Zeile
+    pro Akkugröße: geladen_kwh, entladen_kwh, netto_chf und je eine Spalte
+    ersparnis_chf_<JJJJ-MM> mit der monatlichen Nettoersparnis.
+    """
+    kapazitaeten = np.asarray(akku_groessen, dtype=np.float64)
+    akku_parameter.setdefault('zeitintervall', zeitintervall_h(pv_uebrig_kwh.index))
+    simu_akku = simuliere_akku(pv_uebrig_kwh.to_numpy(), kapazitaeten, **akku_parameter).soc
+
+    # Lade-/Entladeenergie (Hausseite wie simuliere_akku) und Ersparnis pro Monat aus der
+    # SOC-Differenz ab dem Startstand, alle Akkugrößen zusammen
+    aufruf = inspect.signature(simuliere_akku).bind_partial(**akku_parameter)
+    aufruf.apply_defaults()
+    p = aufruf.arguments
+    monatlich = ersparnis_pro_periode(simu_akku, pv_uebrig_kwh.index, strompreis_bezug_rp,
+                                      einspeiseverg_rp, perioden=('M',), akku_start=kapazitaeten * p['start_soc'],
+                                      akku_wirkungsgrad_laden=p['akku_wirkungsgrad_laden'],
+                                      akku_wirkungsgrad_entladen=p['akku_wirkungsgrad_entladen'])['M']
+    monats_spalten = [f"ersparnis_chf_{monat.strftime('%Y-%m')}" for monat in monatlich['netto_chf'].index]
+
+    tabelle = pd.DataFrame({name: monatlich[name].to_numpy().sum(axis=0)
+                            for name in ('geladen_kwh', 'entladen_kwh', 'netto_chf')},
+                           index=pd.Index(kapazitaeten, name='kapazitaet_kwh'))
+    tabelle[monats_spalten] = monatlich['netto_chf'].to_numpy().T
+    return tabelle
+
+
+# ------------------- OPTIMALE KAPAZITÄT -------------------
+
+_GOLDEN = (3 - 5 ** 0.5) / 2
+
+
+def saettigungs_kapazitaet(pv_uebrig_kwh, min_soc=0.1, start_soc=0.5, max_lade_leistung=3.0,
+                           max_entlade_leistung=3.0, akku_wirkungsgrad_laden=0.95,
+                           akku_wirkungsgrad_entladen=0.95, zeitintervall=1.0):
+    """Kleinste Kapazität (kWh), bei der der Akku nie voll wird.
+
+    Ohne obere Grenze ist der Stand über dem Minimum x_t = max(x_t-1 + d_t, 0);
+    dessen Maximum muss in den nutzbaren Bereich K * (1 - min_soc) passen.
+    Mehr Kapazität lädt danach nichts mehr zusätzlich. Gesucht per Bisektion,
+    jede Auswertung ist nur eine kumulierte Summe. np.inf für start_soc >= 1.
+    """
+    d = soll_aenderung(np.asarray(pv_uebrig_kwh, dtype=np.float64), max_lade_leistung, max_entlade_leistung,
+                       akku_wirkungsgrad_laden, akku_wirkungsgrad_entladen, zeitintervall)
+    kumuliert = np.cumsum(d)
+    nutzbar = 1 - min_soc
+    if start_soc >= 1 or len(d) == 0:
+        return np.inf if start_soc >= 1 else 0.0
+
+    def reserve(kapazitaet):
+        # Nutzbarer Bereich minus höchster Stand über dem Minimum
+        stand = max(kapazitaet * (start_soc - min_soc), 0.0) + kumuliert
+        hoechster = (stand - np.minimum(np.minimum.accumulate(stand), 0.0)).max()
+        return kapazitaet * nutzbar - hoechster
+
+    unten, oben = 0.0, 1.0
+    while reserve(oben) < 0:
+        unten, oben = oben, oben * 2
+    for _ in range(60):
+        mitte = (unten + oben) / 2
+        unten, oben = (unten, mitte) if reserve(mitte) >= 0 else (mitte, oben)
+        if oben - unten < 1e-6:
+            break
+    return oben
+
+
+@gemessen('kapazitaetssuche')
+def optimale_kapazitaet(pv_uebrig_kwh, kosten_chf_pro_kwh, strompreis_bezug_rp=STROMPREIS_BEZUG_RP,
+                        einspeiseverg_rp=EINSPEISEVERG_RP, k_min=None, k_max=None, aufloesung=0.1,
+                        toleranz_chf_pro_kwh=0.0, **akku_parameter):
+    """Kapazität mit dem höchsten Nettowert: Ersparnis minus kosten_chf_pro_kwh * Kapazität.
+
+    kosten_chf_pro_kwh sind die jährlichen Kosten pro kWh (z.B. economics.annuitaet),
+    die Ersparnis gilt für den Zeitraum der Daten. Gesucht wird per
+    Goldener-Schnitt-Suche auf einem Raster mit Abstand aufloesung zwischen
+    k_min und der Sättigungskapazität (darüber wird der Akku nie voll, die
+    Ersparnis steigt nicht mehr); jede Kapazität wird nur einmal simuliert.
+    Die Suche endet, wenn das Intervall auf aufloesung geschrumpft ist oder
+    der Nettowert sich pro zusätzlicher kWh um weniger als
+    toleranz_chf_pro_kwh ändert. Die Preise dürfen auch Arrays pro Zeitschritt sein.
+
+    Gibt ein dict zurück: kapazitaet_kwh, netto_chf, ersparnis_chf,
+    saettigung_kwh, simulationen und punkte (alle simulierten Kapazitäten).
+    """
+    pv_uebrig = np.asarray(pv_uebrig_kwh, dtype=np.float64)
+    saettigung = saettigungs_kapazitaet(pv_uebrig, **{n: w for n, w in akku_parameter.items()
+                                                       if n != 'max_akku_kapazitat'})
+    k_min = aufloesung if k_min is None else k_min
+    obere = saettigung if k_max is None else min(k_max, saettigung)
+    unten = int(np.ceil(k_min / aufloesung - 1e-9))
+    oben = max(unten, int(np.ceil(obere / aufloesung - 1e-9)))
+
+    punkte = {}
+
+    def netto(n):
+        if n not in punkte:
+            kapazitaet = round(n * aufloesung, 10)
+            ergebnis = simuliere_akku(pv_uebrig, kapazitaet, **akku_parameter)
+            geladen, entladen = ergebnis.geladen, ergebnis.entladen
+            ersparnis = ((entladen * strompreis_bezug_rp).sum() - (geladen * einspeiseverg_rp).sum()) / 100
+            punkte[n] = {'kapazitaet_kwh': kapazitaet, 'geladen_kwh': geladen.sum(),
+                         'entladen_kwh': entladen.sum(), 'ersparnis_chf': ersparnis,
+                         'netto_chf': ersparnis - kosten_chf_pro_kwh * kapazitaet}
+        return punkte[n]['netto_chf']
+
+    # Klammern: Schritt ab unten verdoppeln, bis der Nettowert wieder fällt
+    schritt = max(1, int(round(1.0 / aufloesung)))
+    links, mitte = unten, min(unten + schritt, oben)
+    if netto(mitte) <= netto(links):
+        oben = mitte
+    while mitte < oben:
+        rechts = min(unten + 2 * (mitte - unten), oben)
+        if netto(rechts) <= netto(mitte):
+            oben = rechts
+            break
+        links, mitte = mitte, rechts
+    unten = links
+
+    # Goldener Schnitt auf ganzzahligen Rasterpunkten; das Maximum liegt immer in [unten, oben]
+    while oben - unten > 2:
+        schritt = max(1, int(round(_GOLDEN * (oben - unten))))
+        c, d = unten + schritt, oben - schritt
+        if c >= d:
+            c, d = (unten + oben) // 2, (unten + oben) // 2 + 1
+        wert_c, wert_d = netto(c), netto(d)
+        if abs(wert_d - wert_c) < toleranz_chf_pro_kwh * (d - c) * aufloesung:
+            break
+        if wert_c >= wert_d:
+            oben = d
+        else:
+            unten = c
+    bester = max(range(unten, oben + 1), key=netto) if oben - unten <= 2 else max(punkte, key=netto)
+
+    tabelle = pd.DataFrame(sorted(punkte.values(), key=lambda p: p['kapazitaet_kwh'])).set_index('kapazitaet_kwh')
+    return {
+        'kapazitaet_kwh': punkte[bester]['kapazitaet_kwh'],
+        'netto_chf': punkte[bester]['netto_chf'],
+        'ersparnis_chf': punkte[bester]['ersparnis_chf'],
+        'saettigung_kwh': saettigung,
+        'simulationen': len(punkte),
+        'punkte': tabelle,
+    }
+
+
+# ------------------- GRID-SUCHE -------------------
+
+# Parameter, die in der Grid-Suche variiert werden können (mit Standardwert)
+RASTER_PARAMETER = {
+    'max_akku_kapazitat': 20.0,
+    'min_soc': 0.1,
+    'max_lade_leistung': 3.0,
+    'max_entlade_leistung': 3.0,
+    'akku_wirkungsgrad_laden': 0.95,
+    'akku_wirkungsgrad_entladen': 0.95,
+    'start_soc': 0.5,
+    'west_faktor': WEST_FAKTOR,
+}
+
+# Zustand der Worker-Prozesse (wird im Initializer gesetzt)
+_worker = {}
+
+
+def _grid_worker_init(shm_name, form, raster, preise, zeitintervall):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker['shm'] = shm  # Referenz halten, sonst wird der Puffer freigegeben
+    _worker['daten'] = np.ndarray(form, dtype=np.float64, buffer=shm.buf)
+    _worker['raster'] = raster
+    _worker['preise'] = preise
+    _worker['zeitintervall'] = zeitintervall
+
+
+def _grid_block(block):
+    """Simuliert die Konfigurationen start..stop des kartesischen Produkts gemeinsam."""
+    start, stop = block
+    pv_ost, pv_west, hausverbrauch = _worker['daten']
+    raster = _worker['raster']
+    strompreis_bezug_rp, einspeiseverg_rp = _worker['preise']
+
+    indizes = np.unravel_index(np.arange(start, stop), [len(w) for w in raster.values()])
+    werte = {name: np.asarray(w, dtype=np.float64)[i] for (name, w), i in zip(raster.items(), indizes)}
+
+    west_faktor = werte.pop('west_faktor')
+    pv_uebrig = (pv_ost[:, np.newaxis] + pv_west[:, np.newaxis] * west_faktor
+                 - hausverbrauch[:, np.newaxis])
+    ergebnis = simuliere_akku(pv_uebrig, zeitintervall=_worker['zeitintervall'], **werte)
+
+    geladen = ergebnis.geladen.sum(axis=0)
+    entladen = ergebnis.entladen.sum(axis=0)
+    zeilen = pd.DataFrame(werte, index=pd.RangeIndex(start, stop, name='konfiguration'))
+    zeilen.insert(len(werte), 'west_faktor', west_faktor)
+    zeilen['geladen_kwh'] = geladen
+    zeilen['entladen_kwh'] = entladen
+    zeilen['netzbezug_kwh'] = ergebnis.netzbezug.sum(axis=0)
+    zeilen['einspeisung_kwh'] = ergebnis.einspeisung.sum(axis=0)
+    zeilen['netto_chf'] = (entladen * strompreis_bezug_rp - geladen * einspeiseverg_rp) / 100
+    return zeilen
+
+
+def grid_suche(pv_ost_kwh, pv_west_kwh, hausverbrauch_kwh, raster, ausgabe_datei,
+               strompreis_bezug_rp=STROMPREIS_BEZUG_RP, einspeiseverg_rp=EINSPEISEVERG_RP, zeitintervall=1.0,
+               prozesse=None, block_groesse=256, fortschritt=True):
+    """Grid-Suche über das kartesische Produkt der Werte in raster.
+
+    raster ordnet Namen aus RASTER_PARAMETER Wertelisten zu; fehlende Parameter
+    behalten ihren Standardwert. Die Stundenreihen liegen für alle Worker in
+    einem Shared-Memory-Block, pro Aufgabe wird nur ein Indexbereich verschickt.
+    Jede Konfiguration ergibt eine Zeile in ausgabe_datei (CSV), geschrieben
+    sobald ihr Block fertig ist. Gibt die Anzahl Konfigurationen zurück.
+    """
+    unbekannt = set(raster) - set(RASTER_PARAMETER)
+    if unbekannt:
+        raise ValueError(f"Unbekannte Raster-Parameter: {sorted(unbekannt)}")
+    raster = {name: list(np.atleast_1d(raster.get(name, standard)))
+              for name, standard in RASTER_PARAMETER.items()}
+    anzahl = int(np.prod([len(w) for w in raster.values()]))
+    bloecke = [(i, min(i + block_groesse, anzahl)) for i in range(0, anzahl, block_groesse)]
+
+    daten = np.vstack([np.asarray(pv_ost_kwh, dtype=np.float64),
+                       np.asarray(pv_west_kwh, dtype=np.float64),
+                       np.asarray(hausverbrauch_kwh, dtype=np.float64)])
+    shm = shared_memory.SharedMemory(create=True, size=daten.nbytes)
+    try:
+        np.ndarray(daten.shape, dtype=np.float64, buffer=shm.buf)[:] = daten
+        initargs = (shm.name, daten.shape, raster, (strompreis_bezug_rp, einspeiseverg_rp), zeitintervall)
+        fertig = 0
+        with Pool(prozesse or os.cpu_count(), initializer=_grid_worker_init, initargs=initargs) as pool:
+            for nummer, zeilen in enumerate(pool.imap_unordered(_grid_block, bloecke)):
+                zeilen.to_csv(ausgabe_datei, mode='w' if nummer == 0 else 'a', header=nummer == 0)
+                fertig += len(zeilen)
+                if fortschritt:
+                    print(f"\rGrid-Suche: {fertig}/{anzahl} Konfigurationen ({fertig / anzahl:.0%})",
+                          end='', flush=True)
+        if fortschritt:
+            print()
+    finally:
+        shm.close()
+        shm.unlink()
+    return anzahl
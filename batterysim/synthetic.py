@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetische HomeAssistant-Exporte für Benchmarks und Tests
+
+Erzeugt Zählerstände im Langformat (entity_id, state, last_changed) wie
+energyData24Hourly.csv: PV Ost/West mit Tages- und Jahresgang und zufälliger
+Bewölkung, ein Hausverbrauch mit Morgen-/Abendspitze und daraus Netzbezug und
+Einspeisung. Lücken und Zähler-Resets lassen sich gezielt einbauen.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from batterysim.loader import (EINSPEISUNG_SENSOR, NETZBEZUG_SENSOR, PV_OST_SENSOR,
+                               PV_WEST_SENSOR, SENSOREN)
+
+# Leistungsspitzen der Standardanlage (kW)
+KWP_OST = 8.0
+KWP_WEST = 1.5
+
+
+def _leistungen(zeit, kwp_ost, kwp_west, grundlast_kw, rng):
+    """PV Ost, PV West und Hausverbrauch (kW) zu den Zeitpunkten zeit (datetime64[ns])."""
+    tag = (zeit - zeit[0].astype('datetime64[D]')).astype('timedelta64[D]').astype(np.int64)
+    tag_im_jahr = (zeit.astype('datetime64[D]') - zeit.astype('datetime64[Y]')).astype(np.int64)
+    stunde = (zeit - zeit.astype('datetime64[D]')).astype(np.int64) / 3.6e12
+
+    # Tageslänge 8 h (Winter) bis 16 h (Sommer), Sonnenhöhe als Sinusbogen
+    taglaenge = 12 + 4 * np.sin(2 * np.pi * (tag_im_jahr - 80) / 365)
+    saison = 0.55 + 0.45 * np.sin(2 * np.pi * (tag_im_jahr - 80) / 365)
+    bewoelkung = rng.uniform(0.15, 1.0, tag.max() + 1)[tag]
+
+    def bogen(verschiebung):
+        x = (stunde - (12 + verschiebung - taglaenge / 2)) / taglaenge
+        return np.where((x > 0) & (x < 1), np.sin(np.pi * np.clip(x, 0, 1)), 0.0)
+
+    pv_ost = kwp_ost * bogen(-1.5) * saison * bewoelkung
+    pv_west = kwp_west * bogen(1.5) * saison * bewoelkung
+
+    # Grundlast plus Spitzen morgens/abends, im Winter etwas höher
+    spitzen = 1.2 * np.exp(-((stunde - 7.5) / 1.2) ** 2) + 2.0 * np.exp(-((stunde - 19) / 2.0) ** 2)
+    winter = 1 + 0.3 * np.cos(2 * np.pi * tag_im_jahr / 365)
+    verbrauch = (grundlast_kw + spitzen) * winter * rng.lognormal(0, 0.25, len(zeit))
+    return pv_ost, pv_west, verbrauch
+
+
+def _mit_luecken(n, luecken, max_laenge, rng):
+    """Maske der behaltenen Messpunkte mit luecken zusammenhängenden Ausfällen."""
+    behalten = np.ones(n, dtype=bool)
+    for start, laenge in zip(rng.integers(0, n, luecken), rng.integers(1, max_laenge + 1, luecken)):
+        behalten[start:start + laenge] = False
+    return behalten
+
+
+def erzeuge_export(pfad, start='2024-01-01', jahre=1, intervall_min=60, zusaetzliche_sensoren=0,
+                   luecken=0, zaehler_resets=0, kwp_ost=KWP_OST, kwp_west=KWP_WEST,
+                   grundlast_kw=0.35, seed=0):
+    """Schreibt einen synthetischen Export nach pfad und gibt die Anzahl Zeilen zurück.
+
+    Neben den vier SENSOREN kommen zusaetzliche_sensoren irrelevante Zähler
+    dazu (wie in echten Exporten). luecken Ausfälle von bis zu einem Tag und
+    zaehler_resets Sprünge auf 0 werden pro Sensor zufällig verteilt.
+    """
+    rng = np.random.default_rng(seed)
+    schritt = np.timedelta64(int(intervall_min * 60), 's').astype('timedelta64[ns]')
+    anfang = np.datetime64(pd.Timestamp(start).tz_localize(None), 'ns')
+    ende = np.datetime64(pd.Timestamp(start).tz_localize(None) + pd.DateOffset(years=jahre), 'ns')
+    zeit = np.arange(anfang, ende, schritt)
+    dt_h = intervall_min / 60
+
+    pv_ost, pv_west, verbrauch = _leistungen(zeit, kwp_ost, kwp_west, grundlast_kw, rng)
+    netto = verbrauch - pv_ost - pv_west
+    energien = {
+        NETZBEZUG_SENSOR: np.maximum(netto, 0) * dt_h,
+        EINSPEISUNG_SENSOR: np.maximum(-netto, 0) * dt_h,
+        PV_OST_SENSOR: pv_ost * dt_h,
+        PV_WEST_SENSOR: pv_west * dt_h,
+    }
+    for i in range(zusaetzliche_sensoren):
+        energien[f'sensor.synthetisch_{i}_kwh'] = rng.exponential(0.1, len(zeit)) * dt_h
+
+    zeitstempel = np.char.add(np.datetime_as_string(zeit, unit='ms'), 'Z')
+    max_luecke = max(1, int(24 * 60 / intervall_min))
+    zeilen = 0
+    with open(pfad, 'w', newline='') as f:
+        f.write('entity_id,state,last_changed\n')
+        for sensor, energie in energien.items():
+            stand = rng.uniform(1000, 5000) + np.cumsum(energie)
+            for position in np.sort(rng.integers(1, len(stand), zaehler_resets)):
+                stand[position:] -= stand[position]
+            behalten = _mit_luecken(len(stand), luecken, max_luecke, rng)
+            block = pd.DataFrame({'entity_id': sensor, 'state': np.round(stand[behalten], 2),
+                                  'last_changed': zeitstempel[behalten]})
+            block.to_csv(f, header=False, index=False)
+            zeilen += len(block)
+    return zeilen
+
+
+def erzeuge_standorte(ordner, anzahl, seed=0, **parameter):
+    """Schreibt anzahl Exporte (standort_000.csv, ...) mit unterschiedlicher Anlagen-
+    und Verbrauchsgröße nach ordner und gibt die Pfade zurück."""
+    os.makedirs(ordner, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    pfade = []
+    for i in range(anzahl):
+        pfad = os.path.join(ordner, f"standort_{i:03d}.csv")
+        erzeuge_export(pfad, seed=seed + 1 + i,
+                       kwp_ost=rng.uniform(4, 12), kwp_west=rng.uniform(0.5, 3),
+                       grundlast_kw=rng.uniform(0.2, 0.6), **parameter)
+        pfade.append(pfad)
+    return pfade
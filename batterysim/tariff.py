@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Zeitabhängige Tarife: Preisvektoren für Netzbezug und Einspeisung
+
+Ein Tarif ist ein dict mit name und entweder festen Preisen mit Zeitfenstern
+(Hoch-/Niedertarif, Werktag/Wochenende, Saison) oder einer Preis-CSV
+(z.B. Spotpreise). Aus allen Tarifen entstehen zwei (Zeitschritte x Tarife)-
+Matrizen; Kosten sind dann ein Matrixprodukt mit den Netzflüssen einer einzigen
+Simulation, ohne erneut zu simulieren.
+
+Beispiel:
+    {"name": "HT/NT", "bezug_rp": 21.0, "einspeisung_rp": 6.0,
+     "fenster": [{"stunden": [7, 20], "tage": "werktag", "bezug_rp": 29.0},
+                 {"stunden": [11, 15], "monate": [4, 5, 6, 7, 8, 9], "einspeisung_rp": 3.0}]}
+    {"name": "Spot", "csv": "spot_2024.csv", "aufschlag_rp": 4.0, "einspeisung_rp": 6.0}
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from batterysim.economics import EINSPEISEVERG_RP, STROMPREIS_BEZUG_RP
+from batterysim.profiling import gemessen
+
+FIXTARIF = {'name': 'fix', 'bezug_rp': STROMPREIS_BEZUG_RP, 'einspeisung_rp': EINSPEISEVERG_RP}
+
+# Zeitfenster und Tagestypen gelten in Ortszeit
+ZEITZONE = 'Europe/Zurich'
+TAGE = {'werktag': [0, 1, 2, 3, 4], 'wochenende': [5, 6], 'alle': list(range(7))}
+
+
+def lade_tarife(pfad):
+    """Tarife aus einer JSON-Datei (Liste von Tarif-dicts). CSV-Pfade relativ zur Datei."""
+    with open(pfad, encoding='utf-8') as f:
+        tarife = json.load(f)
+    if isinstance(tarife, dict):
+        tarife = [tarife]
+    basis = os.path.dirname(pfad)
+    for tarif in tarife:
+        if 'name' not in tarif:
+            raise ValueError(f"Tarif ohne name in {pfad}")
+        if 'csv' in tarif and not os.path.isabs(tarif['csv']):
+            tarif['csv'] = os.path.join(basis, tarif['csv'])
+    return tarife
+
+
+def _ortszeit(zeitindex, zeitzone):
+    zeitindex = pd.DatetimeIndex(zeitindex)
+    if zeitindex.tz is None:
+        zeitindex = zeitindex.tz_localize('UTC')
+    return zeitindex.tz_convert(zeitzone)
+
+
+def _fenster_maske(ortszeit, fenster):
+    """Zeitschritte (in Ortszeit) innerhalb eines Fensters mit optional stunden [von, bis), tage und monate."""
+    maske = np.ones(len(ortszeit), dtype=bool)
+    if 'stunden' in fenster:
+        von, bis = fenster['stunden']
+        stunde = ortszeit.hour.to_numpy()
+        # von > bis geht über Mitternacht, z.B. [22, 6]
+        maske &= (stunde >= von) & (stunde < bis) if von <= bis else (stunde >= von) | (stunde < bis)
+    if 'tage' in fenster:
+        tage = fenster['tage']
+        if isinstance(tage, str):
+            if tage not in TAGE:
+                raise ValueError(f"Unbekannter Tagestyp {tage!r}, erlaubt: {sorted(TAGE)}")
+            tage = TAGE[tage]
+        maske &= np.isin(ortszeit.dayofweek.to_numpy(), tage)
+    if 'monate' in fenster:
+        maske &= np.isin(ortszeit.month.to_numpy(), fenster['monate'])
+    return maske
+
+
+def preise_aus_regeln(zeitindex, tarif):
+    """Bezugs- und Einspeisepreis (Rp/kWh) pro Zeitschritt aus festen Preisen und Zeitfenstern.
+
+    Spätere Fenster überschreiben frühere; ein Fenster setzt bezug_rp,
+    einspeisung_rp oder beides.
+    """
+    ortszeit = _ortszeit(zeitindex, tarif.get('zeitzone', ZEITZONE))
+    bezug = np.full(len(ortszeit), float(tarif.get('bezug_rp', STROMPREIS_BEZUG_RP)))
+    einspeisung = np.full(len(ortszeit), float(tarif.get('einspeisung_rp', EINSPEISEVERG_RP)))
+    for fenster in tarif.get('fenster', []):
+        maske = _fenster_maske(ortszeit, fenster)
+        if 'bezug_rp' in fenster:
+            bezug[maske] = fenster['bezug_rp']
+        if 'einspeisung_rp' in fenster:
+            einspeisung[maske] = fenster['einspeisung_rp']
+    return bezug, einspeisung
+
+
+def preise_aus_csv(pfad, zeitindex, aufschlag_rp=0.0, einspeisung_rp=EINSPEISEVERG_RP):
+    """Preise aus einer CSV mit den Spalten zeit, bezug_rp und optional einspeisung_rp.
+
+    Feinere Preise (z.B. 15 Minuten) werden über jeden Zeitschritt gemittelt,
+    gröbere (z.B. stündlich bei 15-Minuten-Daten) gelten bis zum nächsten Preis.
+    aufschlag_rp kommt auf den Bezugspreis (Netz, Abgaben); ohne Spalte
+    einspeisung_rp gilt der feste Wert einspeisung_rp.
+    """
+    preise = pd.read_csv(pfad)
+    fehlend = {'zeit', 'bezug_rp'} - set(preise.columns)
+    if fehlend:
+        raise ValueError(f"Preisdatei {pfad} ohne Spalten {sorted(fehlend)}")
+    if 'einspeisung_rp' not in preise:
+        preise['einspeisung_rp'] = einspeisung_rp
+    preise.index = pd.to_datetime(preise.pop('zeit'), utc=True)
+
+    zeitindex = _ortszeit(zeitindex, 'UTC')
+    schritt = pd.Series(zeitindex).diff().median() if len(zeitindex) > 1 else pd.Timedelta('1h')
+    gemittelt = preise.groupby(preise.index.floor(schritt)).mean()
+    pro_schritt = gemittelt.reindex(gemittelt.index.union(zeitindex)).ffill().reindex(zeitindex)
+    if pro_schritt.isna().any().any():
+        erster = pro_schritt.index[pro_schritt.isna().any(axis=1)][0]
+        raise ValueError(f"Preisdatei {pfad} deckt den Zeitraum nicht ab (kein Preis für {erster})")
+    return pro_schritt['bezug_rp'].to_numpy() + aufschlag_rp, pro_schritt['einspeisung_rp'].to_numpy()
+
+
+@gemessen('preise', zeilen=lambda matrizen: matrizen[0].size)
+def preis_matrizen(tarife, zeitindex):
+    """Bezugs- und Einspeisepreise aller Tarife als zwei (Zeitschritte x Tarife)-Arrays."""
+    bezug, einspeisung = [], []
+    for tarif in tarife:
+        if 'csv' in tarif:
+            b, e = preise_aus_csv(tarif['csv'], zeitindex, tarif.get('aufschlag_rp', 0.0),
+                                  tarif.get('einspeisung_rp', EINSPEISEVERG_RP))
+        else:
+            b, e = preise_aus_regeln(zeitindex, tarif)
+        bezug.append(b)
+        einspeisung.append(e)
+    return np.column_stack(bezug), np.column_stack(einspeisung)
+
+
+def netzkosten(netzbezug, einspeisung, bezug_rp, einspeisung_rp):
+    """Netzkosten (CHF, Bezug minus Einspeisevergütung) als Matrixprodukt.
+
+    netzbezug/einspeisung: (Zeitschritte,) oder (Zeitschritte, Konfigurationen);
+    bezug_rp/einspeisung_rp: (Zeitschritte, Tarife). Ergebnis: (Tarife,) bzw.
+    (Konfigurationen, Tarife).
+    """
+    netzbezug = np.asarray(netzbezug, dtype=np.float64)
+    einspeisung = np.asarray(einspeisung, dtype=np.float64)
+    return (netzbezug.T @ bezug_rp - einspeisung.T @ einspeisung_rp) / 100
+
+
+@gemessen('tarife_bewerten')
+def bewerte_tarife(pv_uebrig_kwh, akku_ergebnis, tarife, zeitindex=None):
+    """Kosten ohne und mit Akku sowie die Ersparnis für jeden Tarif aus einer Simulation.
+
+    pv_uebrig_kwh ist der Überschuss, mit dem simuliert wurde (Serie mit
+    Zeitindex oder Array plus zeitindex). Ohne Akku ist der Netzbezug das
+    Defizit und die Einspeisung der Überschuss. Gibt eine Tabelle mit einer
+    Zeile pro Tarif zurück, bei mehreren Konfigurationen eine Zeile pro
+    (Tarif, Konfiguration).
+    """
+    if zeitindex is None:
+        zeitindex = pv_uebrig_kwh.index
+    bezug_rp, einspeisung_rp = preis_matrizen(tarife, zeitindex)
+
+    pv_uebrig = np.asarray(pv_uebrig_kwh, dtype=np.float64)
+    ohne_akku = netzkosten(np.maximum(-pv_uebrig, 0.0), np.maximum(pv_uebrig, 0.0), bezug_rp, einspeisung_rp)
+    mit_akku = netzkosten(akku_ergebnis.netzbezug, akku_ergebnis.einspeisung, bezug_rp, einspeisung_rp)
+    ohne_akku = np.broadcast_to(ohne_akku, mit_akku.shape)
+
+    namen = pd.Index([tarif['name'] for tarif in tarife], name='tarif')
+    if mit_akku.ndim == 1:
+        index = namen
+    else:
+        index = pd.MultiIndex.from_product([namen, range(mit_akku.shape[0])], names=['tarif', 'konfiguration'])
+    return pd.DataFrame({
+        'mittlerer_bezugspreis_rp': np.repeat(bezug_rp.mean(axis=0), len(index) // len(namen)),
+        'kosten_ohne_akku_chf': ohne_akku.T.ravel(),
+        'kosten_mit_akku_chf': mit_akku.T.ravel(),
+        'ersparnis_chf': (ohne_akku - mit_akku).T.ravel(),
+    }, index=index)
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Kennzahlen für beliebige Zeitfenster aus kumulierten Summen
+
+Ein Durchlauf über die Zeitreihe legt für jede Grösse (Verbrauch, PV, direkt
+genutzte PV, Akku geladen/entladen, Netzbezug, Einspeisung, Ersparnis) die
+kumulierte Summe mit führender 0 ab. Die Summe über ein Fenster [a, b) ist
+dann S[b] - S[a]; Autarkiegrad, Eigenverbrauchsquote und Ersparnis jedes
+Fensters kosten damit zwei Zugriffe, egal wie lang das Fenster ist. Tausende
+Fenster (Jahre, Saisons, rollende 30 Tage) werden so in einem Schritt bewertet.
+"""
+
+import numpy as np
+import pandas as pd
+
+from batterysim.economics import EINSPEISEVERG_RP, STROMPREIS_BEZUG_RP
+from batterysim.loader import zeitintervall_h
+from batterysim.profiling import gemessen
+
+# Meteorologische Jahreszeiten; der Dezember zählt zum Winter des Folgejahres
+SAISONS = {12: 'winter', 1: 'winter', 2: 'winter', 3: 'fruehling', 4: 'fruehling', 5: 'fruehling',
+           6: 'sommer', 7: 'sommer', 8: 'sommer', 9: 'herbst', 10: 'herbst', 11: 'herbst'}
+
+_GROESSEN = ('verbrauch_kwh', 'pv_kwh', 'pv_direktnutzung_kwh', 'akku_geladen_kwh', 'akku_entladen_kwh',
+             'netzbezug_kwh', 'einspeisung_kwh', 'ersparnis_chf')
+
+
+def _zeit_ns(zeitindex):
+    zeitindex = pd.DatetimeIndex(zeitindex)
+    if zeitindex.tz is not None:
+        zeitindex = zeitindex.tz_convert('UTC').tz_localize(None)
+    return zeitindex.asi8
+
+
+@gemessen('kumulieren', zeilen=lambda kumuliert: len(kumuliert['zeit_ns']))
+def kumulierte_summen(combined_df, akku_ergebnis, strompreis_bezug_rp=STROMPREIS_BEZUG_RP,
+                      einspeiseverg_rp=EINSPEISEVERG_RP):
+    """Kumulierte Summen (Länge Zeitschritte + 1, beginnend bei 0) aller Fenstergrössen.
+
+    combined_df wie für energie_summary (pv_gesamt_kwh_erweitert,
+    hausverbrauch_kwh, Zeitindex), akku_ergebnis aus simuliere_akku für eine
+    Konfiguration. Die Preise dürfen Arrays pro Zeitschritt sein (z.B. aus
+    tariff.preis_matrizen). Netzbezug und Einspeisung sind die mit Akku.
+    """
+    verbrauch = combined_df['hausverbrauch_kwh'].to_numpy(dtype=np.float64)
+    pv = combined_df['pv_gesamt_kwh_erweitert'].to_numpy(dtype=np.float64)
+    geladen = np.asarray(akku_ergebnis.geladen, dtype=np.float64)
+    entladen = np.asarray(akku_ergebnis.entladen, dtype=np.float64)
+    werte = {
+        'verbrauch_kwh': verbrauch,
+        'pv_kwh': pv,
+        'pv_direktnutzung_kwh': np.minimum(pv, verbrauch),
+        'akku_geladen_kwh': geladen,
+        'akku_entladen_kwh': entladen,
+        'netzbezug_kwh': np.asarray(akku_ergebnis.netzbezug, dtype=np.float64),
+        'einspeisung_kwh': np.asarray(akku_ergebnis.einspeisung, dtype=np.float64),
+        'ersparnis_chf': (entladen * strompreis_bezug_rp - geladen * einspeiseverg_rp) / 100,
+    }
+    kumuliert = {name: np.concatenate([[0.0], np.cumsum(wert)]) for name, wert in werte.items()}
+    kumuliert['zeit_ns'] = _zeit_ns(combined_df.index)
+    kumuliert['schritt_h'] = zeitintervall_h(combined_df.index)
+    return kumuliert
+
+
+@gemessen('fenster_auswerten', zeilen=len)
+def fenster_kennzahlen(kumuliert, von, bis, namen=None):
+    """Summen und Kennzahlen für die Fenster [von, bis) (Zeitstempel, je ein Array).
+
+    Gibt eine Tabelle mit einer Zeile pro Fenster zurück: von, bis, stunden,
+    alle Summen aus kumulierte_summen sowie autarkiegrad (Anteil des
+    Verbrauchs aus PV direkt und Akku, %) und eigenverbrauchsquote (Anteil
+    der PV, die direkt oder über den Akku im Haus bleibt, %).
+    """
+    zeit = kumuliert['zeit_ns']
+    von, bis = pd.DatetimeIndex(von), pd.DatetimeIndex(bis)
+    a = np.searchsorted(zeit, _zeit_ns(von))
+    b = np.searchsorted(zeit, _zeit_ns(bis))
+    tabelle = pd.DataFrame({'von': von, 'bis': bis, 'stunden': (b - a) * kumuliert['schritt_h']},
+                           index=pd.Index(namen if namen is not None else range(len(a)), name='fenster'))
+    for name in _GROESSEN:
+        summe = kumuliert[name]
+        tabelle[name] = summe[b] - summe[a]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tabelle['autarkiegrad'] = ((tabelle['pv_direktnutzung_kwh'] + tabelle['akku_entladen_kwh'])
+                                   / tabelle['verbrauch_kwh'] * 100)
+        tabelle['eigenverbrauchsquote'] = ((tabelle['pv_direktnutzung_kwh'] + tabelle['akku_geladen_kwh'])
+                                           / tabelle['pv_kwh'] * 100)
+    return tabelle
+
+
+# ------------------- FENSTER -------------------
+
+def _grenzen(zeitindex):
+    """Anfang und Ende (exklusiv, ein Zeitschritt nach dem letzten) des Zeitraums."""
+    zeitindex = pd.DatetimeIndex(zeitindex)
+    schritt = zeitindex[-1] - zeitindex[-2] if len(zeitindex) > 1 else pd.Timedelta('1h')
+    return zeitindex[0], zeitindex[-1] + schritt
+
+
+def jahres_fenster(zeitindex):
+    """Kalenderjahre im Zeitraum (angeschnittene Jahre nur mit dem vorhandenen Teil)."""
+    anfang, ende = _grenzen(zeitindex)
+    jahre = pd.date_range(anfang.floor('D').replace(month=1, day=1), ende, freq='YS', inclusive='left')
+    von = jahre.where(jahre > anfang, anfang)
+    bis = (jahre + pd.DateOffset(years=1)).where(jahre + pd.DateOffset(years=1) < ende, ende)
+    return von, bis, [str(jahr.year) for jahr in jahre]
+
+
+def saison_fenster(zeitindex):
+    """Meteorologische Jahreszeiten (Winter = Dezember bis Februar) im Zeitraum."""
+    anfang, ende = _grenzen(zeitindex)
+    quartale = pd.date_range((anfang.floor('D') - pd.DateOffset(months=3)).replace(day=1), ende,
+                             freq='QS-DEC', inclusive='left')
+    quartale = quartale[quartale + pd.DateOffset(months=3) > anfang]
+    von = quartale.where(quartale > anfang, anfang)
+    bis = (quartale + pd.DateOffset(months=3)).where(quartale + pd.DateOffset(months=3) < ende, ende)
+    namen = [f"{q.year + (q.month == 12)}-{SAISONS[q.month]}" for q in quartale]
+    return von, bis, namen
+
+
+def rollende_fenster(zeitindex, laenge='30D', schritt='1D'):
+    """Fenster der Länge laenge, alle schritt verschoben, ganz innerhalb des Zeitraums."""
+    anfang, ende = _grenzen(zeitindex)
+    von = pd.date_range(anfang, ende - pd.Timedelta(laenge), freq=schritt)
+    bis = von + pd.Timedelta(laenge)
+    return von, bis, [f"{v:%Y-%m-%d}" for v in von]
+
+
+FENSTER_ARTEN = {'jahr': jahres_fenster, 'saison': saison_fenster, 'rollend': rollende_fenster}
+
+
+def fenster_analyse(combined_df, akku_ergebnis, arten=('jahr', 'saison', 'rollend'),
+                    strompreis_bezug_rp=STROMPREIS_BEZUG_RP, einspeiseverg_rp=EINSPEISEVERG_RP,
+                    laenge='30D', schritt='1D'):
+    """Kennzahlen pro Fensterart (FENSTER_ARTEN) aus einem einzigen kumulierten Durchlauf;
+    laenge und schritt gelten für die rollenden Fenster.
+
+    Gibt {art: Tabelle aus fenster_kennzahlen} zurück.
+    """
+    kumuliert = kumulierte_summen(combined_df, akku_ergebnis, strompreis_bezug_rp, einspeiseverg_rp)
+    tabellen = {}
+    for art in arten:
+        parameter = {'laenge': laenge, 'schritt': schritt} if art == 'rollend' else {}
+        tabellen[art] = fenster_kennzahlen(kumuliert, *FENSTER_ARTEN[art](combined_df.index, **parameter))
+    return tabellen
@@ -6,9 +6,11 @@ Created on Fri Jul 25 11:16:34 2025
 """
 
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
 
+from batterysim import simuliere_akku
+from batterysim.plot import plots_aktiv, pyplot, zeige
+
 # CSV einlesen
 df = pd.read_csv("data\energy_september1_25.csv")
 df.set_index("entity_id", inplace=True)
@@ -30,22 +32,6 @@ hausverbrauch = pv_sum - netzeinspeisung + netznutzung
 
 pv_uebrig = pv_sum - hausverbrauch
 
-# Plot 2: PV-Gesamterzeugung ist mit Netznutzung und Netzeinspeisung
-plt.figure(figsize=(12, 8))
-plt.plot(dates, pv_sum, label="PV Gesamt", linestyle="-", linewidth=2)
-plt.plot(dates, hausverbrauch, label="Hausverbrauch", linewidth=2)
-plt.plot(dates, pv_uebrig, label="PV Überschuss", linestyle="--", linewidth=2)
-
-# Berechnung des Integrals (kumulative Summe) des Hausverbrauchs
-integral_hausverbrauch = np.cumsum(hausverbrauch)
-#plt.plot(dates, integral_hausverbrauch, label="Kumulierter Hausverbrauch", linestyle="-.", linewidth=2)
-
-# Berechnung des Integrals des PV Überschusses (conditional >0)
-conditional_pv_uebrig = pv_uebrig.copy()
-conditional_pv_uebrig[pv_uebrig <= 0] = 0
-integral_pv_uebrig = np.cumsum(conditional_pv_uebrig)
-#plt.plot(dates, integral_pv_uebrig, label="Kumulierter PV Überschuss", linestyle="-.", linewidth=2)
-
 # Parameter für Akkusimulation
 max_akku_kapazitat = 20.0  # Maximale Akkukapazität in kWh
 min_akku_kapazitat = max_akku_kapazitat * 0.1  # Minimale Akkukapazität (10%)
@@ -56,30 +42,42 @@ max_entlade_leistung = 3.0 # Maximale Entladeleistung in kW pro Stunde
 soc_start = 0.5  # Start-SOC (State of Charge) in Prozent (50%)
 
 
-# Initialisierung
-simuAkku = np.zeros(len(dates))
-aktueller_akku_stand = max_akku_kapazitat * soc_start  # Start mit 50% Ladung
-
-for i in range(len(dates)):
-    if pv_uebrig.iloc[i] > 0:
-        # Akku laden mit Wirkungsgrad und Ladeleistungsbegrenzung
-        ladeenergie = min(pv_uebrig.iloc[i] * akku_wirkungsgrad_laden, max_lade_leistung)
-        aktueller_akku_stand = min(aktueller_akku_stand + ladeenergie, max_akku_kapazitat)
-    else:
-        # Akku entladen für Hausverbrauch mit Entladeleistungsbegrenzung
-        fehlende_energie = min(abs(pv_uebrig.iloc[i]) / akku_wirkungsgrad_entladen, max_entlade_leistung)
-        aktueller_akku_stand = max(aktueller_akku_stand - fehlende_energie, min_akku_kapazitat)
-    
-    simuAkku[i] = aktueller_akku_stand
-
-plt.plot(dates, simuAkku, label="Simu Akku Ladestand", linestyle="-.", linewidth=2)
-
-plt.title("Autarkieanalyse: Aktuelle PV-Anlage")
-plt.ylabel("kWh")
-plt.grid(True)
-plt.legend()
-plt.tight_layout()
-# Markierung der Bereiche, wo pv_uebrig > 0 ist, mit präziser Interpolation
-plt.fill_between(dates, pv_uebrig, 0, where=(pv_uebrig > 0), color='green', alpha=0.3, label="PV Überschuss > 0", interpolate=True)
-
-plt.show()
\ No newline at end of file
+# Akku-Simulation (vektorisiert, siehe batterysim.engine)
+simuAkku = simuliere_akku(
+    pv_uebrig.to_numpy(), max_akku_kapazitat,
+    min_soc=min_akku_kapazitat / max_akku_kapazitat,
+    max_lade_leistung=max_lade_leistung, max_entlade_leistung=max_entlade_leistung,
+    akku_wirkungsgrad_laden=akku_wirkungsgrad_laden,
+    akku_wirkungsgrad_entladen=akku_wirkungsgrad_entladen,
+    start_soc=soc_start).soc
+
+if plots_aktiv():
+    plt = pyplot()
+
+    # Plot 2: PV-Gesamterzeugung ist mit Netznutzung und Netzeinspeisung
+    plt.figure(figsize=(12, 8))
+    plt.plot(dates, pv_sum, label="PV Gesamt", linestyle="-", linewidth=2)
+    plt.plot(dates, hausverbrauch, label="Hausverbrauch", linewidth=2)
+    plt.plot(dates, pv_uebrig, label="PV Überschuss", linestyle="--", linewidth=2)
+
+    # Berechnung des Integrals (kumulative Summe) des Hausverbrauchs
+    integral_hausverbrauch = np.cumsum(hausverbrauch)
+    #plt.plot(dates, integral_hausverbrauch, label="Kumulierter Hausverbrauch", linestyle="-.", linewidth=2)
+
+    # Berechnung des Integrals des PV Überschusses (conditional >0)
+    conditional_pv_uebrig = pv_uebrig.copy()
+    conditional_pv_uebrig[pv_uebrig <= 0] = 0
+    integral_pv_uebrig = np.cumsum(conditional_pv_uebrig)
+    #plt.plot(dates, integral_pv_uebrig, label="Kumulierter PV Überschuss", linestyle="-.", linewidth=2)
+
+    plt.plot(dates, simuAkku, label="Simu Akku Ladestand", linestyle="-.", linewidth=2)
+
+    plt.title("Autarkieanalyse: Aktuelle PV-Anlage")
+    plt.ylabel("kWh")
+    plt.grid(True)
+    plt.legend()
+    plt.tight_layout()
+    # Markierung der Bereiche, wo pv_uebrig > 0 ist, mit präziser Interpolation
+    plt.fill_between(dates, pv_uebrig, 0, where=(pv_uebrig > 0), color='green', alpha=0.3, label="PV Überschuss > 0", interpolate=True)
+
+    zeige('tagessimulation')
\ No newline at end of file
@@ -8,9 +8,13 @@ Autor: Claud
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import os
 
+from batterysim import simuliere_akku_linear
+from batterysim.loader import lade_tagesdateien
+from batterysim.plot import plots_aktiv, pyplot, zeige
+from batterysim.quality import zeitluecken
+
 # ------------------- EINSTELLUNGEN -------------------
 
 basis_pfad = "data"
@@ -28,50 +32,31 @@ start_soc = 0.5                # Start mit 50 % Ladung
 
 # ------------------- DATEN EINLESEN -------------------
 
-dfs = []
+dateien = []
 for tag in tage:
     datei = os.path.join(basis_pfad, datei_template.format(tag))
     if not os.path.exists(datei):
         print(f"⚠️ Datei nicht gefunden: {datei}")
         continue
-    df_temp = pd.read_csv(datei)
-    df_temp.set_index("entity_id", inplace=True)
-    df_temp.index = df_temp.index.str.strip()
-    dfs.append(df_temp)
+    dateien.append(datei)
 
-if not dfs:
+if not dateien:
     raise FileNotFoundError("Keine gültigen CSV-Dateien gefunden.")
 
-# Zeitlich zusammenfügen
-df = pd.concat(dfs, axis=1)
+# Parallel einlesen, zeitlich sortiert, doppelte Stunden entfernt (Zeilen = Zeit, Spalten = Sensoren)
+df_time = lade_tagesdateien(dateien)
 
 
 
 # --- Diagnose robust ---
-import numpy as np
-import pandas as pd
-
-# Nur Zeitspalten (die mit einer Zahl anfangen)
-date_columns = [c for c in df.columns if c[:4].isdigit()]
-
-# In echte Timestamps konvertieren
-dates = pd.to_datetime(date_columns, errors="coerce", infer_datetime_format=True)
-
-# NaT (ungültige) Einträge entfernen
-dates = dates.dropna()
-dates_sorted = np.sort(dates.values.astype("datetime64[ns]"))
-
-# Zeitabstände in Minuten berechnen
-delta = np.diff(dates_sorted).astype('timedelta64[m]').astype(int)
-
-gaps = np.where(delta > 10)[0]
-
-print(f"Gesamtanzahl Spalten: {len(df.columns)}")
-print(f"Erkannte Zeitspalten: {len(date_columns)}")
-if len(gaps):
-    print(f"⚠️ Es gibt {len(gaps)} Zeitlücken über 10 Minuten:")
-    for g in gaps:
-        print(f"  {dates_sorted[g]} → {dates_sorted[g+1]}  (Δ {delta[g]} min)")
+# Lücken als Tabelle von Intervallen (vektorisiert, siehe batterysim.quality)
+luecken = zeitluecken(df_time.index)
+
+print(f"Gesamtanzahl Sensoren: {len(df_time.columns)}")
+print(f"Erkannte Zeitpunkte: {len(df_time)}")
+if len(luecken):
+    print(f"⚠️ Es gibt {len(luecken)} Zeitlücken (länger als der übliche Abstand):")
+    print(luecken.to_string(index=False))
 else:
     print("✅ Keine signifikanten Zeitlücken erkannt.")
 
@@ -80,103 +65,85 @@ else:
 
 # ------------------- DATEN AUFBEREITEN -------------------
 
-# Nur Zeitspalten erkennen
-date_columns = [c for c in df.columns if c[:4].isdigit()]
+# Zwischen den Stundenwerten wird linear interpoliert; die Simulation rechnet
+# die Segmente exakt, ein 1-Minuten-Raster ist dafür nicht nötig.
+# Fehlende Stundenwerte werden wie bisher linear über die Zeit aufgefüllt.
+df_time = df_time.interpolate(method='time')
+dates = df_time.index
+dauer_h = np.diff(dates.asi8) / 3.6e12  # Segmentdauer in Stunden
 
-# In echte Timestamps konvertieren
-dates = pd.to_datetime(date_columns, errors="coerce")
-dates = dates.dropna()
 
-# --- Lücken auffüllen ---
-# DataFrame nur auf Zeitspalten reduzieren
-df_time = df[date_columns].copy()
+def integral_kwh(reihe):
+    """Integral einer stückweise linearen Leistung (kW) über alle Segmente."""
+    werte = reihe.to_numpy()
+    return ((werte[:-1] + werte[1:]) / 2 * dauer_h).sum()
 
-# Spaltennamen auf Zeitindex setzen
-df_time.columns = dates
-df_time = df_time.T  # Spalten → Zeilen für resample
-df_time.index.name = 'Zeit'
 
-# Auf 1-Minuten-Raster bringen und linear interpolieren
-df_time = df_time.resample('1min').interpolate(method='linear')
-
-# Zurücktransponieren, damit Berechnungen wie bisher funktionieren
-df_time = df_time.T
-date_columns = df_time.columns
-dates = date_columns
-
-# --- PV und Verbrauch auf interpolierten Daten ---
-pv_west = df_time.loc["sensor.sungrow_sg12rt_total_yield"].astype(float)
-pv_ost = df_time.loc["sensor.sma_st_80_pv_gen_meter"].astype(float)
+# --- PV und Verbrauch (Stützstellen) ---
+pv_west = df_time["sensor.sungrow_sg12rt_total_yield"]
+pv_ost = df_time["sensor.sma_st_80_pv_gen_meter"]
 pv_sum = pv_ost + pv_west
 
-netznutzung = df_time.loc["sensor.netznutzung_kwh"].astype(float)
-netzeinspeisung = df_time.loc["sensor.netzeinspeisung_kwh"].astype(float)
+netznutzung = df_time["sensor.netznutzung_kwh"]
+netzeinspeisung = df_time["sensor.netzeinspeisung_kwh"]
 hausverbrauch = pv_sum - netzeinspeisung + netznutzung
 
 pv_uebrig = pv_sum - hausverbrauch
 
 # ------------------- AKKUSIMULATION -------------------
 
-simuAkku = np.zeros(len(dates))
-akku_stand = max_akku_kapazitat * start_soc
-
-zeitintervall = 1 / 60  # ⬅️ HIER: 1 Minute = 1/60 Stunden (für kWh-Umrechnung)
-
-for i in range(len(dates)):
-    if pv_uebrig.iloc[i] > 0:
-        # Ladeleistung in kW, begrenzt durch maximale Ladeleistung
-        ladeleistung = min(pv_uebrig.iloc[i], max_lade_leistung)
-        # Umrechnung in kWh unter Berücksichtigung des Wirkungsgrads und Zeitintervalls
-        ladeenergie = ladeleistung * akku_wirkungsgrad_laden * zeitintervall
-        akku_stand = min(akku_stand + ladeenergie, max_akku_kapazitat)
-    else:
-        # Entladeleistung in kW, begrenzt durch maximale Entladeleistung
-        entladeleistung = min(abs(pv_uebrig.iloc[i]), max_entlade_leistung)
-        # Umrechnung in kWh unter Berücksichtigung des Wirkungsgrads und Zeitintervalls
-        entladeenergie = entladeleistung / akku_wirkungsgrad_entladen * zeitintervall
-        akku_stand = max(akku_stand - entladeenergie, min_akku_kapazitat)
-    
-    simuAkku[i] = akku_stand
+# Exakt auf den linearen Segmenten (inkl. Zeitpunkte, an denen der Akku voll/leer wird)
+akku_ergebnis, saettigung = simuliere_akku_linear(
+    pv_uebrig.to_numpy(), dauer_h, max_akku_kapazitat,
+    min_soc=min_akku_kapazitat / max_akku_kapazitat,
+    max_lade_leistung=max_lade_leistung, max_entlade_leistung=max_entlade_leistung,
+    akku_wirkungsgrad_laden=akku_wirkungsgrad_laden,
+    akku_wirkungsgrad_entladen=akku_wirkungsgrad_entladen,
+    start_soc=start_soc)
+simuAkku = np.r_[max_akku_kapazitat * start_soc, akku_ergebnis.soc]  # Stand an jeder Stützstelle
 
 # ------------------- PLOTTEN -------------------
 
-plt.figure(figsize=(14, 8))
-plt.plot(dates, pv_sum, label="PV Gesamt", linewidth=2)
-plt.plot(dates, hausverbrauch, label="Hausverbrauch", linewidth=2)
-plt.plot(dates, pv_uebrig, label="PV Überschuss", linestyle="--", linewidth=2)
-plt.plot(dates, simuAkku, label="Simu Akku Ladestand", linestyle="-.", linewidth=2)
-plt.fill_between(dates, pv_uebrig, 0, where=(pv_uebrig > 0),
-                 color='green', alpha=0.3, label="PV Überschuss > 0", interpolate=True)
+if plots_aktiv():
+    plt = pyplot()
+
+    plt.figure(figsize=(14, 8))
+    plt.plot(dates, pv_sum, label="PV Gesamt", linewidth=2)
+    plt.plot(dates, hausverbrauch, label="Hausverbrauch", linewidth=2)
+    plt.plot(dates, pv_uebrig, label="PV Überschuss", linestyle="--", linewidth=2)
+    plt.plot(dates, simuAkku, label="Simu Akku Ladestand", linestyle="-.", linewidth=2)
+    plt.fill_between(dates, pv_uebrig, 0, where=(pv_uebrig > 0),
+                     color='green', alpha=0.3, label="PV Überschuss > 0", interpolate=True)
 
-plt.title("Autarkieanalyse – Mehrtagessimulation")
-plt.ylabel("kWh")
-plt.xlabel("Zeit")
-plt.grid(True)
-plt.legend()
-plt.tight_layout()
-plt.show()
+    plt.title("Autarkieanalyse – Mehrtagessimulation")
+    plt.ylabel("kWh")
+    plt.xlabel("Zeit")
+    plt.grid(True)
+    plt.legend()
+    plt.tight_layout()
+    zeige('mehrtagessimulation')
 
 
 # ------------------- SUMMARY-BERECHNUNG -------------------
 
 # Gesamtverbrauch (Haus) in kWh über den Zeitraum
-gesamt_verbrauch_kwh = hausverbrauch.sum() * zeitintervall
+gesamt_verbrauch_kwh = integral_kwh(hausverbrauch)
 
 # Gesamt-PV-Produktion
-gesamt_pv_kwh = pv_sum.sum() * zeitintervall
+gesamt_pv_kwh = integral_kwh(pv_sum)
 
 # PV direkt genutzt (nicht eingespeist)
-pv_direktnutzung_kwh = hausverbrauch.where(pv_sum >= hausverbrauch, pv_sum).sum() * zeitintervall
+# (PV minus Überschuss; der Überschuss ist Einspeisung plus Akkuladung)
+pv_direktnutzung_kwh = gesamt_pv_kwh - (akku_ergebnis.einspeisung + akku_ergebnis.geladen).sum()
 
 # PV-Energie, die in den Akku geladen wurde
-akku_ladungen_kwh = np.diff(simuAkku, prepend=simuAkku[0])
-akku_energie_von_pv_kwh = akku_ladungen_kwh[akku_ladungen_kwh > 0].sum()
+akku_energie_von_pv_kwh = akku_ergebnis.geladen.sum()
 
 # PV-Energie, die aus dem Akku entnommen wurde
-akku_entnahmen_kwh = -akku_ladungen_kwh[akku_ladungen_kwh < 0].sum()
+akku_entnahmen_kwh = akku_ergebnis.entladen.sum()
 
 # Gesamt-Netzbezug (laut Sensor)
-netzbezug_kwh = netznutzung.sum() * zeitintervall
+netzbezug_kwh = integral_kwh(netznutzung)
 
 # Autarkiegrad (wie viel % des Verbrauchs durch PV + Akku gedeckt wurde)
 verbrauch_deckt_durch_pv_und_akku = pv_direktnutzung_kwh + akku_entnahmen_kwh
@@ -195,6 +162,8 @@ print(f"Aus dem Akku entnommen:  {akku_entnahmen_kwh:.2f} kWh")
 print(f"Netzbezug:               {netzbezug_kwh:.2f} kWh")
 print(f"Gesparte Energie (PV+Akku): {eingespart_kwh:.2f} kWh")
 print(f"Autarkiegrad:            {autarkiegrad:.1f} %")
+print(f"Akku voll erreicht:      {(saettigung['grenze'] == 1).sum()} mal")
+print(f"Akku leer erreicht:      {(saettigung['grenze'] == -1).sum()} mal")
 print("--------------------------------------------------------")
 
 
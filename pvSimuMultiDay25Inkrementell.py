@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Inkrementelle PV- und Akku-Simulation über mehrere Tagesdateien
+
+Wie pvSimuMultiDay25.py, verarbeitet aber nur neue Tagesdateien und setzt die
+Simulation vom gespeicherten Akku-Stand fort (für den nächtlichen Lauf).
+"""
+
+import os
+
+from batterysim.incremental import aktualisiere_mehrtagessimulation
+
+# ------------------- EINSTELLUNGEN -------------------
+
+basis_pfad = "data"
+tage = range(1, 31)  # Welche Tage einlesen -> 1 bis 30
+datei_template = "energy_september{}_25.csv"
+zustand_datei = os.path.join(basis_pfad, "multiday_zustand.json")
+
+# Akkusimulationsparameter
+max_akku_kapazitat = 15.0      # kWh
+akku_wirkungsgrad_laden = 0.8
+akku_wirkungsgrad_entladen = 0.9
+max_lade_leistung = 10        # kW
+max_entlade_leistung = 10     # kW
+start_soc = 0.5                # Start mit 50 % Ladung
+
+# ------------------- DATEIEN SUCHEN -------------------
+
+dateien = []
+for tag in tage:
+    datei = os.path.join(basis_pfad, datei_template.format(tag))
+    if not os.path.exists(datei):
+        print(f"⚠️ Datei nicht gefunden: {datei}")
+        continue
+    dateien.append(datei)
+
+if not dateien:
+    raise FileNotFoundError("Keine gültigen CSV-Dateien gefunden.")
+
+# ------------------- SIMULATION (NUR NEUE DATEIEN) -------------------
+
+zustand = aktualisiere_mehrtagessimulation(
+    dateien, zustand_datei, max_akku_kapazitat=max_akku_kapazitat, min_soc=0.1,
+    max_lade_leistung=max_lade_leistung, max_entlade_leistung=max_entlade_leistung,
+    akku_wirkungsgrad_laden=akku_wirkungsgrad_laden,
+    akku_wirkungsgrad_entladen=akku_wirkungsgrad_entladen,
+    start_soc=start_soc)
+
+summen = zustand['summen']
+verbrauch_deckt_durch_pv_und_akku = summen['pv_direktnutzung_kwh'] + summen['akku_entnahmen_kwh']
+autarkiegrad = verbrauch_deckt_durch_pv_und_akku / summen['gesamt_verbrauch_kwh'] * 100
+
+print("\n------------------- ENERGIE-SUMMARY -------------------")
+print(f"Verarbeitete Dateien:    {len(zustand['dateien'])}")
+print(f"Akku-Stand am Ende:      {zustand['akku_stand']:.2f} kWh")
+print(f"Gesamtverbrauch:         {summen['gesamt_verbrauch_kwh']:.2f} kWh")
+print(f"PV-Gesamterzeugung:      {summen['gesamt_pv_kwh']:.2f} kWh")
+print(f"Direkt genutzte PV:      {summen['pv_direktnutzung_kwh']:.2f} kWh")
+print(f"Energie in Akku geladen: {summen['akku_energie_von_pv_kwh']:.2f} kWh")
+print(f"Aus dem Akku entnommen:  {summen['akku_entnahmen_kwh']:.2f} kWh")
+print(f"Netzbezug:               {summen['netzbezug_kwh']:.2f} kWh")
+print(f"Gesparte Energie (PV+Akku): {verbrauch_deckt_durch_pv_und_akku:.2f} kWh")
+print(f"Autarkiegrad:            {autarkiegrad:.1f} %")
+print("--------------------------------------------------------")
+
+# ------------------- AKKU-ERSARNIS IN CHF -------------------
+
+strompreis_bezug_rp = 22.5   # Rappen pro kWh für Bezug
+einspeiseverg_rp = 7.5       # Rappen pro kWh für Einspeisung
+
+ersparnis_durch_vermeidung_netbezug_rp = summen['akku_entnahmen_kwh'] * strompreis_bezug_rp
+verlust_durch_verhinderte_einspeisung_rp = summen['akku_energie_von_pv_kwh'] * einspeiseverg_rp
+netto_ersparnis_akku_chf = (ersparnis_durch_vermeidung_netbezug_rp - verlust_durch_verhinderte_einspeisung_rp) / 100
+
+print(f"💰 Nettoersparnis durch Akku:     {netto_ersparnis_akku_chf:.2f} CHF")
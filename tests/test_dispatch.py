@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import itertools
+
+import numpy as np
+import pytest
+
+from batterysim.dispatch import netzkosten_chf, optimiere_akku, vergleiche_mit_greedy
+
+
+def _preise(n, seed=0):
+    """Bezug mit Hoch- und Niedertarif, Einspeisung darunter (Rp/kWh)."""
+    rng = np.random.default_rng(seed)
+    bezug = np.where(np.arange(n) % 24 < 8, 15.0, 30.0) + rng.integers(0, 10, n)
+    return bezug, bezug * rng.uniform(0.1, 0.6, n)
+
+
+def _raster_dp(pv_uebrig, bezug, einspeisung, kapazitaet, min_soc, lade_leistung, entlade_leistung, eta_laden,
+               eta_entladen, start_soc, netz_laden, netz_entladen, restwert_rp, raster):
+    """Kleinste Kosten (CHF) durch Ausprobieren aller Übergänge zwischen Akku-Ständen auf einem Raster."""
+    stand = np.arange(kapazitaet * min_soc, kapazitaet + raster / 2, raster)
+    kosten = -restwert_rp * stand / 100
+    for u, p_bezug, p_einsp in reversed(list(zip(pv_uebrig, bezug, einspeisung))):
+        delta = stand[np.newaxis, :] - stand[:, np.newaxis]  # Zeile: von, Spalte: nach
+        d_min = -entlade_leistung / eta_entladen if netz_entladen else max(min(u, 0) / eta_entladen,
+                                                                           -entlade_leistung / eta_entladen)
+        d_max = lade_leistung * eta_laden if netz_laden else min(max(u, 0) * eta_laden, lade_leistung * eta_laden)
+        netz = np.maximum(delta, 0) / eta_laden - np.maximum(-delta, 0) * eta_entladen - u
+        schritt = np.where(netz > 0, netz * p_bezug, netz * p_einsp) / 100
+        moeglich = (delta >= d_min - 1e-9) & (delta <= d_max + 1e-9)
+        kosten = np.where(moeglich, schritt + kosten[np.newaxis, :], np.inf).min(axis=1)
+    return kosten[np.argmin(np.abs(stand - kapazitaet * start_soc))]
+
+
+def _kosten(ergebnis, bezug, einspeisung, restwert_rp):
+    return netzkosten_chf(ergebnis, bezug, einspeisung) - ergebnis.soc[-1] * restwert_rp / 100
+
+
+@pytest.mark.parametrize('netz_laden, netz_entladen', list(itertools.product([False, True], repeat=2)))
+def test_wie_raster_dp(netz_laden, netz_entladen):
+    """Ohne Verluste und mit Werten auf dem Raster ist das Raster-Optimum exakt."""
+    n = 36
+    pv_uebrig = np.random.default_rng(1).integers(-6, 7, n) / 2
+    bezug, einspeisung = _preise(n)
+    akku = {'min_soc': 0.25, 'max_lade_leistung': 2.0, 'max_entlade_leistung': 1.5,
+            'akku_wirkungsgrad_laden': 1.0, 'akku_wirkungsgrad_entladen': 1.0, 'start_soc': 0.5}
+    restwert_rp = 12.0
+
+    ergebnis = optimiere_akku(pv_uebrig, bezug, einspeisung, 4.0, netz_laden=netz_laden, netz_entladen=netz_entladen,
+                              restwert_rp=restwert_rp, preis_raster_rp=None, **akku)
+    referenz = _raster_dp(pv_uebrig, bezug, einspeisung, 4.0, *akku.values(), netz_laden, netz_entladen,
+                          restwert_rp, raster=0.5)
+    assert _kosten(ergebnis, bezug, einspeisung, restwert_rp) == pytest.approx(referenz, abs=1e-9)
+
+
+def test_mit_verlusten_unter_raster_dp():
+    """Mit Verlusten liegt das Optimum zwischen den Rasterpunkten: jedes Raster ist eine obere
+    Schranke, die mit feinerem Raster gegen das Optimum geht."""
+    n = 24
+    pv_uebrig = np.random.default_rng(2).normal(0.0, 1.5, n)
+    bezug, einspeisung = _preise(n, seed=2)
+    akku = {'min_soc': 0.1, 'max_lade_leistung': 2.0, 'max_entlade_leistung': 2.0,
+            'akku_wirkungsgrad_laden': 0.9, 'akku_wirkungsgrad_entladen': 0.95, 'start_soc': 0.5}
+
+    ergebnis = optimiere_akku(pv_uebrig, bezug, einspeisung, 5.0, restwert_rp=10.0, preis_raster_rp=None, **akku)
+    optimal = _kosten(ergebnis, bezug, einspeisung, 10.0)
+    luecken = [_raster_dp(pv_uebrig, bezug, einspeisung, 5.0, *akku.values(), False, False, 10.0, raster) - optimal
+               for raster in (0.02, 0.01, 0.005)]
+    assert min(luecken) >= -1e-9
+    assert luecken == sorted(luecken, reverse=True)
+    assert luecken[-1] < 0.01
+
+
+def test_nie_teurer_als_greedy():
+    n = 24 * 14
+    stunde = np.arange(n) % 24
+    rng = np.random.default_rng(3)
+    pv_uebrig = np.clip(np.sin((stunde - 6) / 12 * np.pi), 0, None) * 5.0 - rng.gamma(2.0, 0.4, n)
+    bezug, einspeisung = _preise(n, seed=3)
+    kapazitaeten = np.array([0.0, 2.5, 5.0, 10.0, 20.0, 40.0])
+
+    for netz_laden, netz_entladen in itertools.product([False, True], repeat=2):
+        vergleich = vergleiche_mit_greedy(pv_uebrig, bezug, einspeisung, kapazitaeten, netz_laden=netz_laden,
+                                          netz_entladen=netz_entladen, preis_raster_rp=None,
+                                          akku_wirkungsgrad_laden=0.92, start_soc=0.3)
+        assert (vergleich['luecke_chf'] >= -1e-9).all()
+        assert (vergleich['kosten_optimal_chf'] <= vergleich['kosten_ohne_akku_chf'] + 1e-9).all()
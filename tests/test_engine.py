@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+from batterysim.engine import _SCAN_MAX_KONFIGURATIONEN, akku_summen, simuliere_akku
+
+
+def _ueberschuss(n=500, seed=0):
+    """Überschuss pro Schritt (kWh), gross genug, dass Leistungsgrenzen und Kapazität greifen."""
+    return np.random.default_rng(seed).normal(0.0, 2.5, n)
+
+
+def _referenz(pv_uebrig, kapazitaet, min_soc, lade_leistung, entlade_leistung, eta_laden, eta_entladen,
+              zeitintervall, start_soc):
+    """Schritt für Schritt in reinem Python (geladen, entladen, netzbezug, einspeisung, soc)."""
+    minimum = kapazitaet * min_soc
+    stand = kapazitaet * start_soc
+    spalten = ([], [], [], [], [])
+    for x in pv_uebrig:
+        if x > 0:
+            neu = min(stand + min(x, lade_leistung * zeitintervall) * eta_laden, kapazitaet)
+        else:
+            neu = max(stand - min(-x, entlade_leistung * zeitintervall) / eta_entladen, minimum)
+        geladen = max(neu - stand, 0.0) / eta_laden
+        entladen = max(stand - neu, 0.0) * eta_entladen
+        stand = neu
+        for spalte, wert in zip(spalten, (geladen, entladen, max(-x - entladen, 0.0), max(x - geladen, 0.0), stand)):
+            spalte.append(wert)
+    return [np.array(spalte) for spalte in spalten]
+
+
+def _konfigurationen(anzahl, seed=1):
+    rng = np.random.default_rng(seed)
+    return {'max_akku_kapazitat': rng.uniform(2.0, 30.0, anzahl),
+            'min_soc': rng.uniform(0.0, 0.3, anzahl),
+            'max_lade_leistung': rng.uniform(1.0, 5.0, anzahl),
+            'max_entlade_leistung': rng.uniform(1.0, 5.0, anzahl),
+            'akku_wirkungsgrad_laden': rng.uniform(0.85, 1.0, anzahl),
+            'akku_wirkungsgrad_entladen': rng.uniform(0.85, 1.0, anzahl),
+            'start_soc': rng.uniform(0.3, 1.0, anzahl)}
+
+
+def _vergleiche(ergebnis, referenz):
+    geladen, entladen, netzbezug, einspeisung, soc = referenz
+    np.testing.assert_allclose(ergebnis.soc, soc, atol=1e-9)
+    np.testing.assert_allclose(ergebnis.geladen, geladen, atol=1e-9)
+    np.testing.assert_allclose(ergebnis.entladen, entladen, atol=1e-9)
+    np.testing.assert_allclose(ergebnis.netzbezug, netzbezug, atol=1e-9)
+    np.testing.assert_allclose(ergebnis.einspeisung, einspeisung, atol=1e-9)
+
+
+@pytest.mark.parametrize('parameter', [
+    {},
+    {'min_soc': 0.0, 'start_soc': 1.0},
+    {'min_soc': 0.3, 'start_soc': 0.3, 'max_lade_leistung': 1.5, 'max_entlade_leistung': 4.0},
+    {'akku_wirkungsgrad_laden': 0.9, 'akku_wirkungsgrad_entladen': 0.8, 'zeitintervall': 0.25},
+])
+def test_eine_kapazitaet_wie_referenz(parameter):
+    pv_uebrig = _ueberschuss()
+    ergebnis = simuliere_akku(pv_uebrig, 10.0, **parameter)
+    voll = {'min_soc': 0.1, 'max_lade_leistung': 3.0, 'max_entlade_leistung': 3.0, 'akku_wirkungsgrad_laden': 0.95,
+            'akku_wirkungsgrad_entladen': 0.95, 'zeitintervall': 1.0, 'start_soc': 0.5, **parameter}
+    _vergleiche(ergebnis, _referenz(pv_uebrig, 10.0, voll['min_soc'], voll['max_lade_leistung'],
+                                    voll['max_entlade_leistung'], voll['akku_wirkungsgrad_laden'],
+                                    voll['akku_wirkungsgrad_entladen'], voll['zeitintervall'], voll['start_soc']))
+
+
+@pytest.mark.parametrize('anzahl', [5, _SCAN_MAX_KONFIGURATIONEN, _SCAN_MAX_KONFIGURATIONEN + 1])
+def test_viele_konfigurationen_wie_referenz(anzahl):
+    """Bis _SCAN_MAX_KONFIGURATIONEN rechnet der Clip-Scan, darüber die Zeitschleife."""
+    pv_uebrig = _ueberschuss()
+    konfigurationen = _konfigurationen(anzahl)
+    ergebnis = simuliere_akku(pv_uebrig, zeitintervall=0.5, **konfigurationen)
+    assert ergebnis.soc.shape == (len(pv_uebrig), anzahl)
+    for k in range(anzahl):
+        einzeln = [werte[k] for werte in konfigurationen.values()]
+        referenz = _referenz(pv_uebrig, *einzeln[:6], 0.5, einzeln[6])
+        _vergleiche(type(ergebnis)(*(werte[:, k] for werte in ergebnis)), referenz)
+
+
+@pytest.mark.parametrize('anzahl', [1, _SCAN_MAX_KONFIGURATIONEN + 1])
+def test_summen_wie_verlauf(anzahl):
+    pv_uebrig = _ueberschuss()
+    konfigurationen = _konfigurationen(anzahl)
+    verlauf = simuliere_akku(pv_uebrig, **konfigurationen)
+    summen = akku_summen(pv_uebrig[:, np.newaxis], **konfigurationen)
+    np.testing.assert_allclose(summen.soc, verlauf.soc[-1], atol=1e-9)
+    for feld in ('geladen', 'entladen', 'netzbezug', 'einspeisung'):
+        np.testing.assert_allclose(getattr(summen, feld), getattr(verlauf, feld).sum(axis=0), atol=1e-8)
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from batterysim.incremental import SUMMEN, _SPALTEN, aktualisiere_mehrtagessimulation
+from batterysim.loader import EINSPEISUNG_SENSOR, NETZBEZUG_SENSOR, TAGES_PV_OST_SENSOR, TAGES_PV_WEST_SENSOR
+
+
+def _tagesdatei(ordner, tag, seed):
+    """Tagesdatei im Breitformat (eine Zeile pro Sensor, eine Spalte pro Stunde, kWh pro Stunde)."""
+    rng = np.random.default_rng(seed)
+    zeit = pd.date_range(pd.Timestamp('2025-09-01', tz='UTC') + pd.Timedelta(days=tag - 1), periods=24, freq='h')
+    pv = np.clip(np.sin((zeit.hour.to_numpy() - 6) / 12 * np.pi), 0, None) * rng.uniform(2.0, 8.0)
+    verbrauch = rng.gamma(2.0, 0.4, 24)
+    werte = {TAGES_PV_OST_SENSOR: pv * 0.4, TAGES_PV_WEST_SENSOR: pv * 0.6,
+             NETZBEZUG_SENSOR: np.maximum(verbrauch - pv, 0), EINSPEISUNG_SENSOR: np.maximum(pv - verbrauch, 0)}
+    df = pd.DataFrame([werte[s] for s in _SPALTEN], index=pd.Index(_SPALTEN, name='entity_id'),
+                      columns=zeit.strftime('%Y-%m-%dT%H:%M:%S.000Z'))
+    df.insert(0, 'type', 'sensor')
+    df.insert(1, 'unit', 'kWh')
+    pfad = os.path.join(ordner, f"energy_september{tag}_25.csv")
+    df.to_csv(pfad)
+    return pfad
+
+
+def _frisch(tmp_path, dateien, **akku_parameter):
+    """Zustand eines Laufs über alle Dateien ohne gespeicherten Zustand."""
+    return aktualisiere_mehrtagessimulation(dateien, str(tmp_path / 'frisch.json'), **akku_parameter)
+
+
+def _gleich(zustand, erwartet):
+    assert zustand['akku_stand'] == pytest.approx(erwartet['akku_stand'], abs=1e-9)
+    for summe in SUMMEN:
+        assert zustand['summen'][summe] == pytest.approx(erwartet['summen'][summe], abs=1e-9)
+    assert sorted(zustand['dateien']) == sorted(erwartet['dateien'])
+
+
+@pytest.fixture
+def dateien(tmp_path):
+    ordner = tmp_path / 'tage'
+    ordner.mkdir()
+    return [_tagesdatei(str(ordner), tag, seed=tag) for tag in range(1, 6)]
+
+
+def test_tageweise_wie_gesamt(tmp_path, dateien):
+    zustand_datei = str(tmp_path / 'zustand.json')
+    for i in range(1, len(dateien) + 1):
+        zustand = aktualisiere_mehrtagessimulation(dateien[:i], zustand_datei)
+    _gleich(zustand, _frisch(tmp_path, dateien))
+
+
+def test_neu_bei_anderen_parametern(tmp_path, dateien):
+    zustand_datei = str(tmp_path / 'zustand.json')
+    vorher = aktualisiere_mehrtagessimulation(dateien, zustand_datei)
+    zustand = aktualisiere_mehrtagessimulation(dateien, zustand_datei, max_akku_kapazitat=5.0)
+    assert zustand['akku_stand'] != vorher['akku_stand']
+    _gleich(zustand, _frisch(tmp_path, dateien, max_akku_kapazitat=5.0))
+
+
+def test_neu_bei_geaenderter_datei(tmp_path, dateien):
+    zustand_datei = str(tmp_path / 'zustand.json')
+    vorher = aktualisiere_mehrtagessimulation(dateien, zustand_datei)
+    stat = os.stat(dateien[1])
+    _tagesdatei(os.path.dirname(dateien[1]), 2, seed=99)
+    os.utime(dateien[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    zustand = aktualisiere_mehrtagessimulation(dateien, zustand_datei)
+    assert zustand['summen']['gesamt_pv_kwh'] != pytest.approx(vorher['summen']['gesamt_pv_kwh'])
+    _gleich(zustand, _frisch(tmp_path, dateien))
+
+
+def test_neu_bei_nachgelieferter_aelterer_datei(tmp_path, dateien):
+    zustand_datei = str(tmp_path / 'zustand.json')
+    aktualisiere_mehrtagessimulation(dateien[2:], zustand_datei)
+    zustand = aktualisiere_mehrtagessimulation(dateien[1:], zustand_datei)
+    _gleich(zustand, _frisch(tmp_path, dateien[1:]))
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+from batterysim.loader import SENSOREN, STUNDE_NS, lade_stundendaten_stream, schritt_ns, stundenraster
+
+
+def _export(freq, stunden=48):
+    """Export im Langformat: alle Sensoren zählen pro Stunde 1 kWh hoch, abgetastet alle freq."""
+    pro_stunde = STUNDE_NS // schritt_ns(freq)
+    zeit = pd.date_range('2024-01-01', periods=stunden * pro_stunde + 1, freq=freq, tz='UTC')
+    stand = np.arange(len(zeit)) / pro_stunde
+    return pd.DataFrame({'entity_id': np.repeat(SENSOREN, len(zeit)),
+                         'state': np.tile(stand, len(SENSOREN)),
+                         'last_changed': np.tile(zeit.strftime('%Y-%m-%dT%H:%M:%S.000000Z'), len(SENSOREN))})
+
+
+@pytest.mark.parametrize('schritt', ['15min', '30min'])
+def test_schritt_feiner_als_abtastung(schritt):
+    with pytest.raises(ValueError, match='feiner als die Abtastung'):
+        stundenraster(_export('h'), start_time='2024-01-01 00:00', end_time='2024-01-02 23:00', schritt=schritt)
+
+
+@pytest.mark.parametrize('freq, schritt', [('h', 'h'), ('15min', '15min')])
+def test_schritt_wie_abtastung(freq, schritt):
+    combined_df = stundenraster(_export(freq), start_time='2024-01-01 01:00', end_time='2024-01-02 23:00',
+                                schritt=schritt)
+    pro_schritt = schritt_ns(schritt) / STUNDE_NS
+    assert combined_df[SENSOREN[0]].to_numpy() == pytest.approx(pro_schritt, rel=1e-6)
+
+
+def test_feine_messungen_im_stundenraster():
+    combined_df = stundenraster(_export('15min'), start_time='2024-01-01 01:00', end_time='2024-01-02 23:00',
+                                schritt='h')
+    assert combined_df[SENSOREN[0]].to_numpy() == pytest.approx(1.0, rel=1e-6)
+
+
+@pytest.mark.parametrize('chunksize', [7, 1000])
+def test_stream_wie_stundenraster(tmp_path, chunksize):
+    pfad = tmp_path / 'export.csv'
+    _export('15min').to_csv(pfad, index=False)
+    bereich = dict(start_time='2024-01-01 01:00', end_time='2024-01-02 23:00', schritt='h')
+    erwartet = stundenraster(pd.read_csv(pfad), **bereich)
+    gestreamt = lade_stundendaten_stream(pfad, chunksize=chunksize, **bereich)
+    pd.testing.assert_frame_equal(gestreamt, erwartet)
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import pytest
+
+from batterysim.loader import WEST_FAKTOR, erweitere_pv, stundenraster
+from batterysim.store import REIHEN, importiere_standorte, oeffne_standort
+from batterysim.synthetic import erzeuge_export
+
+
+@pytest.mark.parametrize('chunksize', [None, 5000])
+def test_archiv_wie_stundenraster(tmp_path, chunksize):
+    """Import, Erweiterung nach vorne und hinten und erneuter Import ergeben dasselbe Raster wie der Loader."""
+    quelle, archiv = tmp_path / 'quelle', tmp_path / 'archiv'
+    quelle.mkdir()
+    erzeuge_export(quelle / 'a.csv', intervall_min=15, luecken=3, zaehler_resets=1)
+
+    zeitraeume = [('2024-03-01 00:00', '2024-06-30 23:00'), ('2024-01-01 00:00', '2024-02-29 23:00'),
+                  ('2024-07-01 00:00', '2024-12-31 23:00'), ('2024-03-01 00:00', '2024-06-30 23:00')]
+    for start_time, end_time in zeitraeume:
+        importiere_standorte(str(quelle), str(archiv), start_time, end_time, schritt='h', chunksize=chunksize,
+                             prozesse=1)
+
+    erwartet = erweitere_pv(stundenraster(pd.read_csv(quelle / 'a.csv'), start_time='2024-01-01 00:00',
+                                          end_time='2024-12-31 23:00', schritt='h'), WEST_FAKTOR)[REIHEN]
+    daten = oeffne_standort(str(archiv), 'a').daten()
+    pd.testing.assert_frame_equal(daten, erwartet, check_freq=False, check_dtype=False)
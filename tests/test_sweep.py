@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+from batterysim.economics import akku_ersparnis
+from batterysim.engine import simuliere_akku
+from batterysim.sweep import kapazitaets_sweep
+
+
+def _ueberschuss(tage=60, seed=0):
+    zeitindex = pd.date_range('2024-01-01', periods=tage * 24, freq='h', tz='UTC')
+    stunde = zeitindex.hour.to_numpy()
+    pv = np.clip(np.sin((stunde - 6) / 12 * np.pi), 0, None) * 4.0
+    verbrauch = np.random.default_rng(seed).gamma(2.0, 0.4, len(zeitindex))
+    return pd.Series(pv - verbrauch, index=zeitindex)
+
+
+@pytest.mark.parametrize('start_soc', [0.1, 0.5, 1.0])
+def test_sweep_wie_simulate(start_soc):
+    """sweep und simulate bewerten denselben Akku gleich (Hausseite, inkl. erstem Zeitschritt)."""
+    pv_uebrig = _ueberschuss()
+    parameter = {'akku_wirkungsgrad_laden': 0.9, 'akku_wirkungsgrad_entladen': 0.92, 'start_soc': start_soc}
+
+    zeile = kapazitaets_sweep(pv_uebrig, [20.0], strompreis_bezug_rp=22.5, einspeiseverg_rp=6.0,
+                              **parameter).loc[20.0]
+    ergebnis = simuliere_akku(pv_uebrig.to_numpy(), 20.0, zeitintervall=1.0, **parameter)
+    ersparnis = akku_ersparnis(ergebnis.geladen.sum(), ergebnis.entladen.sum(), 22.5, 6.0)
+
+    assert zeile['geladen_kwh'] == pytest.approx(ergebnis.geladen.sum())
+    assert zeile['entladen_kwh'] == pytest.approx(ergebnis.entladen.sum())
+    assert zeile['netto_chf'] == pytest.approx(ersparnis['netto_ersparnis_akku_chf'])